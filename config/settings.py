@@ -319,6 +319,46 @@ AWS_DEFAULT_ACL = None
 AWS_LOCATION = 'static'
 
 
+# Report response cache: file, redis (needs the `redis` package) or locmem.
+# The per-user data versions live in this cache, so it must be shared by all
+# worker processes; locmem is per process and only fits a single worker. The
+# file backend is shared by the workers of one host and its culling may drop
+# a version key, which only costs misses. Its hit/miss counters are not
+# atomic across workers, use redis when they must be exact.
+REPORT_CACHE_BACKEND = os.getenv('REPORT_CACHE_BACKEND', 'file').lower()
+REPORT_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'watchlytics-reports',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('REPORT_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'reports')),
+        # One file per entry, culled a third at a time past this (default 300)
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('REPORT_CACHE_MAX_ENTRIES', 20000))},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REPORT_CACHE_LOCATION', 'redis://localhost:6379/1'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reports': {
+        **REPORT_CACHE_BACKENDS[REPORT_CACHE_BACKEND],
+        'TIMEOUT': int(os.getenv('REPORT_CACHE_TIMEOUT', 3600)),
+        'KEY_PREFIX': 'watchlytics',
+    },
+}
+
+# Local background task pool (see config/tasks.py); eager mode runs tasks inline
+BACKGROUND_TASK_WORKERS = int(os.getenv('BACKGROUND_TASK_WORKERS', 2))
+BACKGROUND_TASKS_ALWAYS_EAGER = os.getenv('BACKGROUND_TASKS_ALWAYS_EAGER', 'false').lower() == 'true'
+
+
 # CELERY_BROKER_URL = 'redis://localhost:6379/0'
 # CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 # CELERY_ACCEPT_CONTENT = ['json']
@@ -0,0 +1,54 @@
+"""
+Minimal background task queue.
+
+No message broker is configured for this project, so long running work
+(report exports, imports, image processing) is handed to a local thread
+pool inside the web process. Jobs keep their own state in the database,
+which means a broker backed worker can replace ``enqueue`` later without
+touching the callers.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+                thread_name_prefix='watchlytics-task'
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, '__name__', func))
+    finally:
+        # Worker threads must not keep their own database connections open
+        connections.close_all()
+
+
+def enqueue(func, *args, **kwargs):
+    """
+    Run ``func(*args, **kwargs)`` in the background once the current
+    transaction commits, so the task always sees the rows it was queued for.
+    With BACKGROUND_TASKS_ALWAYS_EAGER the task runs inline instead.
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_ALWAYS_EAGER', False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+
+    transaction.on_commit(lambda: get_executor().submit(_run, func, args, kwargs))
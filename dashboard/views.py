@@ -10,6 +10,9 @@ from decimal import Decimal
 from transactions.models import TransactionHistory, TransactionItem
 from django.db.models.functions import Coalesce
 from inventory.models import Product
+from report.services import (
+    PERIOD_TRUNCS, PROFIT_METRICS, period_series, period_start, period_end, period_label, last_periods
+)
 from .serializers import (
     DashboardStatsSerializer, 
     ExpenseTrackingSerializer, 
@@ -29,13 +32,13 @@ class DashboardStatsAPIView(APIView):
                 reserved=Count('id', filter=Q(availability='reserved'))
             )
             
-            sales_data = TransactionItem.objects.filter(
-                transaction__user=user,
-                transaction__transaction_type='sale'
+            sales_data = TransactionHistory.objects.filter(
+                user=user,
+                transaction_type='sale'
             ).aggregate(
-                total_sales=Coalesce(Sum(F('quantity') * F('sale_price')), Decimal('0')),
-                total_purchases=Coalesce(Sum(F('quantity') * F('purchase_price')), Decimal('0')),
-                count=Count('id')
+                total_sales=Coalesce(Sum('items_total_sale'), Decimal('0')),
+                total_purchases=Coalesce(Sum('items_total_purchase'), Decimal('0')),
+                count=Coalesce(Sum('items_count'), 0)
             )
             
             stats_data = {
@@ -61,100 +64,41 @@ class ExpenseTrackingAPIView(APIView):
     
     def get(self, request):
         user = request.user
+        period = request.query_params.get('period', 'month')  # week, month, quarter or year
+        if period not in PERIOD_TRUNCS:
+            period = 'month'
         
-        today = timezone.now().date()
-        current_month_start = today.replace(day=1)
+        # Last six periods including the current one, oldest first
+        series = period_series(user, period, *last_periods(period, 6), metrics=PROFIT_METRICS)
         
         monthly_data = []
-        
-        for i in range(6):
-            month_year = today.year
-            month_num = today.month - i
-            while month_num < 1:
-                month_num += 12
-                month_year -= 1
-            
-            month_start = current_month_start.replace(year=month_year, month=month_num)
-            
-            if month_start.month == 12:
-                next_month_start = month_start.replace(year=month_start.year + 1, month=1)
-            else:
-                next_month_start = month_start.replace(month=month_start.month + 1)
-            
-            sales_amount = TransactionHistory.objects.filter(
-                user=user,
-                transaction_type='sale',
-                date__gte=month_start,
-                date__lt=next_month_start
-            ).aggregate(
-                total=Sum('sale_price')
-            )['total'] or Decimal('0')
-            
-            sales_items = TransactionItem.objects.filter(
-                transaction__user=user,
-                transaction__transaction_type='sale',
-                transaction__date__gte=month_start,
-                transaction__date__lt=next_month_start,
-                sale_price__isnull=False
-            ).aggregate(
-                total=Sum(F('quantity') * F('sale_price'))
-            )['total'] or Decimal('0')
-            
-            sales_amount = max(sales_amount, sales_items)
-            
-            purchase_amount = TransactionHistory.objects.filter(
-                user=user,
-                transaction_type='purchase',
-                date__gte=month_start,
-                date__lt=next_month_start
-            ).aggregate(
-                total=Sum('purchase_price')
-            )['total'] or Decimal('0')
-            
-            purchase_items = TransactionItem.objects.filter(
-                transaction__user=user,
-                transaction__transaction_type='purchase',
-                transaction__date__gte=month_start,
-                transaction__date__lt=next_month_start,
-                purchase_price__isnull=False
-            ).aggregate(
-                total=Sum(F('quantity') * F('purchase_price'))
-            )['total'] or Decimal('0')
-            
-            purchase_amount = max(purchase_amount, purchase_items)
+        for bucket, totals in series:
+            sales_amount = max(totals['sales_amount'], totals['sales_items_amount'])
+            purchase_amount = max(totals['purchases_amount'], totals['purchases_items_amount'])
             
             monthly_data.append({
-                'month': f"{month_name[month_start.month]} {month_start.year}",
+                'month': f"{month_name[bucket.month]} {bucket.year}" if period == 'month' else period_label(bucket, period),
                 'sales': float(sales_amount),
                 'purchases': float(purchase_amount)
             })
         
-        # Reverse to show oldest first
-        monthly_data.reverse()
-        
         return Response(monthly_data, status=status.HTTP_200_OK)
 
 
 class IncomeBreakdownAPIView(APIView):
     permission_classes = [IsAuthenticated]
     
-    def get_actual_income(self, user, year_start, year_end):
+    def get_actual_income(self, user, period_start_date, period_end_date, period):
         try:
-            history_income = TransactionHistory.objects.filter(
-                user=user,
-                transaction_type='sale',
-                date__range=(year_start, year_end)
-            ).aggregate(
-                total=Sum('sale_price')
-            )['total'] or Decimal('0')
-            
-            items_income = TransactionItem.objects.filter(
-                transaction__user=user,
-                transaction__transaction_type='sale',
-                transaction__date__range=(year_start, year_end)
-            ).aggregate(
-                total=Sum(F('quantity') * F('sale_price'))
-            )['total'] or Decimal('0')
+            series = period_series(
+                user,
+                period,
+                period_start_date,
+                period_end_date,
+                metrics=('sales_amount', 'sales_items_amount')
+            )
+            history_income = sum((totals['sales_amount'] for _, totals in series), Decimal('0'))
+            items_income = sum((totals['sales_items_amount'] for _, totals in series), Decimal('0'))
             
             return max(history_income, items_income)
         except Exception as e:
@@ -198,11 +142,20 @@ class IncomeBreakdownAPIView(APIView):
         user = request.user
         
         try:
-            current_year = timezone.now().year
-            year_start = datetime(current_year, 1, 1).date()
-            year_end = datetime(current_year, 12, 31).date()
-            
-            actual_income = self.get_actual_income(user, year_start, year_end)
+            period = request.query_params.get('period', 'year')  # week, month, quarter or year
+            if period not in PERIOD_TRUNCS:
+                period = 'year'
+            
+            today = timezone.now().date()
+            current_year = today.year
+            current_period_start = period_start(today, period)
+            
+            actual_income = self.get_actual_income(
+                user,
+                current_period_start,
+                period_end(current_period_start, period),
+                period
+            )
             pending_income = self.get_pending_income(user)
             target = self.calculate_target(actual_income, pending_income, user)
             
@@ -211,6 +164,8 @@ class IncomeBreakdownAPIView(APIView):
                 'income': float(actual_income),
                 'pending': float(pending_income),
                 'year': current_year,
+                'period': period,
+                'period_label': period_label(current_period_start, period),
                 'progress': float(actual_income / target) if target > 0 else 0
             }
             
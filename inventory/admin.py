@@ -4,7 +4,7 @@ from django.db.models import Sum, Avg, Count, F, ExpressionWrapper, DurationFiel
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
-from .models import Product, Category
+from .models import Product, Category, ProductImportJob
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -144,4 +144,12 @@ class ProductAdmin(admin.ModelAdmin):
         # Always use distinct to avoid duplicate results
         use_distinct = True
         
-        return queryset, use_distinct
\ No newline at end of file
+        return queryset, use_distinct
+
+
+@admin.register(ProductImportJob)
+class ProductImportJobAdmin(admin.ModelAdmin):
+    list_display = ('user', 'original_name', 'status', 'progress', 'rows_processed', 'created_count', 'updated_count', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('user__email', 'original_name')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
@@ -0,0 +1,187 @@
+"""
+Bulk operations on a user's products.
+
+Every operation is scoped to the owner, works through the ids in chunks
+with set-based queries, and returns one summary of what it did. Ids that
+do not exist or belong to someone else are reported as skipped.
+"""
+from django.db import transaction
+from django.utils import timezone
+from transactions.models import TransactionHistory, TransactionItem
+from transactions.services import record_stock_movements, transaction_movements
+from transactions.signals import deferred_total_refresh
+from report.services import mark_rollup_day_dirty, mark_user_data_changed
+from .importers import bulk_create_with_pks
+from .models import Product
+
+BULK_CHUNK_SIZE = 1000
+
+PRICE_FIELDS = ('buying_price', 'sold_price', 'wholesale_price', 'website_price', 'msrp')
+
+
+def _chunks(ids, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _unique(ids):
+    return list(dict.fromkeys(ids))
+
+
+def _summary(action, product_ids, matched_ids, **counts):
+    matched_ids = set(matched_ids)
+    return {
+        'action': action,
+        'requested_count': len(product_ids),
+        'matched_count': len(matched_ids),
+        'skipped_ids': [pk for pk in product_ids if pk not in matched_ids],
+        **counts,
+    }
+
+
+def bulk_mark_sold(user, product_ids, sold_at=None):
+    """
+    Record a sale of one unit for every product in stock that does not have
+    a sale yet, the same ledger rows the spreadsheet import writes for sold
+    products. As with any sale, a product is marked sold once its quantity
+    reaches zero; products already out of stock are only marked sold.
+    """
+    product_ids = _unique(product_ids)
+    sold_at = sold_at or timezone.now()
+    sale_date = timezone.localdate(sold_at)
+
+    matched_ids = []
+    transactions_created = 0
+
+    with transaction.atomic():
+        for chunk in _chunks(product_ids):
+            products = list(
+                Product.objects.filter(owner=user, id__in=chunk).values_list(
+                    'pk', 'model_name', 'buying_price', 'sold_price', 'quantity'
+                )
+            )
+            if not products:
+                continue
+            pks = [product[0] for product in products]
+            matched_ids.extend(pks)
+
+            Product.objects.filter(pk__in=pks, quantity__lte=0).exclude(is_sold=True).update(
+                is_sold=True,
+                availability='sold',
+                date_sold=sold_at
+            )
+
+            has_sale = set(
+                TransactionItem.objects.filter(
+                    product_id__in=pks,
+                    transaction__transaction_type='sale'
+                ).values_list('product_id', flat=True)
+            )
+
+            planned = [
+                (
+                    TransactionHistory(
+                        user=user,
+                        name_of_trade=f"{model_name} Sale",
+                        transaction_type='sale',
+                        date=sale_date,
+                        sale_price=sold_price,
+                    ),
+                    TransactionItem(
+                        product_id=pk,
+                        quantity=1,
+                        sale_price=sold_price,
+                        purchase_price=buying_price,
+                    )
+                )
+                for pk, model_name, buying_price, sold_price, quantity in products
+                if pk not in has_sale and quantity > 0
+            ]
+            bulk_create_with_pks(TransactionHistory, [sale for sale, _ in planned])
+            for sale, item in planned:
+                item.transaction = sale
+            TransactionItem.objects.bulk_create([item for _, item in planned], batch_size=BULK_CHUNK_SIZE)
+            if planned:
+                TransactionHistory.objects.filter(pk__in=[sale.pk for sale, _ in planned]).refresh_totals()
+                # The sold unit leaves the stock through the ledger like any
+                # sale, which also sets the status from the quantity left
+                record_stock_movements([
+                    movement
+                    for sale, item in planned
+                    for movement in transaction_movements(sale, [(item.product_id, item.quantity)], recorded=False)
+                ], sold_at=sold_at)
+            transactions_created += len(planned)
+
+        # Queryset updates and bulk_create skip the signals that refresh reports
+        if matched_ids:
+            if transactions_created:
+                mark_rollup_day_dirty(user.pk, sale_date)
+            mark_user_data_changed(user.pk)
+
+    return _summary(
+        'mark_sold', product_ids, matched_ids,
+        updated_count=len(matched_ids),
+        transactions_created=transactions_created
+    )
+
+
+def bulk_update_availability(user, product_ids, availability):
+    if availability == 'sold':
+        summary = bulk_mark_sold(user, product_ids)
+        summary['action'] = 'update_availability'
+        return summary
+
+    update_fields = {'availability': availability}
+    if availability == 'in_stock':
+        update_fields.update({'is_sold': False, 'date_sold': None})
+
+    return _bulk_update(user, 'update_availability', product_ids, update_fields)
+
+
+def bulk_update_prices(user, product_ids, prices):
+    """Set the given price fields (see PRICE_FIELDS) on every product"""
+    return _bulk_update(user, 'update_prices', product_ids, prices)
+
+
+def _bulk_update(user, action, product_ids, update_fields):
+    product_ids = _unique(product_ids)
+    matched_ids = []
+
+    with transaction.atomic():
+        for chunk in _chunks(product_ids):
+            pks = list(Product.objects.filter(owner=user, id__in=chunk).values_list('pk', flat=True))
+            if pks:
+                Product.objects.filter(pk__in=pks).update(**update_fields)
+                matched_ids.extend(pks)
+
+        if matched_ids:
+            mark_user_data_changed(user.pk)
+
+    return _summary(action, product_ids, matched_ids, updated_count=len(matched_ids))
+
+
+def bulk_delete(user, product_ids):
+    """
+    Delete the products with their transaction items. The stored totals of
+    the affected transactions are refreshed once per chunk, rollups and
+    cached reports by the delete signals.
+    """
+    product_ids = _unique(product_ids)
+    matched_ids = []
+
+    with transaction.atomic():
+        for chunk in _chunks(product_ids):
+            pks = list(Product.objects.filter(owner=user, id__in=chunk).values_list('pk', flat=True))
+            if not pks:
+                continue
+            items = TransactionItem.objects.filter(product_id__in=pks)
+            transaction_ids = list(items.values_list('transaction_id', flat=True).distinct())
+            # Deleted here rather than by the product cascade, so the totals
+            # are not refreshed once per item
+            with deferred_total_refresh():
+                items.delete()
+            Product.objects.filter(pk__in=pks).delete()
+            TransactionHistory.objects.filter(pk__in=transaction_ids).refresh_totals()
+            matched_ids.extend(pks)
+
+    return _summary('bulk_delete', product_ids, matched_ids, deleted_count=len(matched_ids))
@@ -0,0 +1,55 @@
+"""
+Filter sidebar counts for the product list.
+
+Every dimension is grouped in its own SELECT and the SELECTs are combined
+with UNION ALL, so all counts come back in one round trip with one small
+row per distinct value. The values share a text column in the union and are
+converted back to their field's type afterwards.
+"""
+from django.db.models import CharField, Count, Value
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.functions import Cast
+
+# Facet name and the product field it counts, matching the ProductViewSet filters
+PRODUCT_FACETS = {
+    'brand': 'category__name',
+    'condition': 'condition',
+    'availability': 'availability',
+    'year': 'year',
+    'seller': 'purchased_from',
+    'buyer': 'sold_source',
+}
+
+
+def resolve_field(model, path):
+    """Model field at the end of a ``category__name`` style path"""
+    *relations, name = path.split(LOOKUP_SEP)
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def product_facets(queryset, facets=PRODUCT_FACETS):
+    """Counts per value of every facet over ``queryset``, largest first"""
+    queryset = queryset.order_by()
+
+    grouped = [
+        queryset.annotate(
+            facet=Value(name, output_field=CharField()),
+            value=Cast(field, output_field=CharField())
+        ).values('facet', 'value').annotate(count=Count('pk'))
+        for name, field in facets.items()
+    ]
+    rows = grouped[0].union(*grouped[1:], all=True)
+
+    fields = {name: resolve_field(queryset.model, field) for name, field in facets.items()}
+    counts = {name: [] for name in facets}
+    for row in rows:
+        value = row['value']
+        if value is not None:
+            value = fields[row['facet']].to_python(value)
+        counts[row['facet']].append({'value': value, 'count': row['count']})
+
+    for values in counts.values():
+        values.sort(key=lambda item: (-item['count'], str(item['value'] or '')))
+    return counts
@@ -0,0 +1,159 @@
+"""
+Resized copies of product images.
+
+Inventory grids only need small pictures, so every uploaded product image
+gets downscaled JPEG and WebP variants. They are generated on the background
+worker (see config.tasks) and stored next to the original through the same
+storage, S3 in production and the local filesystem in development.
+
+Product.image_variants records which original the variants were built from,
+so a replaced image is picked up again and stale variants are never served:
+
+    {
+        "source": "images/watch.jpg",
+        "thumbnail": {"width": 240, "height": 180,
+                      "jpeg": "images/watch_thumbnail.jpg",
+                      "webp": "images/watch_thumbnail.webp"},
+        ...
+    }
+"""
+import logging
+import os
+from io import BytesIO
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels, images are never upscaled
+IMAGE_VARIANT_SIZES = {
+    'thumbnail': 240,
+    'medium': 800,
+}
+
+IMAGE_VARIANT_FORMATS = {
+    'jpeg': ('JPEG', '.jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', '.webp', {'quality': 80, 'method': 4}),
+}
+
+
+def variant_names(variants):
+    return [
+        variant[key]
+        for variant in variants.values() if isinstance(variant, dict)
+        for key in IMAGE_VARIANT_FORMATS if variant.get(key)
+    ]
+
+
+def variants_are_current(product):
+    return bool(product.image) and product.image_variants.get('source') == product.image.name
+
+
+def variant_urls(product):
+    """Storage URLs of the product's variants, empty until they are generated"""
+    if not variants_are_current(product):
+        return {}
+
+    storage = product.image.storage
+    urls = {}
+    for size_name in IMAGE_VARIANT_SIZES:
+        variant = product.image_variants.get(size_name)
+        if not variant:
+            continue
+        urls[size_name] = {
+            'width': variant['width'],
+            'height': variant['height'],
+            **{key: storage.url(variant[key]) for key in IMAGE_VARIANT_FORMATS if variant.get(key)},
+        }
+    return urls
+
+
+def needs_variants(product):
+    if product.image:
+        return not variants_are_current(product)
+    return bool(product.image_variants)
+
+
+def _encode(image, fmt, extension, options):
+    if fmt == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no alpha channel, flatten transparent images onto white
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, fmt, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def build_variants(storage, source_name):
+    """Write every size and format of ``source_name`` and return their names"""
+    base, _ = os.path.splitext(source_name)
+    largest = max(IMAGE_VARIANT_SIZES.values())
+
+    with storage.open(source_name, 'rb') as f:
+        with Image.open(f) as original:
+            # Let the JPEG decoder skip resolution no variant needs
+            original.draft('RGB', (largest, largest))
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'RGBA'):
+                original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+            original.load()
+
+    variants = {'source': source_name}
+    for size_name, size in sorted(IMAGE_VARIANT_SIZES.items(), key=lambda item: -item[1]):
+        resized = original.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        variant = {'width': resized.width, 'height': resized.height}
+        for key, (fmt, extension, options) in IMAGE_VARIANT_FORMATS.items():
+            variant[key] = storage.save(
+                f'{base}_{size_name}{extension}',
+                _encode(resized, fmt, extension, options)
+            )
+        variants[size_name] = variant
+    return variants
+
+
+def delete_variant_files(storage, variants):
+    for name in variant_names(variants):
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning("Could not delete image variant %s", name, exc_info=True)
+
+
+def generate_image_variants(product_id, force=False):
+    """
+    Background task: bring the variants of one product in line with its
+    current image. Writes through a queryset update filtered on the image it
+    processed, so a newer upload is never overwritten with older variants.
+    """
+    from .models import Product
+
+    product = Product.objects.filter(pk=product_id).only('id', 'image', 'image_variants').first()
+    if product is None or not (force or needs_variants(product)):
+        return
+
+    storage = product.image.storage
+    previous = product.image_variants or {}
+
+    if not product.image:
+        updated = Product.objects.filter(pk=product_id, image__in=['', None]).update(image_variants={})
+        if updated:
+            delete_variant_files(storage, previous)
+        return
+
+    source_name = product.image.name
+    try:
+        variants = build_variants(storage, source_name)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        # Remember the failure so the same file is not retried on every save
+        logger.warning("Could not build variants of %s: %s", source_name, e)
+        variants = {'source': source_name, 'error': str(e)}
+
+    updated = Product.objects.filter(pk=product_id, image=source_name).update(image_variants=variants)
+    if updated:
+        delete_variant_files(storage, previous)
+    else:
+        # The image changed while we were working, the newer upload has its own task
+        delete_variant_files(storage, variants)
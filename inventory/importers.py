@@ -0,0 +1,672 @@
+import csv
+import logging
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from io import TextIOWrapper
+from django.db import connection, transaction
+from django.db.models import Q, Value, CharField
+from django.db.models.functions import Cast, Concat, Lower
+from django.utils import timezone
+import openpyxl
+from customers.models import Customer
+from transactions.models import StockMovement, TransactionHistory, TransactionItem
+from transactions.services import balance_adjustments, date_of, stock_direction
+from report.services import mark_rollup_day_dirty, mark_user_data_changed
+from .models import Category, Product, ProductImportJob, product_search_text
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 500
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+PRODUCT_IMPORT_FIELDS = [
+    'model_name', 'product_id', 'serial_number', 'category', 'profit_margin',
+    'availability', 'buying_price', 'shipping_price', 'repair_cost', 'sold_price',
+    'quantity', 'date_purchased', 'date_sold', 'source_of_sale', 'purchased_from',
+    'sold_source', 'listed_on', 'wholesale_price', 'search_text',
+]
+
+SALE_CATEGORIES = [choice[0] for choice in TransactionHistory.SALE_CATEGORY_CHOICES]
+
+
+def parse_decimal(value, default=0):
+    if value is None:
+        return Decimal(default)
+    try:
+        if isinstance(value, str):
+            value = value.strip().replace(',', '')
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError, TypeError):
+        return Decimal(default)
+
+
+def to_date(value):
+    if not value:
+        return None
+
+    if isinstance(value, datetime):
+        return value.date()
+
+    if not isinstance(value, str):
+        return None
+
+    value = value.strip()
+    formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%d-%m-%Y']
+
+    for date_format in formats:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+
+    return None
+
+
+def normalize_row(row):
+    return {
+        key.strip() if isinstance(key, str) else key:
+        (value.strip() if isinstance(value, str) else value)
+        for key, value in row.items()
+        if key is not None
+    }
+
+
+def map_availability(deal_status):
+    if not deal_status:
+        return 'in_stock'
+
+    if isinstance(deal_status, str):
+        deal_status = deal_status.strip().lower()
+
+    mapping = {
+        'sold': 'sold',
+        'in stock': 'in_stock',
+        'instock': 'in_stock',
+        'reserved': 'reserved',
+        'in repair': 'in_repair',
+        'repair': 'in_repair'
+    }
+    return mapping.get(str(deal_status).lower(), 'in_stock')
+
+
+def has_product_identity(row):
+    return bool(row.get('Reference') or row.get('Serial Number') or row.get('Model Name'))
+
+
+class ImportFileError(ValueError):
+    """The uploaded file cannot be imported at all, the message is shown to the user"""
+
+
+def _has_data(row):
+    return any(value and (not isinstance(value, str) or value.strip()) for value in row.values())
+
+
+class RowSource:
+    """
+    Streams the rows of an uploaded CSV or Excel file as dicts keyed by the
+    header row, so an import never holds the whole file in memory. The
+    checks for empty files and rows without product data are tracked while
+    rows are read; call check() once the rows have been consumed.
+    """
+
+    def __init__(self, fileobj, filename):
+        self.fileobj = fileobj
+        self.filename = filename.lower()
+        self.workbook = None
+        self.rows_read = 0
+        self.rows_with_data = 0
+        self.rows_with_identity = 0
+
+        if self.filename.endswith('.csv'):
+            self.kind = 'CSV'
+        elif self.filename.endswith(('.xlsx', '.xls')):
+            self.kind = 'Excel'
+        else:
+            raise ImportFileError('Unsupported file format. Please upload CSV or Excel file.')
+
+    def __iter__(self):
+        try:
+            rows = self.read_csv() if self.kind == 'CSV' else self.read_excel()
+            for row in rows:
+                self.rows_read += 1
+                if _has_data(row):
+                    self.rows_with_data += 1
+                    if has_product_identity(normalize_row(row)):
+                        self.rows_with_identity += 1
+                yield row
+        except ImportFileError:
+            raise
+        except Exception as e:
+            raise ImportFileError(f'Error processing file: {str(e)}')
+
+    def read_csv(self):
+        return csv.DictReader(TextIOWrapper(self.fileobj, encoding='utf-8'))
+
+    def read_excel(self):
+        # Read-only workbooks parse the sheet lazily instead of loading every cell
+        self.workbook = openpyxl.load_workbook(self.fileobj, read_only=True)
+        rows = self.workbook.active.iter_rows(values_only=True)
+
+        header_row = next(rows, None)
+        if header_row is None:
+            raise ImportFileError('The uploaded Excel file is empty or contains only headers.')
+
+        # Columns without a header are ignored
+        headers = [(i, header) for i, header in enumerate(header_row) if header]
+        if not headers:
+            raise ImportFileError('The uploaded Excel file does not contain valid headers.')
+
+        for values in rows:
+            yield {header: values[i] if i < len(values) else None for i, header in headers}
+
+    def estimated_total_rows(self):
+        """Row count for progress reporting, read without parsing the file"""
+        if self.kind == 'Excel':
+            workbook = openpyxl.load_workbook(self.fileobj, read_only=True)
+            max_row = workbook.active.max_row
+            workbook.close()
+            self.fileobj.seek(0)
+            return max(max_row - 1, 0) if max_row else 0
+
+        lines = 0
+        for block in iter(lambda: self.fileobj.read(1024 * 1024), b''):
+            lines += block.count(b'\n')
+        self.fileobj.seek(0)
+        return max(lines - 1, 0)
+
+    def check(self):
+        if not self.rows_read:
+            if self.kind == 'CSV':
+                raise ImportFileError('The uploaded CSV file is empty.')
+            raise ImportFileError('The uploaded Excel file is empty or contains only headers.')
+        if not self.rows_with_data:
+            raise ImportFileError(f'The uploaded {self.kind} file contains only empty rows.')
+        if not self.rows_with_identity:
+            raise ImportFileError(
+                'The file does not contain any valid product data. Each product requires at least one of: '
+                'Reference, Serial Number, or Model Name.'
+            )
+
+    def close(self):
+        if self.workbook is not None:
+            self.workbook.close()
+
+
+def bulk_create_with_pks(model, objects):
+    """bulk_create that always leaves primary keys set on ``objects``"""
+    if not objects:
+        return
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(objects, batch_size=IMPORT_CHUNK_SIZE)
+        return
+    for obj in objects:
+        obj.save(force_insert=True)
+
+
+class ProductImporter:
+    """
+    Imports spreadsheet rows into a user's inventory in chunks. Each chunk
+    resolves its categories, customers, existing products and existing
+    purchase/sale items with a handful of set-based queries and writes with
+    bulk_create/bulk_update. When a chunk fails to write, its rows are
+    retried one by one so the error is reported against the right row.
+    """
+
+    def __init__(self, user, chunk_size=IMPORT_CHUNK_SIZE, on_chunk=None):
+        self.user = user
+        self.chunk_size = chunk_size
+        # Called with the importer after every chunk, e.g. to report progress
+        self.on_chunk = on_chunk
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.total_rows = 0
+
+    def run(self, rows):
+        """``rows`` is an iterable of raw row dicts, the first one being sheet row 2"""
+        chunk = []
+        for index, row in enumerate(rows, start=2):
+            self.total_rows += 1
+            chunk.append((index, row))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+
+        return self.result()
+
+    def run_source(self, source):
+        """Import the rows of a RowSource, rejecting the file if it had nothing to import"""
+        try:
+            self.run(source)
+            source.check()
+        finally:
+            source.close()
+        return self.result()
+
+    def import_chunk(self, chunk):
+        self.write_chunk(chunk)
+        if self.on_chunk:
+            self.on_chunk(self)
+
+    def result(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+            'total_processed': self.created + self.updated,
+            'total_rows': self.total_rows,
+        }
+
+    def write_chunk(self, chunk):
+        parsed_rows = []
+        for index, row in chunk:
+            try:
+                parsed = self.parse_row(index, row)
+            except Exception as e:
+                self.errors.append({'row': index, 'error': str(e)})
+                continue
+            if parsed:
+                parsed_rows.append(parsed)
+
+        if not parsed_rows:
+            return
+
+        try:
+            with transaction.atomic():
+                outcome = self.write_rows(parsed_rows)
+        except Exception:
+            # Retry row by row to find out which rows are broken
+            for parsed in parsed_rows:
+                try:
+                    with transaction.atomic():
+                        outcome = self.write_rows([parsed])
+                except Exception as e:
+                    self.errors.append({'row': parsed['row'], 'error': str(e)})
+                    continue
+                self.apply_outcome(outcome)
+        else:
+            self.apply_outcome(outcome)
+
+    def apply_outcome(self, outcome):
+        self.created += outcome['created']
+        self.updated += outcome['updated']
+        self.errors.extend(outcome['errors'])
+
+    def parse_row(self, index, row):
+        row = normalize_row(row)
+
+        product_id = row.get('Reference')
+        serial_number = row.get('Serial Number')
+        model_name = row.get('Model Name')
+
+        if not (product_id or serial_number or model_name):
+            return None
+
+        buy_price = parse_decimal(row.get('Buy Price'))
+        sell_price = parse_decimal(row.get('Sell Price'))
+
+        profit = sell_price - buy_price
+        profit_margin = int((profit / buy_price) * 100) if buy_price else 0
+
+        brand_name = row.get('Brand') or 'Unnamed Product'
+
+        sale_category = row.get('Sale Category')
+        if not (isinstance(sale_category, str) and sale_category.lower() in SALE_CATEGORIES):
+            sale_category = None
+
+        product = {
+            'model_name': model_name or brand_name,
+            'product_id': product_id or f'custom-id-{index}',
+            'serial_number': serial_number,
+            'profit_margin': profit_margin,
+            'availability': map_availability(row.get('Deal Status')),
+            'buying_price': buy_price,
+            'shipping_price': parse_decimal(row.get('Shipping')),
+            'repair_cost': parse_decimal(row.get('Expense')),
+            'sold_price': sell_price,
+            'quantity': row.get('Quantity') or 1,
+            'date_purchased': to_date(row.get('Purchase Date')),
+            'date_sold': to_date(row.get('Sold Date')),
+            'source_of_sale': row.get('Sold To') or '',
+            'purchased_from': row.get('Bought From') or '',
+            'sold_source': row.get('Payment Sent account') or '',
+            'listed_on': row.get('Delivery Content') or '',
+            'wholesale_price': parse_decimal(row.get('Total Cost')),
+        }
+
+        # Reject values the database would refuse, so one bad row does not fail its whole chunk
+        for name, value in product.items():
+            Product._meta.get_field(name).get_prep_value(value)
+        if not product['date_purchased']:
+            raise ValueError('Purchase Date is missing or not a valid date.')
+
+        return {
+            'row': index,
+            'category_name': str(brand_name).strip(),
+            'bought_from': str(row['Bought From']) if row.get('Bought From') else None,
+            'sold_to': str(row['Sold To']) if row.get('Sold To') else None,
+            'sale_category': sale_category.lower() if sale_category else None,
+            'product': product,
+        }
+
+    def resolve_categories(self, names):
+        """Case-insensitive lookup of category names, creating the missing ones"""
+        categories = {}
+        existing = Category.objects.annotate(
+            lower_name=Lower('name')
+        ).filter(
+            lower_name__in={name.lower() for name in names}
+        ).order_by('pk')
+        for category in existing:
+            categories.setdefault(category.lower_name, category)
+
+        missing = {}
+        for name in names:
+            if name.lower() not in categories:
+                missing.setdefault(name.lower(), Category(name=name))
+        bulk_create_with_pks(Category, list(missing.values()))
+
+        categories.update(missing)
+        return categories
+
+    def resolve_customers(self, names):
+        """Customers of the importing user by name, creating the missing ones"""
+        customers = {}
+        for customer in Customer.objects.filter(user=self.user, name__in=names).order_by('pk'):
+            customers.setdefault(customer.name, customer)
+
+        missing = [Customer(user=self.user, name=name) for name in names if name not in customers]
+        bulk_create_with_pks(Customer, missing)
+
+        customers.update((customer.name, customer) for customer in missing)
+        return customers
+
+    def write_rows(self, parsed_rows):
+        user = self.user
+        warnings = []
+
+        product_ids = {parsed['product']['product_id'] for parsed in parsed_rows}
+        serial_numbers = {
+            parsed['product']['serial_number'] for parsed in parsed_rows
+            if parsed['product']['serial_number']
+        }
+
+        categories = self.resolve_categories({parsed['category_name'] for parsed in parsed_rows})
+
+        # Products of this user matching a reference or serial number of the chunk,
+        # indexed by every value they held during the chunk
+        by_product_id = defaultdict(list)
+        by_serial = defaultdict(list)
+        original_product_ids = {}
+        for product in Product.objects.filter(
+            Q(product_id__in=product_ids) | Q(serial_number__in=serial_numbers),
+            owner=user
+        ).order_by('pk'):
+            by_product_id[product.product_id].append(product)
+            if product.serial_number:
+                by_serial[product.serial_number].append(product)
+            original_product_ids[product.pk] = product.product_id
+
+        # References already used by other users' products
+        taken_product_ids = set(
+            Product.objects.filter(
+                product_id__in=product_ids
+            ).exclude(owner=user).values_list('product_id', flat=True)
+        )
+
+        # Existing products that already have a purchase or sale item
+        has_item = {'purchase': set(), 'sale': set()}
+        for product_pk, transaction_type in TransactionItem.objects.filter(
+            product_id__in=original_product_ids,
+            transaction__transaction_type__in=['purchase', 'sale']
+        ).values_list('product_id', 'transaction__transaction_type').distinct():
+            has_item[transaction_type].add(product_pk)
+
+        customer_names = set()
+        for parsed in parsed_rows:
+            if parsed['bought_from']:
+                customer_names.add(parsed['bought_from'])
+            if parsed['sold_to']:
+                customer_names.add(parsed['sold_to'])
+        customers = self.resolve_customers(customer_names) if customer_names else {}
+
+        def register(index, key, product):
+            if not any(known is product for known in index[key]):
+                index[key].append(product)
+
+        def holders(product_id, serial_number=None):
+            # Entries whose reference or serial was changed by an earlier row no longer match
+            matches = [product for product in by_product_id.get(product_id, []) if product.product_id == product_id]
+            if serial_number:
+                matches += [product for product in by_serial.get(serial_number, []) if product.serial_number == serial_number]
+            return matches
+
+        def find_product(product_id, serial_number):
+            """Same pick as the lowest primary key matching the reference or serial number"""
+            candidates = holders(product_id, serial_number)
+            saved = [product for product in candidates if product.pk]
+            if saved:
+                return min(saved, key=lambda product: product.pk)
+            new = [product for product in new_products if any(product is candidate for candidate in candidates)]
+            return new[0] if new else None
+
+        new_products = []
+        updated_products = {}
+        planned_transactions = []
+        row_errors = []
+        created = 0
+        updated = 0
+
+        for parsed in parsed_rows:
+            category = categories[parsed['category_name'].lower()]
+            data = dict(
+                parsed['product'],
+                category=category,
+                # bulk writes bypass Product.save(), which maintains the search text
+                search_text=product_search_text(
+                    category.name, parsed['product']['model_name'], parsed['product']['product_id']
+                )
+            )
+            product = find_product(data['product_id'], data['serial_number'])
+
+            # A reference can only be used once per user
+            if product and any(holder is not product for holder in holders(data['product_id'])):
+                row_errors.append({
+                    'row': parsed['row'],
+                    'error': f"Product ID '{data['product_id']}' is already used by another of your products."
+                })
+                continue
+
+            if not product and data['product_id'] in taken_product_ids:
+                warnings.append({
+                    'row': parsed['row'],
+                    'warning': f"Product ID '{data['product_id']}' already exists. Created with modified ID '{data['product_id']}'"
+                })
+
+            if product:
+                for key, value in data.items():
+                    setattr(product, key, value)
+                if product.pk:
+                    updated_products[product.pk] = product
+                updated += 1
+            else:
+                product = Product(owner=user, **data)
+                new_products.append(product)
+                created += 1
+
+            register(by_product_id, product.product_id, product)
+            if product.serial_number:
+                register(by_serial, product.serial_number, product)
+
+            # Purchase transaction, unless the product already has one
+            if data['buying_price'] and data['date_purchased'] and not self.has_item(product, has_item['purchase']):
+                planned_transactions.append((
+                    TransactionHistory(
+                        user=user,
+                        name_of_trade=f"{product.model_name} Purchase",
+                        transaction_type='purchase',
+                        date=data['date_purchased'],
+                        purchase_price=data['buying_price'],
+                        customer=customers.get(parsed['bought_from']),
+                        expenses={
+                            'shipping': float(data['shipping_price']) if data['shipping_price'] else 0,
+                            'repair_cost': float(data['repair_cost']) if data['repair_cost'] else 0
+                        }
+                    ),
+                    {
+                        'product': product,
+                        'quantity': product.quantity or 1,
+                        'purchase_price': data['buying_price'],
+                    }
+                ))
+                self.mark_item(product, has_item['purchase'])
+
+            # Sale transaction if sell price and sold date are present
+            if data['sold_price'] and data['date_sold'] and not self.has_item(product, has_item['sale']):
+                planned_transactions.append((
+                    TransactionHistory(
+                        user=user,
+                        name_of_trade=f"{product.model_name} Sale",
+                        transaction_type='sale',
+                        date=data['date_sold'],
+                        sale_price=data['sold_price'],
+                        customer=customers.get(parsed['sold_to']),
+                        sale_category=parsed['sale_category'],
+                        expenses={
+                            'repair_cost': float(data['repair_cost']) if data['repair_cost'] else 0
+                        }
+                    ),
+                    {
+                        'product': product,
+                        'quantity': 1,
+                        'sale_price': data['sold_price'],
+                        'purchase_price': data['buying_price'],  # Include original purchase price
+                    }
+                ))
+                self.mark_item(product, has_item['sale'])
+
+        # Updates go first, they may free references that new products take over
+        if updated_products:
+            renamed = [pk for pk, product in updated_products.items() if product.product_id != original_product_ids[pk]]
+            if renamed:
+                # Park renamed products on a unique placeholder first, so a single
+                # UPDATE never sees the same reference on two rows at once
+                Product.objects.filter(pk__in=renamed).update(
+                    product_id=Concat(Value('~import-'), Cast('pk', output_field=CharField()))
+                )
+            Product.objects.bulk_update(
+                list(updated_products.values()),
+                PRODUCT_IMPORT_FIELDS,
+                batch_size=IMPORT_CHUNK_SIZE
+            )
+        bulk_create_with_pks(Product, new_products)
+
+        transactions = [planned[0] for planned in planned_transactions]
+        bulk_create_with_pks(TransactionHistory, transactions)
+        TransactionItem.objects.bulk_create(
+            [
+                TransactionItem(transaction=transaction_history, **item)
+                for transaction_history, item in planned_transactions
+            ],
+            batch_size=IMPORT_CHUNK_SIZE
+        )
+
+        # The sheet sets quantities directly: its trades go into the stock ledger
+        # as they are and an adjustment row brings each product's ledger balance
+        # to the imported quantity
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                user=user,
+                product=item['product'],
+                transaction=transaction_history,
+                quantity=stock_direction(transaction_history.transaction_type) * int(item['quantity']),
+                reason=transaction_history.transaction_type,
+                date=date_of(transaction_history.date)
+            )
+            for transaction_history, item in planned_transactions
+        ], batch_size=IMPORT_CHUNK_SIZE)
+        StockMovement.objects.bulk_create(
+            balance_adjustments(list(updated_products.values()) + new_products),
+            batch_size=IMPORT_CHUNK_SIZE
+        )
+
+        # Bulk writes skip model signals, so refresh totals, rollups and cached reports here
+        if transactions:
+            TransactionHistory.objects.filter(pk__in=[transaction_history.pk for transaction_history in transactions]).refresh_totals()
+        for day in {transaction_history.date for transaction_history in transactions}:
+            mark_rollup_day_dirty(user.pk, day)
+        mark_user_data_changed(user.pk)
+
+        return {'created': created, 'updated': updated, 'errors': warnings + row_errors}
+
+    @staticmethod
+    def item_key(product):
+        # Products created in this chunk have no primary key yet
+        return product.pk if product.pk else ('new', id(product))
+
+    def has_item(self, product, products_with_item):
+        return self.item_key(product) in products_with_item
+
+    def mark_item(self, product, products_with_item):
+        products_with_item.add(self.item_key(product))
+
+
+def run_product_import(job_id):
+    """
+    Import the file of a ProductImportJob. Counts and row errors are saved
+    after every chunk so the client can follow the import while it runs.
+    """
+    job = ProductImportJob.objects.select_related('user').get(pk=job_id)
+
+    ProductImportJob.objects.filter(pk=job.pk).update(
+        status='running',
+        started_at=timezone.now()
+    )
+
+    def save_progress(importer, **extra):
+        total_rows = max(job.total_rows, importer.total_rows)
+        ProductImportJob.objects.filter(pk=job.pk).update(
+            rows_processed=importer.total_rows,
+            progress=min(int(importer.total_rows * 100 / total_rows), 99) if total_rows else 0,
+            created_count=importer.created,
+            updated_count=importer.updated,
+            errors=sorted(importer.errors, key=lambda error: error['row']),
+            **extra
+        )
+
+    importer = ProductImporter(job.user, on_chunk=save_progress)
+
+    try:
+        with job.file.open('rb') as f:
+            source = RowSource(f, job.original_name)
+            job.total_rows = source.estimated_total_rows()
+            ProductImportJob.objects.filter(pk=job.pk).update(total_rows=job.total_rows)
+
+            result = importer.run_source(source)
+
+        ProductImportJob.objects.filter(pk=job.pk).update(
+            status='completed',
+            progress=100,
+            total_rows=result['total_rows'],
+            rows_processed=result['total_rows'],
+            created_count=result['created'],
+            updated_count=result['updated'],
+            errors=result['errors'],
+            finished_at=timezone.now()
+        )
+
+    except ImportFileError as e:
+        # Chunks imported before a broken row stay imported, keep their counts
+        save_progress(importer, status='failed', error=str(e), finished_at=timezone.now())
+
+    except Exception as e:
+        logger.exception("Product import %s failed", job.pk)
+        ProductImportJob.objects.filter(pk=job.pk).update(
+            status='failed',
+            error=str(e),
+            finished_at=timezone.now()
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from inventory.images import generate_image_variants, needs_variants
+from inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Generates the thumbnail and WebP variants of product images that do not have current ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild the variants of every product image, e.g. after changing the variant sizes.'
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).only(
+            'id', 'image', 'image_variants'
+        ).order_by('id')
+
+        generated = 0
+        for product in products.iterator(chunk_size=500):
+            if options['force'] or needs_variants(product):
+                generate_image_variants(product.pk, force=options['force'])
+                generated += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Generated image variants for {generated} product(s)'))
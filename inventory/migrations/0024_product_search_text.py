@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:18
+
+from django.db import migrations, models
+
+
+def product_search_text(category_name, model_name, product_id):
+    # Frozen copy of inventory.models.product_search_text as of this migration
+    return ' '.join(str(part) for part in (category_name, model_name, product_id) if part).lower()
+
+
+def backfill_search_text(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+
+    batch = []
+    products = Product.objects.select_related('category').only(
+        'pk', 'model_name', 'product_id', 'category__name'
+    )
+    for product in products.iterator(chunk_size=2000):
+        product.search_text = product_search_text(
+            product.category.name if product.category_id else None,
+            product.model_name,
+            product.product_id
+        )
+        batch.append(product)
+        if len(batch) >= 2000:
+            Product.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ['search_text'])
+
+
+def create_trigram_index(apps, schema_editor):
+    # Substring search is served by a trigram index on PostgreSQL only,
+    # other backends fall back to scanning the single search_text column
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS inventory_product_search_trgm '
+        'ON inventory_product USING gin (search_text gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS inventory_product_search_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0023_product_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
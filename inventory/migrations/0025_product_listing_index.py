@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0024_product_search_text'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(models.F('owner'), models.Case(models.When(quantity=0, then=models.Value(1)), default=models.Value(0), output_field=models.IntegerField()), models.OrderBy(models.F('created_at'), descending=True), models.OrderBy(models.F('id'), descending=True), name='product_owner_listing_idx'),
+        ),
+    ]
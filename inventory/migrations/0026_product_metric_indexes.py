@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:56
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.lookups
+from django.db.models.functions import Cast
+
+
+class DecimalDivision(models.Func):
+    """Frozen copy of inventory.models.DecimalDivision as of this migration"""
+    arg_joiner = ' / '
+    template = '(%(expressions)s)'
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        numerator, denominator = self.get_source_expressions()
+        return DecimalDivision(
+            Cast(numerator, models.FloatField()),
+            denominator,
+            output_field=self.output_field
+        ).as_sql(compiler, connection, **extra_context)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0025_product_listing_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['owner', 'buying_price'], name='product_owner_buying_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['owner', 'sold_price'], name='product_owner_sold_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['owner', 'year'], name='product_owner_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(models.F('owner'), models.Case(models.When(models.Q(('sold_price__isnull', True), ('sold_price', 0), _connector='OR'), then=models.Value(None)), default=django.db.models.expressions.CombinedExpression(models.F('sold_price'), '-', models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('buying_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12))), '+', django.db.models.functions.comparison.Coalesce('shipping_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('repair_cost', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('fees', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('commission', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), output_field=models.DecimalField(decimal_places=2, max_digits=12))), output_field=models.DecimalField(decimal_places=2, max_digits=12)), name='product_owner_profit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(models.F('owner'), models.Case(models.When(models.Q(('sold_price__isnull', True), ('sold_price', 0), ('buying_price__isnull', True), ('buying_price', 0), _connector='OR'), then=models.Value(None)), models.When(django.db.models.lookups.Exact(models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('buying_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12))), '+', django.db.models.functions.comparison.Coalesce('shipping_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('repair_cost', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('fees', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('commission', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), output_field=models.DecimalField(decimal_places=2, max_digits=12)), models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12))), then=models.Value(None)), default=DecimalDivision(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('sold_price'), '-', models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('buying_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12))), '+', django.db.models.functions.comparison.Coalesce('shipping_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('repair_cost', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('fees', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('commission', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), output_field=models.DecimalField(decimal_places=2, max_digits=12))), '*', models.Value(Decimal('100'))), models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('buying_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12))), '+', django.db.models.functions.comparison.Coalesce('shipping_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('repair_cost', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('fees', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('commission', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), output_field=models.DecimalField(decimal_places=2, max_digits=12)), output_field=models.DecimalField(decimal_places=4, max_digits=14)), output_field=models.DecimalField(decimal_places=4, max_digits=14)), name='product_owner_margin_idx'),
+        ),
+    ]
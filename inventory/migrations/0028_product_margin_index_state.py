@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:28
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.lookups
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0027_product_image_variants'),
+    ]
+
+    operations = [
+        # The margin index now divides with built-in expressions instead of
+        # inventory.models.DecimalDivision. Both compile to the same SQL on
+        # PostgreSQL, so only the migration state changes.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='product',
+                    name='product_owner_margin_idx',
+                ),
+                migrations.AddIndex(
+                    model_name='product',
+                    index=models.Index(models.F('owner'), models.Case(models.When(models.Q(('sold_price__isnull', True), ('sold_price', 0), ('buying_price__isnull', True), ('buying_price', 0), _connector='OR'), then=models.Value(None)), models.When(django.db.models.lookups.Exact(models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('buying_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12))), '+', django.db.models.functions.comparison.Coalesce('shipping_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('repair_cost', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('fees', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('commission', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), output_field=models.DecimalField(decimal_places=2, max_digits=12)), models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12))), then=models.Value(None)), default=models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('sold_price'), '-', models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('buying_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12))), '+', django.db.models.functions.comparison.Coalesce('shipping_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('repair_cost', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('fees', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('commission', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), output_field=models.DecimalField(decimal_places=2, max_digits=12))), '*', models.Value(Decimal('100'))), '/', models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('buying_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12))), '+', django.db.models.functions.comparison.Coalesce('shipping_price', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('repair_cost', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('fees', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), '+', django.db.models.functions.comparison.Coalesce('commission', models.Value(Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=12)))), output_field=models.DecimalField(decimal_places=2, max_digits=12))), output_field=models.DecimalField(decimal_places=4, max_digits=14)), output_field=models.DecimalField(decimal_places=4, max_digits=14)), name='product_owner_margin_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -1,4 +1,8 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models.functions import Cast, Coalesce, Now
+from django.db.models.lookups import Exact
+from django.core.files.storage import default_storage
 from django.utils import timezone
 from auth_.models import User
 from datetime import datetime
@@ -86,12 +90,158 @@ def validate_no_emojis_on_name(value):
     
     # if value.endswith('-') or value.endswith('_'):
     #     raise ValidationError(_('Model Name cannot end with a hyphen or underscore.'))
+def product_search_text(category_name, model_name, product_id):
+    """Lowercased text that product search and brand filters match against"""
+    return ' '.join(str(part) for part in (category_name, model_name, product_id) if part).lower()
+
+
+class DecimalDivision(models.Func):
+    """
+    ``numerator / denominator`` for money columns. SQLite keeps whole-number
+    decimals as integers and would truncate the quotient, so the numerator
+    is cast to REAL there.
+    """
+    arg_joiner = ' / '
+    template = '(%(expressions)s)'
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        numerator, denominator = self.get_source_expressions()
+        return DecimalDivision(
+            Cast(numerator, models.FloatField()),
+            denominator,
+            output_field=self.output_field
+        ).as_sql(compiler, connection, **extra_context)
+
+
+PRODUCT_METRIC_FIELDS = ('total_cost', 'profit_amount', 'margin_percent', 'hold_duration', 'brand_name')
+
+
+# Metric expressions are built by functions so the annotations and the
+# indexes on them (Product.Meta.indexes) compile to the same SQL
+
+def _money_field():
+    return models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def _percent_field():
+    return models.DecimalField(max_digits=14, decimal_places=4)
+
+
+def total_cost_expression():
+    """Buying price plus shipping, repairs, fees and commission"""
+    zero = models.Value(Decimal('0'), output_field=_money_field())
+    return models.ExpressionWrapper(
+        Coalesce('buying_price', zero) +
+        Coalesce('shipping_price', zero) +
+        Coalesce('repair_cost', zero) +
+        Coalesce('fees', zero) +
+        Coalesce('commission', zero),
+        output_field=_money_field()
+    )
+
+
+def _unsold():
+    return models.Q(sold_price__isnull=True) | models.Q(sold_price=0)
+
+
+def profit_expression():
+    """Sold price minus total cost, NULL while the product is unsold"""
+    return models.Case(
+        models.When(_unsold(), then=models.Value(None)),
+        default=models.F('sold_price') - total_cost_expression(),
+        output_field=_money_field()
+    )
+
+
+def margin_expression(for_index=False):
+    """
+    Profit as a percentage of total cost, NULL when it cannot be computed.
+    The index variant divides with a plain expression, which compiles to the
+    same SQL as DecimalDivision on PostgreSQL and keeps the migrations free
+    of custom expression classes.
+    """
+    numerator = (models.F('sold_price') - total_cost_expression()) * models.Value(Decimal('100'))
+    if for_index:
+        quotient = models.ExpressionWrapper(numerator / total_cost_expression(), output_field=_percent_field())
+    else:
+        quotient = DecimalDivision(numerator, total_cost_expression(), output_field=_percent_field())
+    return models.Case(
+        models.When(
+            _unsold() | models.Q(buying_price__isnull=True) | models.Q(buying_price=0),
+            then=models.Value(None)
+        ),
+        models.When(
+            Exact(total_cost_expression(), models.Value(Decimal('0'), output_field=_money_field())),
+            then=models.Value(None)
+        ),
+        default=quotient,
+        output_field=_percent_field()
+    )
+
+
+def hold_duration_expression():
+    """Time between purchase and sale, or now for products still held"""
+    return models.ExpressionWrapper(
+        Coalesce('date_sold', Now()) - models.F('date_purchased'),
+        output_field=models.DurationField()
+    )
+
+
+class ProductQuerySet(models.QuerySet):
+    
+    def with_metrics(self):
+        """
+        Annotates the figures ProductSerializer shows for every product, so
+        lists render, sort and filter on them without per-row Python or
+        queries: total_cost, profit_amount, margin_percent, hold_duration
+        (a timedelta) and brand_name.
+        """
+        return self.annotate(
+            total_cost=total_cost_expression(),
+            profit_amount=profit_expression(),
+            margin_percent=margin_expression(),
+            hold_duration=hold_duration_expression(),
+            brand_name=models.F('category__name'),
+        )
+
+
+def zero_quantity_expression():
+    """1 for products with no quantity left, which are listed after the others"""
+    return models.Case(
+        models.When(quantity=0, then=models.Value(1)),
+        default=models.Value(0),
+        output_field=models.IntegerField()
+    )
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        old_name = None
+        if self.pk:
+            old_name = Category.objects.filter(pk=self.pk).values_list('name', flat=True).first()
+        
+        super().save(*args, **kwargs)
+        
+        if old_name is not None and old_name != self.name:
+            self.refresh_product_search_text()
+    
+    def refresh_product_search_text(self, batch_size=2000):
+        """Rewrite the search text of every product in this category"""
+        batch = []
+        for product in self.products.only('pk', 'model_name', 'product_id').iterator(chunk_size=batch_size):
+            product.search_text = product_search_text(self.name, product.model_name, product.product_id)
+            batch.append(product)
+            if len(batch) >= batch_size:
+                Product.objects.bulk_update(batch, ['search_text'])
+                batch = []
+        if batch:
+            Product.objects.bulk_update(batch, ['search_text'])
 
 class Product(models.Model):
     AVAILABILTY_CHOICES = (
@@ -148,11 +298,18 @@ class Product(models.Model):
     
     # Media
     image = models.ImageField(upload_to='images/', blank=True, null=True)
+    # Resized JPEG/WebP copies of image, generated in the background (see inventory.images)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     # System fields
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     serial_number = models.CharField(max_length=50, blank=True, null=True)
+    
+    # Brand, model name and reference, maintained on save for search
+    search_text = models.TextField(blank=True, default='', editable=False)
+    
+    objects = ProductQuerySet.as_manager()
 
     year = models.PositiveIntegerField(
         choices=[(r, r) for r in range(1900, datetime.now().year + 1)],
@@ -163,10 +320,44 @@ class Product(models.Model):
     )
     class Meta:
         unique_together = (('owner', 'product_id'))
+        indexes = [
+            # Product list order: in stock first, newest first (see ProductCursorPagination)
+            models.Index(
+                models.F('owner'),
+                zero_quantity_expression(),
+                models.F('created_at').desc(),
+                models.F('id').desc(),
+                name='product_owner_listing_idx'
+            ),
+            # Sorting and range filters of the product list
+            models.Index(fields=['owner', 'buying_price'], name='product_owner_buying_idx'),
+            models.Index(fields=['owner', 'sold_price'], name='product_owner_sold_idx'),
+            models.Index(fields=['owner', 'year'], name='product_owner_year_idx'),
+            models.Index(models.F('owner'), profit_expression(), name='product_owner_profit_idx'),
+            models.Index(models.F('owner'), margin_expression(for_index=True), name='product_owner_margin_idx'),
+        ]
     
     def __str__(self):
         return f"{self.model_name} ({self.product_id})"
     
+    def save(self, *args, **kwargs):
+        self.search_text = product_search_text(
+            self.category.name if self.category_id else None,
+            self.model_name,
+            self.product_id
+        )
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'search_text'}
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the stock ledger record direct quantity edits (transactions.signals)
+        instance._loaded_quantity = instance.__dict__.get('quantity')
+        return instance
+    
     def get_image_url(self):
         if self.image:
             return self.image.url
@@ -212,4 +403,40 @@ class Product(models.Model):
         elif days < 90:
             return '60_to_90'
         else:
-            return 'more_than_90'
\ No newline at end of file
+            return 'more_than_90'
+
+
+class ProductImportJob(models.Model):
+    """Spreadsheet upload imported into a user's inventory in the background"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='product_imports')
+    file = models.FileField(upload_to='product_imports/', storage=default_storage)
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Progress
+    progress = models.PositiveSmallIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(default=0)
+    rows_processed = models.PositiveIntegerField(default=0)
+    
+    # Partial results, updated after every chunk
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True, null=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Import of {self.original_name} for {self.user} ({self.status})"
@@ -1,6 +1,136 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from .models import zero_quantity_expression
 
 class CustomPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 30
+
+
+def estimate_count(queryset):
+    """
+    Row estimate of the query planner on PostgreSQL, which costs no scan.
+    Other backends have no usable estimate and get an exact count.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count(), False
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows']), True
+
+
+class ProductCursorPagination(BasePagination):
+    """
+    Keyset pagination for the product list, opted into with ?pagination=cursor.
+    Pages are ordered by (zero_quantity, created_at, id) and each page starts
+    right after the key of the previous one, so deep pages cost the same as
+    the first one (see the product_owner_listing_idx index).
+
+    The total is skipped unless ?count=exact or ?count=estimate is passed.
+    Pages only move forward, which is what infinite scroll needs. Other
+    sort_by orders are rejected rather than silently replaced, and searches
+    come in this order too instead of by relevance.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 30
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    sort_query_param = 'sort_by'
+    sort_fields = ('created_at',)
+    invalid_cursor_message = 'Invalid cursor'
+    invalid_sort_message = 'Cursor pages are sorted by created_at, use page numbers for other sorts.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        sort_by = request.query_params.get(self.sort_query_param)
+        if sort_by and sort_by not in self.sort_fields:
+            raise ValidationError({self.sort_query_param: self.invalid_sort_message})
+
+        self.page_size = self.get_page_size(request)
+        self.descending = request.query_params.get('sort_direction', 'desc').lower() == 'desc'
+
+        direction = '-' if self.descending else ''
+        queryset = queryset.annotate(
+            zero_quantity=zero_quantity_expression()
+        ).order_by('zero_quantity', f'{direction}created_at', f'{direction}id')
+
+        self.count, self.count_estimated = self.get_count(queryset, request)
+
+        cursor = self.decode_cursor(request)
+        if cursor:
+            queryset = queryset.filter(self.after(cursor))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, 'none').lower()
+        if mode == 'exact':
+            return queryset.count(), False
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None, False
+
+    def after(self, cursor):
+        zero_quantity, created_at, pk = cursor
+        lookup = 'lt' if self.descending else 'gt'
+        return (
+            Q(zero_quantity__gt=zero_quantity) |
+            Q(zero_quantity=zero_quantity, **{f'created_at__{lookup}': created_at}) |
+            Q(zero_quantity=zero_quantity, created_at=created_at, **{f'id__{lookup}': pk})
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+            created_at = parse_datetime(position['c'])
+            if created_at is None:
+                raise ValueError
+            return int(position['z']), created_at, int(position['i'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, product):
+        position = {'z': product.zero_quantity, 'c': product.created_at.isoformat(), 'i': product.pk}
+        return base64.urlsafe_b64encode(json.dumps(position).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'count': self.count,
+            'count_estimated': self.count_estimated,
+            'results': data,
+        })
@@ -0,0 +1,53 @@
+"""
+Product search over the denormalized ``Product.search_text`` column.
+
+Every search or brand word becomes one ``LIKE '%word%'`` on that column.
+On PostgreSQL these are served by the pg_trgm GIN index created in
+migration 0024; other backends scan the single column instead of joining
+categories and OR-ing three case-insensitive matches per word.
+"""
+from functools import reduce
+from operator import and_
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+
+
+def _words_filter(words):
+    return reduce(and_, (Q(search_text__contains=word) for word in words))
+
+
+def filter_search(queryset, search):
+    """Products whose brand, model name or reference contain every word of ``search``"""
+    words = search.lower().split()
+    if not words:
+        return queryset
+    return queryset.filter(_words_filter(words))
+
+
+def filter_brands(queryset, brands):
+    """Products matching any of ``brands``; a brand matches when all of its words do"""
+    brand_filter = Q()
+    for brand in brands:
+        words = brand.lower().split()
+        if words:
+            brand_filter |= _words_filter(words)
+    return queryset.filter(brand_filter) if brand_filter else queryset
+
+
+def annotate_search_rank(queryset, search):
+    """Adds ``search_rank``, higher for products closer to the whole search text"""
+    search = ' '.join(search.lower().split())
+
+    if connections[queryset.db].vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        return queryset.annotate(search_rank=TrigramSimilarity('search_text', search))
+
+    # Without pg_trgm: exact reference first, then products starting with the search
+    return queryset.annotate(
+        search_rank=Case(
+            When(product_id__iexact=search, then=Value(2.0)),
+            When(search_text__startswith=search, then=Value(1.0)),
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+    )
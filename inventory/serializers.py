@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Category, Product
+from django.urls import reverse
+from .models import Category, Product, ProductImportJob, PRODUCT_METRIC_FIELDS
+from .images import variant_urls
 from django.utils import timezone
 from datetime import datetime
 class CategorySerializer(serializers.ModelSerializer):
@@ -16,6 +18,7 @@ class ProductSerializer(serializers.ModelSerializer):
     date_purchased = serializers.DateTimeField(format="%Y-%m-%d")
     date_sold = serializers.DateTimeField(format="%Y-%m-%d", required=False, allow_null=True)
     hold_time = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     # reference_number = serializers.SerializerMethodField()
     class Meta:
         model = Product
@@ -25,15 +28,34 @@ class ProductSerializer(serializers.ModelSerializer):
             'buying_price',  'sold_price', 'wholesale_price','profit', 'profit_margin',
             'shipping_price', 'repair_cost', 'fees', 'commission',
             'msrp', 'website_price', 'purchased_from', 'sold_source', 'listed_on',
-            'image', 'is_sold', 'availability', 'condition',
+            'image', 'image_variants', 'is_sold', 'availability', 'condition',
             'serial_number', 'year'
         ]
         read_only_fields = ['created_at', 'updated_at', 'owner']
 
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        # Annotations loaded with the instance no longer match the saved values
+        for name in PRODUCT_METRIC_FIELDS:
+            instance.__dict__.pop(name, None)
+        return instance
+
+    # Read the ProductQuerySet.with_metrics() annotations when the product
+    # comes from an annotated queryset, otherwise compute them in Python
+
     def get_brand(self, obj):
+        if hasattr(obj, 'brand_name'):
+            return obj.brand_name
         return obj.category.name if obj.category else None
     
+    def get_image_variants(self, obj):
+        # Empty until the background worker has processed the current image
+        return variant_urls(obj)
+
     def get_hold_time(self, obj):
+        if hasattr(obj, 'hold_duration'):
+            return obj.hold_duration.days if obj.hold_duration is not None else None
+
         if not obj.date_purchased:
             return None
 
@@ -43,6 +65,9 @@ class ProductSerializer(serializers.ModelSerializer):
         return (end_date - start_date).days
     
     def get_profit(self, obj):
+        if hasattr(obj, 'profit_amount'):
+            return round(obj.profit_amount, 2) if obj.profit_amount is not None else None
+
         if not obj.sold_price:
             return None
             
@@ -57,6 +82,9 @@ class ProductSerializer(serializers.ModelSerializer):
         return round(profit, 2)
     
     def get_profit_margin(self, obj):
+        if hasattr(obj, 'margin_percent'):
+            return round(obj.margin_percent, 2) if obj.margin_percent is not None else None
+
         if not obj.sold_price or not obj.buying_price:
             return None
             
@@ -172,9 +200,58 @@ class BulkUpdateAvailabilitySerializer(serializers.Serializer):
         help_text="New availability status (in_stock, sold, reserved, in_repair)"
     )
 
+class BulkUpdatePricesSerializer(serializers.Serializer):
+    product_ids = serializers.ListField(
+        child=serializers.CharField(),
+        min_length=1,
+        help_text="List of product IDs to update"
+    )
+    buying_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    sold_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True)
+    wholesale_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True)
+    website_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True)
+    msrp = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError(
+                "Provide at least one of: buying_price, sold_price, wholesale_price, website_price, msrp"
+            )
+        return attrs
+
 class BulkDeleteProductsSerializer(serializers.Serializer):
     product_ids = serializers.ListField(
         child=serializers.CharField(),
         min_length=1,
         help_text="List of product IDs to delete"
     )
+
+
+class ProductImportJobSerializer(serializers.ModelSerializer):
+    error_count = serializers.SerializerMethodField()
+    error_report_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ProductImportJob
+        fields = [
+            'id', 'original_name', 'status', 'progress', 'total_rows', 'rows_processed',
+            'created_count', 'updated_count', 'error_count', 'error_report_url', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+    
+    def get_error_count(self, obj):
+        return len(obj.errors)
+    
+    def get_error_report_url(self, obj):
+        if not obj.errors:
+            return None
+        url = reverse('product-import-errors', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class ProductImportJobDetailSerializer(ProductImportJobSerializer):
+    """Includes the row errors and warnings found so far"""
+    
+    class Meta(ProductImportJobSerializer.Meta):
+        fields = ProductImportJobSerializer.Meta.fields + ['errors']
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from config.tasks import enqueue
+from .images import generate_image_variants, needs_variants
+from .models import Product
+
+
+@receiver(post_save, sender=Product)
+def schedule_image_variants(sender, instance, **kwargs):
+    # Compared against the saved source name, so saves that leave the image
+    # alone queue nothing
+    if needs_variants(instance):
+        enqueue(generate_image_variants, instance.pk)
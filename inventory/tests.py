@@ -1,3 +1,297 @@
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import parse_qs, urlparse
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from auth_.models import User
+from transactions.models import StockMovement, TransactionHistory, TransactionItem
+from .bulk import bulk_delete
+from .models import Category, Product
 
-# Create your tests here.
+
+def create_user(email):
+    # bulk_create skips the post_save signals (Stripe customer creation)
+    User.objects.bulk_create([User(email=email)])
+    return User.objects.get(email=email)
+
+
+def create_product(owner, product_id, buying_price, sold_price=None, quantity=1):
+    return Product.objects.create(
+        owner=owner,
+        product_id=product_id,
+        model_name=f'Model {product_id}',
+        category=Category.objects.get_or_create(name='Rolex')[0],
+        buying_price=buying_price,
+        sold_price=sold_price,
+        quantity=quantity,
+        date_purchased=timezone.now()
+    )
+
+
+class BulkMarkSoldTests(TestCase):
+    url = '/api/v1/inventory/bulk-mark-sold/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('bulk-sold@example.com')
+        cls.other = create_user('bulk-sold-other@example.com')
+        cls.first = create_product(cls.user, 'SOLD-1', Decimal('100'), Decimal('150'), quantity=2)
+        cls.second = create_product(cls.user, 'SOLD-2', Decimal('200'), Decimal('260'))
+        cls.foreign = create_product(cls.other, 'SOLD-3', Decimal('300'), Decimal('400'))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def mark_sold(self, *products):
+        return self.client.post(self.url, {'product_ids': [product.pk for product in products]}, format='json')
+
+    def test_marks_owned_products_sold_and_takes_them_out_of_stock(self):
+        response = self.mark_sold(self.first, self.second, self.foreign)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['matched_count'], 2)
+        self.assertEqual(response.data['skipped_ids'], [self.foreign.pk])
+        self.assertEqual(response.data['transactions_created'], 2)
+
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        # Sold only once nothing is left, like any other sale
+        self.assertEqual((self.first.quantity, self.first.availability, self.first.is_sold), (1, 'in_stock', False))
+        self.assertEqual((self.second.quantity, self.second.availability, self.second.is_sold), (0, 'sold', True))
+
+        # Product.quantity stays equal to the ledger balance
+        for product in (self.first, self.second):
+            balance = sum(StockMovement.objects.filter(product=product).values_list('quantity', flat=True))
+            self.assertEqual(balance, product.quantity)
+
+    def test_records_one_sale_with_stored_totals_per_product(self):
+        self.mark_sold(self.first, self.second)
+
+        sales = TransactionHistory.objects.filter(user=self.user, transaction_type='sale').order_by('sale_price')
+        self.assertEqual(
+            [(sale.items_total_sale, sale.items_total_purchase, sale.items_count, sale.items_quantity, sale.profit)
+             for sale in sales],
+            [
+                (Decimal('150'), Decimal('100'), 1, 1, Decimal('50')),
+                (Decimal('260'), Decimal('200'), 1, 1, Decimal('60')),
+            ]
+        )
+
+    def test_leaves_products_of_other_users_alone(self):
+        self.mark_sold(self.foreign)
+
+        self.foreign.refresh_from_db()
+        self.assertEqual((self.foreign.quantity, self.foreign.is_sold), (1, False))
+        self.assertFalse(TransactionHistory.objects.filter(user=self.user).exists())
+        self.assertFalse(TransactionHistory.objects.filter(user=self.other).exists())
+
+    def test_products_with_stock_left_stay_in_stock(self):
+        product = create_product(self.user, 'SOLD-4', Decimal('100'), Decimal('150'), quantity=3)
+
+        self.mark_sold(product)
+
+        product.refresh_from_db()
+        self.assertEqual(
+            (product.quantity, product.availability, product.is_sold, product.date_sold),
+            (2, 'in_stock', False, None)
+        )
+
+    def test_products_out_of_stock_are_marked_sold_without_a_sale(self):
+        product = create_product(self.user, 'SOLD-5', Decimal('100'), Decimal('150'), quantity=0)
+
+        response = self.mark_sold(product)
+
+        self.assertEqual(response.data['transactions_created'], 0)
+        product.refresh_from_db()
+        self.assertEqual((product.quantity, product.availability, product.is_sold), (0, 'sold', True))
+        self.assertIsNotNone(product.date_sold)
+
+    def test_marking_again_records_no_second_sale(self):
+        self.mark_sold(self.second)
+        response = self.mark_sold(self.second)
+
+        self.assertEqual(response.data['transactions_created'], 0)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.quantity, 0)
+        self.assertEqual(TransactionItem.objects.filter(product=self.second).count(), 1)
+
+
+class BulkDeleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('bulk-delete@example.com')
+        cls.kept = create_product(cls.user, 'DEL-1', Decimal('100'))
+        cls.deleted = [create_product(cls.user, f'DEL-{i}', Decimal('200')) for i in range(2, 12)]
+
+        # One trade holds the kept product and every deleted one
+        cls.trade = TransactionHistory.objects.create(
+            user=cls.user, transaction_type='sale', date=timezone.localdate()
+        )
+        TransactionItem.objects.bulk_create([
+            TransactionItem(
+                transaction=cls.trade, product=product, quantity=1,
+                purchase_price=product.buying_price, sale_price=Decimal('300')
+            )
+            for product in [cls.kept] + cls.deleted
+        ])
+        cls.trade.refresh_totals()
+
+    def test_refreshes_the_totals_of_affected_transactions_once(self):
+        # Scope, ids, the item delete, the product delete and one totals
+        # refresh, independent of the number of items
+        with self.assertNumQueries(12):
+            summary = bulk_delete(self.user, [product.pk for product in self.deleted])
+
+        self.assertEqual(summary['deleted_count'], 10)
+        self.trade.refresh_from_db()
+        self.assertEqual(
+            (self.trade.items_count, self.trade.items_total_sale, self.trade.items_total_purchase, self.trade.profit),
+            (1, Decimal('300'), Decimal('100'), Decimal('200'))
+        )
+
+
+class ProductCursorPaginationTests(TestCase):
+    url = '/api/v1/inventory/products/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('cursor-pages@example.com')
+        cls.products = [create_product(cls.user, f'CUR-{i}', Decimal(100 + i)) for i in range(5)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_walk_the_list_newest_first(self):
+        seen = []
+        params = {'pagination': 'cursor', 'page_size': 2}
+        while True:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(product['id'] for product in response.data['results'])
+            if not response.data['next']:
+                break
+            params['cursor'] = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+
+        self.assertEqual(seen, [product.pk for product in reversed(self.products)])
+
+    def test_other_sort_orders_are_rejected(self):
+        response = self.client.get(self.url, {'pagination': 'cursor', 'sort_by': 'created_at'})
+        self.assertEqual(response.status_code, 200)
+
+        for sort_by in ('profit', 'margin', 'buying_price', 'hold_time'):
+            response = self.client.get(self.url, {'pagination': 'cursor', 'sort_by': sort_by})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('sort_by', response.data['errors'])
+
+
+class ProductListSortFilterTests(TestCase):
+    url = '/api/v1/inventory/products/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('product-sorting@example.com')
+        cls.category = Category.objects.create(name='Omega')
+        now = timezone.now()
+
+        def product(product_id, buying_price, sold_price, held_days):
+            purchased = now - timedelta(days=held_days + (10 if sold_price else 0))
+            return Product.objects.create(
+                owner=cls.user,
+                product_id=product_id,
+                model_name=f'Model {product_id}',
+                category=cls.category,
+                buying_price=Decimal(buying_price),
+                sold_price=Decimal(sold_price) if sold_price else None,
+                quantity=1,
+                date_purchased=purchased,
+                date_sold=purchased + timedelta(days=held_days) if sold_price else None
+            )
+
+        # profit 50 / margin 50%, 60 / 30%, 20 / 5%, and one still held
+        cls.a = product('SORT-A', '100', '150', 10)
+        cls.b = product('SORT-B', '200', '260', 30)
+        cls.c = product('SORT-C', '400', '420', 5)
+        cls.d = product('SORT-D', '300', None, 60)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def listed(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [product['product_id'] for product in response.data['results']]
+
+    def test_sorts_on_the_metrics_with_unsold_products_last(self):
+        self.assertEqual(self.listed(sort_by='profit'), ['SORT-B', 'SORT-A', 'SORT-C', 'SORT-D'])
+        self.assertEqual(self.listed(sort_by='profit', sort_direction='asc'), ['SORT-C', 'SORT-A', 'SORT-B', 'SORT-D'])
+        self.assertEqual(self.listed(sort_by='margin'), ['SORT-A', 'SORT-B', 'SORT-C', 'SORT-D'])
+        self.assertEqual(self.listed(sort_by='hold_time', sort_direction='asc'), ['SORT-C', 'SORT-A', 'SORT-B', 'SORT-D'])
+        self.assertEqual(self.listed(sort_by='buying_price', sort_direction='asc'), ['SORT-A', 'SORT-B', 'SORT-D', 'SORT-C'])
+
+    def test_filters_on_metric_ranges(self):
+        self.assertEqual(self.listed(sort_by='profit', min_profit='30'), ['SORT-B', 'SORT-A'])
+        self.assertEqual(self.listed(max_margin='10'), ['SORT-C'])
+        self.assertEqual(
+            self.listed(sort_by='hold_time', sort_direction='asc', min_hold_time='10', max_hold_time='30'),
+            ['SORT-A', 'SORT-B']
+        )
+        self.assertEqual(
+            self.listed(sort_by='buying_price', min_buying_price='200', max_buying_price='300'),
+            ['SORT-D', 'SORT-B']
+        )
+
+    def test_invalid_range_values_are_rejected(self):
+        response = self.client.get(self.url, {'min_profit': 'abc', 'max_margin': 'NaN', 'min_hold_time': '1.5', 'max_year': '2020'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.data['errors']), ['max_margin', 'min_hold_time', 'min_profit'])
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        # The page count and one select with every metric annotated
+        with self.assertNumQueries(2):
+            self.listed(sort_by='margin', min_profit='0')
+
+        for i in range(10):
+            create_product(self.user, f'SORT-X{i}', Decimal('50'), Decimal('70'))
+        with self.assertNumQueries(2):
+            self.listed(sort_by='margin', min_profit='0')
+
+
+class ProductFacetTests(TestCase):
+    url = '/api/v1/inventory/products/facets/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('product-facets@example.com')
+        for product_id, year, purchased_from in (
+            ('FAC-1', 2020, 'Dealer'), ('FAC-2', 2020, 'Dealer'), ('FAC-3', 2021, None), ('FAC-4', 2019, 'Auction'),
+        ):
+            product = create_product(cls.user, product_id, Decimal('100'))
+            Product.objects.filter(pk=product.pk).update(year=year, purchased_from=purchased_from)
+        create_product(create_user('product-facets-other@example.com'), 'FAC-5', Decimal('100'))
+
+    def test_counts_every_facet_with_typed_values(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        # One UNION ALL query for every facet
+        with self.assertNumQueries(1):
+            response = client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'total': 4,
+            'facets': {
+                'brand': [{'value': 'Rolex', 'count': 4}],
+                'condition': [{'value': 'new', 'count': 4}],
+                'availability': [{'value': 'in_stock', 'count': 4}],
+                'year': [{'value': 2020, 'count': 2}, {'value': 2019, 'count': 1}, {'value': 2021, 'count': 1}],
+                'seller': [{'value': 'Dealer', 'count': 2}, {'value': None, 'count': 1}, {'value': 'Auction', 'count': 1}],
+                'buyer': [{'value': None, 'count': 4}],
+            },
+        })
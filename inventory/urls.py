@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, ProductViewSet, DashboardStatsView, ProductCSVUploadAPIView, BulkMarkProductsSoldView, BulkProductOperationsView
+from .views import CategoryViewSet, ProductViewSet, DashboardStatsView, ProductCSVUploadAPIView, ProductImportJobListAPIView, ProductImportJobDetailAPIView, ProductImportErrorReportAPIView, BulkMarkProductsSoldView, BulkProductOperationsView
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
@@ -10,6 +10,9 @@ urlpatterns = [
     path('', include(router.urls)),
     path('stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
     path('upload-products/', ProductCSVUploadAPIView.as_view(), name='upload-products'),
+    path('imports/', ProductImportJobListAPIView.as_view(), name='product-imports'),
+    path('imports/<int:pk>/', ProductImportJobDetailAPIView.as_view(), name='product-import-detail'),
+    path('imports/<int:pk>/errors/', ProductImportErrorReportAPIView.as_view(), name='product-import-errors'),
     path('bulk-mark-sold/', BulkMarkProductsSoldView.as_view(), name='bulk-mark-sold'),
     path('bulk-operations/', BulkProductOperationsView.as_view(), name='bulk-operations'),
 ]
\ No newline at end of file
@@ -3,26 +3,34 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from .models import Category, Product
-from .serializers import CategorySerializer, ProductSerializer, ProductCreateSerializer, BulkProductSoldSerializer, BulkUpdateAvailabilitySerializer, BulkDeleteProductsSerializer
+from .models import Category, Product, zero_quantity_expression
+from .serializers import CategorySerializer, ProductSerializer, ProductCreateSerializer, BulkProductSoldSerializer, BulkUpdateAvailabilitySerializer, BulkUpdatePricesSerializer, BulkDeleteProductsSerializer
 from rest_framework.permissions import AllowAny
-from io import TextIOWrapper
 from inventory.models import Product, Category
 from transactions.models import TransactionHistory
 from datetime import timedelta
 from rest_framework.views import APIView
 from django.db.models import Sum, Count, Q, F
+from django.db.models.functions import Coalesce
 from django.db.models import Q, Case, When, Value, IntegerField
-from .pagination import CustomPagination
+from .pagination import CustomPagination, ProductCursorPagination
 import csv
-import openpyxl
 from .models import Product, User, Category
 from django.utils.dateparse import parse_date
 from decimal import Decimal, InvalidOperation
 from datetime import datetime
 from django.db import transaction
+from rest_framework.exceptions import ValidationError
 from transactions.models import TransactionHistory, TransactionItem
 from customers.models import Customer
+from django.http import HttpResponse
+from config.tasks import enqueue
+from .models import ProductImportJob
+from .serializers import ProductImportJobSerializer, ProductImportJobDetailSerializer
+from .search import filter_search, filter_brands, annotate_search_rank
+from .facets import product_facets
+from .bulk import PRICE_FIELDS, bulk_mark_sold, bulk_update_availability, bulk_update_prices, bulk_delete
+from .importers import ProductImporter, RowSource, ImportFileError, SUPPORTED_EXTENSIONS, run_product_import
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -33,9 +41,41 @@ class ProductViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination
     
+    # sort_by values and the field or with_metrics() annotation they order by
+    SORT_FIELDS = {
+        'id': 'id',
+        'created_at': 'created_at',
+        'buying_price': 'buying_price',
+        'sold_price': 'sold_price',
+        'profit': 'profit_amount',
+        'margin': 'margin_percent',
+        'hold_time': 'hold_duration',
+        'year': 'year',
+    }
+    
+    # min_<name> / max_<name> query parameters, their field and value parser
+    RANGE_FILTERS = {
+        'buying_price': ('buying_price', Decimal),
+        'sold_price': ('sold_price', Decimal),
+        'profit': ('profit_amount', Decimal),
+        'margin': ('margin_percent', Decimal),
+        'hold_time': ('hold_duration', int),
+        'year': ('year', int),
+    }
+    
+    @property
+    def paginator(self):
+        # ?pagination=cursor switches the list to keyset pages for infinite scroll
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = ProductCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+    
     def get_queryset(self):
         user = self.request.user
-        queryset = Product.objects.filter(owner=user)
+        queryset = Product.objects.filter(owner=user).with_metrics()
         
         search = self.request.query_params.get('search')
         brands = self.request.query_params.getlist('brand')
@@ -44,7 +84,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         condition = self.request.query_params.get('condition')
         buyer = self.request.query_params.get('buyer')
         seller = self.request.query_params.get('seller')
-        sort_by = self.request.query_params.get('sort_by', 'created_at')  # Default sort by created_at
+        sort_by = self.request.query_params.get('sort_by')  # Defaults to created_at, or relevance when searching
         sort_direction = self.request.query_params.get('sort_direction', 'desc')  # Default descending
         is_transaction = self.request.query_params.get('is_transaction')
         
@@ -53,44 +93,10 @@ class ProductViewSet(viewsets.ModelViewSet):
         
         # Global search functionality
         if search:
-            search_terms = search.strip().split()
-            if search_terms:
-                search_filters = []
-                for term in search_terms:
-                    term_filter = (
-                        Q(model_name__icontains=term) | 
-                        Q(product_id__icontains=term) | 
-                        Q(category__name__icontains=term)
-                    )
-                    search_filters.append(term_filter)
-                
-                if search_filters:
-                    combined_search_filter = search_filters[0]
-                    for filter_item in search_filters[1:]:
-                        combined_search_filter &= filter_item
-                    queryset = queryset.filter(combined_search_filter)
+            queryset = filter_search(queryset, search)
         
         if brands:
-            brand_queries = []
-            for brand in brands:
-                brand_words = brand.strip().split()
-                if brand_words:
-                    product_filters = []
-                    for word in brand_words:
-                        word_filter = Q(model_name__icontains=word) | Q(category__name__icontains=word)
-                        product_filters.append(word_filter)
-                    
-                    if product_filters:
-                        combined_filter = product_filters[0]
-                        for filter_item in product_filters[1:]:
-                            combined_filter &= filter_item
-                        brand_queries.append(combined_filter)
-            
-            if brand_queries:
-                brand_filter = brand_queries[0]
-                for query in brand_queries[1:]:
-                    brand_filter |= query
-                queryset = queryset.filter(brand_filter)
+            queryset = filter_brands(queryset, brands)
         
         if start_date:
             queryset = queryset.filter(date_purchased__gte=start_date)
@@ -107,33 +113,51 @@ class ProductViewSet(viewsets.ModelViewSet):
         if seller:
             queryset = queryset.filter(purchased_from__icontains=seller)
         
-        valid_sort_fields = ['id', 'created_at']
-        if sort_by in valid_sort_fields:
-            if sort_direction.lower() == 'desc':
-                queryset = queryset.annotate(
-                    zero_quantity=Case(
-                        When(quantity=0, then=Value(1)),
-                        default=Value(0),
-                        output_field=IntegerField()
-                    )
-                ).order_by('zero_quantity', f'-{sort_by}')
-            else:
-                queryset = queryset.annotate(
-                    zero_quantity=Case(
-                        When(quantity=0, then=Value(1)),
-                        default=Value(0),
-                        output_field=IntegerField()
-                    )
-                ).order_by('zero_quantity', sort_by)
+        queryset = self.filter_ranges(queryset)
+        
+        queryset = queryset.annotate(zero_quantity=zero_quantity_expression())
+        descending = sort_direction.lower() == 'desc'
+        
+        if sort_by in self.SORT_FIELDS:
+            field = F(self.SORT_FIELDS[sort_by])
+            queryset = queryset.order_by(
+                'zero_quantity',
+                field.desc(nulls_last=True) if descending else field.asc(nulls_last=True),
+                '-id' if descending else 'id'
+            )
+        elif search and search.split():
+            # Best matches first unless an explicit sort was requested
+            queryset = annotate_search_rank(queryset, search).order_by('zero_quantity', '-search_rank', '-created_at')
         else:
-            queryset = queryset.annotate(
-                zero_quantity=Case(
-                    When(quantity=0, then=Value(1)),
-                    default=Value(0),
-                    output_field=IntegerField()
-                )
-            ).order_by('zero_quantity', '-created_at')
+            queryset = queryset.order_by('zero_quantity', '-created_at', '-id')
+        
+        return queryset
+
+    def filter_ranges(self, queryset):
+        errors = {}
+        for name, (field, parse) in self.RANGE_FILTERS.items():
+            for bound, lookup in (('min', 'gte'), ('max', 'lte')):
+                param = f'{bound}_{name}'
+                raw = self.request.query_params.get(param)
+                if raw in (None, ''):
+                    continue
+                try:
+                    value = parse(raw.strip())
+                    if isinstance(value, Decimal) and not value.is_finite():
+                        raise ValueError
+                except (ValueError, ArithmeticError):
+                    errors[param] = 'Enter a valid number.'
+                    continue
+                
+                if field == 'hold_duration':
+                    # Hold time is shown in whole days, so max_hold_time=N keeps day N
+                    value = timedelta(days=value + 1) if bound == 'max' else timedelta(days=value)
+                    lookup = 'lt' if bound == 'max' else 'gte'
+                
+                queryset = queryset.filter(**{f'{field}__{lookup}': value})
         
+        if errors:
+            raise ValidationError(errors)
         return queryset
 
     def get_serializer_class(self):
@@ -164,6 +188,19 @@ class ProductViewSet(viewsets.ModelViewSet):
             return Response(response_serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Product counts per brand, condition, availability, year, seller and
+        buyer under the same filters as the product list
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        counts = product_facets(queryset)
+        return Response({
+            'total': sum(item['count'] for item in counts['brand']),
+            'facets': counts,
+        })
+    
     @action(detail=False, methods=['get'])
     def unsold(self, request):
         unsold_products = self.get_queryset().filter(date_sold__isnull=True)
@@ -264,22 +301,20 @@ class DashboardStatsView(APIView):
             created_at__gte=seven_days_ago
         ).count()
         
-        sales_transactions = TransactionHistory.objects.filter(
+        sales = TransactionHistory.objects.filter(
             user=user,
             transaction_type='sale',
             date__gte=seven_days_ago
+        ).aggregate(
+            revenue=Coalesce(Sum('items_total_sale'), Decimal('0')),
+            items_count=Coalesce(Sum('items_count'), 0),
+            items_cost=Coalesce(Sum('items_total_purchase'), Decimal('0')),
+            profit=Coalesce(Sum('profit'), Decimal('0')),
         )
         
-        revenue = sum(transaction.total_sale_price for transaction in sales_transactions)
-        
-        transaction_items = TransactionItem.objects.filter(
-            transaction__user=user,
-            transaction__transaction_type='sale',
-            transaction__date__gte=seven_days_ago
-        )
-        
-        top_selling_count = transaction_items.count()
-        top_selling_cost = sum(item.total_purchase_price for item in transaction_items)
+        revenue = sales['revenue']
+        top_selling_count = sales['items_count']
+        top_selling_cost = sales['items_cost']
         
         ordered_count = Product.objects.filter(
             owner=user,
@@ -292,7 +327,7 @@ class DashboardStatsView(APIView):
             availability='in_stock'
         ).count()
         
-        profit = sum(transaction.profit or 0 for transaction in sales_transactions)
+        profit = sales['profit']
         
         return Response({
             "categories": {
@@ -322,40 +357,11 @@ class DashboardStatsView(APIView):
 
 class ProductCSVUploadAPIView(APIView):
 
-    @staticmethod
-    def parse_decimal(value, default=0):
-        if value is None:
-            return Decimal(default)
-        try:
-            if isinstance(value, str):
-                value = value.strip().replace(',', '')
-            return Decimal(str(value))
-        except (InvalidOperation, ValueError, TypeError):
-            return Decimal(default)
-
-    @staticmethod
-    def to_date(value):
-        if not value:
-            return None
-            
-        if isinstance(value, datetime):
-            return value.date()
-            
-        if not isinstance(value, str):
-            return None
-            
-        value = value.strip()
-        formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%d-%m-%Y']
-        
-        for date_format in formats:
-            try:
-                return datetime.strptime(value, date_format).date()
-            except ValueError:
-                continue
-                
-        return None
-            
     def post(self, request, *args, **kwargs):
+        """
+        Queue an import of a CSV or Excel file and return the import job.
+        With ?sync=true the file is imported within the request instead.
+        """
         uploaded_file = request.FILES.get('excel_file')
         if not uploaded_file:
             return Response({'error': 'No file provided.'}, status=400)
@@ -363,296 +369,98 @@ class ProductCSVUploadAPIView(APIView):
         if uploaded_file.size == 0:
             return Response({'error': 'The uploaded file is empty (zero bytes).'}, status=400)
 
-        filename = uploaded_file.name.lower()
+        if not uploaded_file.name.lower().endswith(SUPPORTED_EXTENSIONS):
+            return Response({'error': 'Unsupported file format. Please upload CSV or Excel file.'}, status=400)
 
-        try:
-            # Parse file based on extension
-            if filename.endswith('.csv'):
-                reader = csv.DictReader(TextIOWrapper(uploaded_file.file, encoding='utf-8'))
-                rows = list(reader)
-                if not rows:
-                    return Response({'error': 'The uploaded CSV file is empty.'}, status=400)
-                
-                non_empty_rows = 0
-                for row in rows:
-                    has_data = False
-                    for key, value in row.items():
-                        if value and (not isinstance(value, str) or value.strip()):
-                            has_data = True
-                            break
-                    if has_data:
-                        non_empty_rows += 1
-                
-                if non_empty_rows == 0:
-                    return Response({'error': 'The uploaded CSV file contains only empty rows.'}, status=400)
-                
-            elif filename.endswith(('.xlsx', '.xls')):
-                wb = openpyxl.load_workbook(uploaded_file)
-                sheet = wb.active
-                if sheet.max_row <= 1:
-                    return Response({'error': 'The uploaded Excel file is empty or contains only headers.'}, status=400)
-                    
-                headers = [cell.value for cell in sheet[1] if cell.value]
-                if not headers:
-                    return Response({'error': 'The uploaded Excel file does not contain valid headers.'}, status=400)
-                    
-                rows = [
-                    {headers[i]: cell.value for i, cell in enumerate(row) if i < len(headers)}
-                    for row in sheet.iter_rows(min_row=2)
-                ]
-                if not rows:
-                    return Response({'error': 'The uploaded Excel file does not contain any data rows.'}, status=400)
-                
-                non_empty_rows = 0
-                for row in rows:
-                    has_data = False
-                    for key, value in row.items():
-                        if value and (not isinstance(value, str) or value.strip()):
-                            has_data = True
-                            break
-                    if has_data:
-                        non_empty_rows += 1
-                
-                if non_empty_rows == 0:
-                    return Response({'error': 'The uploaded Excel file contains only empty rows.'}, status=400)
+        if request.query_params.get('sync', '').lower() in ('1', 'true'):
+            importer = ProductImporter(self.request.user)
+            try:
+                result = importer.run_source(RowSource(uploaded_file.file, uploaded_file.name))
+            except ImportFileError as e:
+                response = {'error': str(e)}
+                if importer.created or importer.updated:
+                    # Chunks read before a broken row are already imported
+                    response.update(importer.result())
+                return Response(response, status=400)
+
+            return Response(result, status=201)
+
+        with transaction.atomic():
+            job = ProductImportJob.objects.create(
+                user=request.user,
+                file=uploaded_file,
+                original_name=uploaded_file.name
+            )
+            enqueue(run_product_import, job.pk)
+
+        serializer = ProductImportJobSerializer(job, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class ProductImportJobListAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CustomPagination
+
+    def get(self, request):
+        """
+        List the user's product imports, newest first
+        """
+        jobs = ProductImportJob.objects.filter(user=request.user)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(jobs, request)
+        serializer = ProductImportJobSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+
+class ProductImportJobDetailAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        """
+        Status, progress and partial results of one import
+        """
+        job = get_object_or_404(ProductImportJob, pk=pk, user=request.user)
+        return Response(ProductImportJobDetailSerializer(job, context={'request': request}).data)
+
+
+class ProductImportErrorReportAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        """
+        Row errors and warnings of an import as a CSV file
+        """
+        job = get_object_or_404(ProductImportJob, pk=pk, user=request.user)
+
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="import-{job.pk}-errors.csv"'
+
+        writer = csv.writer(response)
+        writer.writerow(['Row', 'Type', 'Message'])
+        for entry in job.errors:
+            if 'warning' in entry:
+                writer.writerow([entry['row'], 'warning', entry['warning']])
             else:
-                return Response({'error': 'Unsupported file format. Please upload CSV or Excel file.'}, status=400)
-        except Exception as e:
-            return Response({'error': f'Error processing file: {str(e)}'}, status=400)
-
-        has_valid_data = False
-        for row in rows:
-            normalized_row = self._normalize_row(row)
-            product_id = normalized_row.get('Reference')
-            serial_number = normalized_row.get('Serial Number')
-            model_name = normalized_row.get('Model Name')
-            
-            if product_id or serial_number or model_name:
-                has_valid_data = True
-                break
-        
-        if not has_valid_data:
-            return Response({'error': 'The file does not contain any valid product data. Each product requires at least one of: Reference, Serial Number, or Model Name.'}, status=400)
+                writer.writerow([entry['row'], 'error', entry.get('error')])
 
-        created = 0
-        updated = 0
-        errors = []
-        user = self.request.user
-        
-        for index, row in enumerate(rows, start=2):
-            try:
-                with transaction.atomic():
-                    normalized_row = self._normalize_row(row)
-                    
-                    product_id = normalized_row.get('Reference')
-                    serial_number = normalized_row.get('Serial Number')
-                    model_name = normalized_row.get('Model Name')
-                    
-                    if not (product_id or serial_number or model_name):
-                        continue
-                        
-                    buy_price = self.parse_decimal(normalized_row.get('Buy Price'))
-                    total_cost = self.parse_decimal(normalized_row.get('Total Cost'))
-                    sell_price = self.parse_decimal(normalized_row.get('Sell Price'))
-                    shipping_price = self.parse_decimal(normalized_row.get('Shipping'))
-                    repair_cost = self.parse_decimal(normalized_row.get('Expense'))
-                    
-                    profit = sell_price - buy_price
-                    profit_margin = int((profit / buy_price) * 100) if buy_price else 0
-                    
-                    brand_name = normalized_row.get('Brand') or 'Unnamed Product'
-                    category_name = brand_name.strip()
-                    category, _ = Category.objects.get_or_create(
-                        name__iexact=category_name,
-                        defaults={'name': category_name}
-                    )
-                    
-                    date_purchased = self.to_date(normalized_row.get('Purchase Date'))
-                    sold_date = self.to_date(normalized_row.get('Sold Date'))
-                    
-                    if not product_id:
-                        product_id = f'custom-id-{index}'
-
-                    existing_product = None
-                    if product_id or serial_number:
-                        q_filter = Q()
-                        if product_id:
-                            q_filter |= Q(product_id=product_id)
-                        if serial_number:
-                            q_filter |= Q(serial_number=serial_number)
-                        
-                        existing_products = Product.objects.filter(q_filter, owner=user)
-                        if existing_products.exists():
-                            existing_product = existing_products.first()
-
-                    if not existing_product and product_id:
-                        if Product.objects.filter(product_id=product_id).exists():
-                            original_id = product_id
-                            # product_id = f"{product_id}-{int(timezone.now().timestamp())}"
-                            errors.append({
-                                'row': index, 
-                                'warning': f"Product ID '{original_id}' already exists. Created with modified ID '{product_id}'"
-                            })
-
-                    product_data = {
-                        'owner': user,
-                        'model_name': model_name or brand_name,
-                        'product_id': product_id,
-                        'serial_number': serial_number,
-                        'category': category,
-                        'profit_margin': profit_margin,
-                        'availability': self.map_availability(normalized_row.get('Deal Status')),
-                        'buying_price': buy_price,
-                        'shipping_price': shipping_price,
-                        'repair_cost': repair_cost,
-                        'sold_price': sell_price,
-                        'quantity': normalized_row.get('Quantity') or 1,
-                        'date_purchased': date_purchased,
-                        'date_sold': sold_date,
-                        'source_of_sale': normalized_row.get('Sold To') or '',
-                        'purchased_from': normalized_row.get('Bought From') or '',
-                        'sold_source': normalized_row.get('Payment Sent account') or '',
-                        'listed_on': normalized_row.get('Delivery Content') or '',
-                        'wholesale_price': total_cost,
-                    }
-
-                    product = None
-                    if existing_product:
-                        for key, value in product_data.items():
-                            setattr(existing_product, key, value)
-                        existing_product.save()
-                        product = existing_product
-                        updated += 1
-                    else:
-                        product = Product.objects.create(**product_data)
-                        created += 1
-                    
-                    # Create transaction if sell price and sold date are present
-                    if buy_price and date_purchased:
-                        # Check if a purchase transaction already exists for this product
-                        if not TransactionItem.objects.filter(
-                            product=product, 
-                            transaction__transaction_type='purchase'
-                        ).exists():
-                            purchase_transaction_data = {
-                                'user': user,
-                                'name_of_trade': f"{product.model_name} Purchase",
-                                'transaction_type': 'purchase',
-                                'date': date_purchased,
-                                'purchase_price': buy_price,
-                                'expenses': {
-                                    'shipping': float(shipping_price) if shipping_price else 0,
-                                    'repair_cost': float(repair_cost) if repair_cost else 0
-                                }
-                            }
-                            
-                            # Get supplier if available
-                            bought_from = normalized_row.get('Bought From')
-                            if bought_from:
-                                supplier, _ = Customer.objects.get_or_create(
-                                    name=bought_from,
-                                    defaults={
-                                        'user': user,
-                                        'is_supplier': True
-                                    }
-                                )
-                                purchase_transaction_data['customer'] = supplier
-                            
-                            # Create purchase transaction
-                            purchase_transaction = TransactionHistory.objects.create(
-                                **purchase_transaction_data
-                            )
-                            
-                            # Create purchase transaction item
-                            TransactionItem.objects.create(
-                                transaction=purchase_transaction,
-                                product=product,
-                                quantity=product.quantity or 1,
-                                purchase_price=buy_price
-                            )
-                    
-                    # Create sale transaction if sell price and sold date are present
-                    if sell_price and sold_date:
-                        # Check if a sale transaction already exists for this product
-                        if not TransactionItem.objects.filter(
-                            product=product, 
-                            transaction__transaction_type='sale'
-                        ).exists():
-                            sale_transaction_data = {
-                                'user': user,
-                                'name_of_trade': f"{product.model_name} Sale",
-                                'transaction_type': 'sale',
-                                'date': sold_date,
-                                'sale_price': sell_price,
-                                'expenses': {
-                                    'repair_cost': float(repair_cost) if repair_cost else 0
-                                }
-                            }
-                            
-                            # Get customer if available
-                            sold_to = normalized_row.get('Sold To')
-                            if sold_to:
-                                customer, _ = Customer.objects.get_or_create(
-                                    name=sold_to,
-                                    defaults={'user': user}
-                                )
-                                sale_transaction_data['customer'] = customer
-                            
-                            # Set sale category if available
-                            sale_category = normalized_row.get('Sale Category')
-                            if sale_category and sale_category.lower() in [choice[0] for choice in TransactionHistory.SALE_CATEGORY_CHOICES]:
-                                sale_transaction_data['sale_category'] = sale_category.lower()
-                            
-                            # Create sale transaction
-                            sale_transaction = TransactionHistory.objects.create(
-                                **sale_transaction_data
-                            )
-                            
-                            # Create sale transaction item
-                            TransactionItem.objects.create(
-                                transaction=sale_transaction,
-                                product=product,
-                                quantity=1,
-                                sale_price=sell_price,
-                                purchase_price=buy_price  # Include original purchase price
-                            )
-                    
-            except Exception as e:
-                errors.append({'row': index, 'error': str(e)})
+        return response
+
+def parse_product_ids(validated_data):
+    return [int(str(pid).strip()) for pid in validated_data['product_ids']]
+
+
+def bulk_response(summary, message, **extra):
+    """Legacy response keys of the bulk endpoints plus the operation summary"""
+    changed = summary.get('updated_count', summary.get('deleted_count', 0))
+    return Response({
+        'status': 'success' if changed > 0 else 'no_match',
+        'message': message,
+        **summary,
+        **extra,
+    })
 
-        return Response({
-            'created': created,
-            'updated': updated,
-            'errors': errors,
-            'total_processed': created + updated,
-            'total_rows': len(rows),
-        }, status=201)
-
-    def _normalize_row(self, row):
-        return {
-            key.strip() if isinstance(key, str) else key: 
-            (value.strip() if isinstance(value, str) else value)
-            for key, value in row.items()
-            if key is not None
-        }
 
-    def map_availability(self, deal_status):
-        if not deal_status:
-            return 'in_stock'
-            
-        if isinstance(deal_status, str):
-            deal_status = deal_status.strip().lower()
-            
-        mapping = {
-            'sold': 'sold',
-            'in stock': 'in_stock',
-            'instock': 'in_stock',
-            'reserved': 'reserved',
-            'in repair': 'in_repair',
-            'repair': 'in_repair'
-        }
-        return mapping.get(deal_status.lower(), 'in_stock')
-    
 class BulkProductOperationsView(APIView):
     AVAILABILITY_CHOICES = [
         ('in_stock', 'In Stock'),
@@ -668,12 +476,14 @@ class BulkProductOperationsView(APIView):
             return self._mark_products_sold(request)
         elif action == 'update_availability':
             return self._update_availability(request)
+        elif action == 'update_prices':
+            return self._update_prices(request)
         elif action == 'bulk_delete':
             return self._bulk_delete(request)
         else:
             return Response({
                 'status': 'error',
-                'message': 'Invalid action. Supported actions: mark_sold, update_availability, bulk_delete'
+                'message': 'Invalid action. Supported actions: mark_sold, update_availability, update_prices, bulk_delete'
             }, status=400)
     
     def _mark_products_sold(self, request):
@@ -681,7 +491,7 @@ class BulkProductOperationsView(APIView):
         serializer.is_valid(raise_exception=True)
         
         try:
-            product_ids = [int(str(pid).strip()) for pid in serializer.validated_data['product_ids']]
+            product_ids = parse_product_ids(serializer.validated_data)
         except ValueError:
             return Response({
                 'status': 'error',
@@ -689,32 +499,25 @@ class BulkProductOperationsView(APIView):
             }, status=400)
         
         try:
-            with transaction.atomic():
-                updated_count = Product.objects.filter(id__in=product_ids).update(
-                    is_sold=True,
-                    availability='sold',
-                    date_sold=timezone.now()
-                )
-                
-                return Response({
-                    'status': 'success' if updated_count > 0 else 'no_match',
-                    'message': f'Found and updated {updated_count} product(s) as sold',
-                    'updated_count': updated_count,
-                    'requested_ids': product_ids
-                })
-                
+            summary = bulk_mark_sold(request.user, product_ids)
         except Exception as e:
             return Response({
                 'status': 'error',
                 'message': f'Error marking products as sold: {str(e)}'
             }, status=500)
+        
+        return bulk_response(
+            summary,
+            f"Found and updated {summary['updated_count']} product(s) as sold",
+            requested_ids=product_ids
+        )
     
     def _update_availability(self, request):
         serializer = BulkUpdateAvailabilitySerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         try:
-            product_ids = [int(str(pid).strip()) for pid in serializer.validated_data['product_ids']]
+            product_ids = parse_product_ids(serializer.validated_data)
             new_availability = serializer.validated_data['availability']
         except ValueError:
             return Response({
@@ -730,43 +533,58 @@ class BulkProductOperationsView(APIView):
             }, status=400)
         
         try:
-            with transaction.atomic():
-                update_fields = {'availability': new_availability}
-                
-                # Handle specific availability updates
-                if new_availability == 'sold':
-                    update_fields.update({
-                        'is_sold': True,
-                        'date_sold': timezone.now()
-                    })
-                elif new_availability == 'in_stock':
-                    update_fields.update({
-                        'is_sold': False,
-                        'date_sold': None
-                    })
-                
-                updated_count = Product.objects.filter(id__in=product_ids).update(**update_fields)
-                
-                return Response({
-                    'status': 'success' if updated_count > 0 else 'no_match',
-                    'message': f'Found and updated {updated_count} product(s) to {new_availability}',
-                    'updated_count': updated_count,
-                    'requested_ids': product_ids,
-                    'new_availability': new_availability
-                })
-                
+            summary = bulk_update_availability(request.user, product_ids, new_availability)
         except Exception as e:
             return Response({
                 'status': 'error',
                 'message': f'Error updating product availability: {str(e)}'
             }, status=500)
+        
+        return bulk_response(
+            summary,
+            f"Found and updated {summary['updated_count']} product(s) to {new_availability}",
+            requested_ids=product_ids,
+            new_availability=new_availability
+        )
+    
+    def _update_prices(self, request):
+        serializer = BulkUpdatePricesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            product_ids = parse_product_ids(serializer.validated_data)
+        except ValueError:
+            return Response({
+                'status': 'error',
+                'message': 'Invalid product ID format'
+            }, status=400)
+        
+        prices = {
+            field: serializer.validated_data[field]
+            for field in PRICE_FIELDS if field in serializer.validated_data
+        }
+        
+        try:
+            summary = bulk_update_prices(request.user, product_ids, prices)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': f'Error updating product prices: {str(e)}'
+            }, status=500)
+        
+        return bulk_response(
+            summary,
+            f"Found and updated prices of {summary['updated_count']} product(s)",
+            requested_ids=product_ids,
+            prices=prices
+        )
     
     def _bulk_delete(self, request):
         serializer = BulkDeleteProductsSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         try:
-            product_ids = [int(str(pid).strip()) for pid in serializer.validated_data['product_ids']]
+            product_ids = parse_product_ids(serializer.validated_data)
         except ValueError:
             return Response({
                 'status': 'error',
@@ -774,32 +592,21 @@ class BulkProductOperationsView(APIView):
             }, status=400)
         
         try:
-            with transaction.atomic():
-                products_to_delete = Product.objects.filter(id__in=product_ids)
-                deleted_count = products_to_delete.count()
-                
-                if deleted_count == 0:
-                    return Response({
-                        'status': 'no_match',
-                        'message': 'No products found with the provided IDs',
-                        'deleted_count': 0,
-                        'requested_ids': product_ids
-                    })
-                
-                products_to_delete.delete()
-                
-                return Response({
-                    'status': 'success',
-                    'message': f'Successfully deleted {deleted_count} product(s)',
-                    'deleted_count': deleted_count,
-                    'requested_ids': product_ids
-                })
-                
+            summary = bulk_delete(request.user, product_ids)
         except Exception as e:
             return Response({
                 'status': 'error',
                 'message': f'Error deleting products: {str(e)}'
             }, status=500)
+        
+        if summary['deleted_count'] == 0:
+            return bulk_response(summary, 'No products found with the provided IDs', requested_ids=product_ids)
+        
+        return bulk_response(
+            summary,
+            f"Successfully deleted {summary['deleted_count']} product(s)",
+            requested_ids=product_ids
+        )
 
 
 from rest_framework import serializers
@@ -821,7 +628,7 @@ class BulkMarkProductsSoldView(APIView):
         serializer = BulkProductSoldSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         try:
-            product_ids = [int(str(pid).strip()) for pid in serializer.validated_data['product_ids']]
+            product_ids = parse_product_ids(serializer.validated_data)
         except ValueError:
             return Response({
                 'status': 'error',
@@ -829,25 +636,18 @@ class BulkMarkProductsSoldView(APIView):
             }, status=400)
         
         try:
-            with transaction.atomic():
-                updated_count = Product.objects.filter(id__in=product_ids).update(
-                    is_sold=True,
-                    availability='sold',
-                    date_sold=timezone.now()
-                )
-                
-                return Response({
-                    'status': 'success' if updated_count > 0 else 'no_match',
-                    'message': f'Found and updated {updated_count} product(s)',
-                    'updated_count': updated_count,
-                    'requested_ids': product_ids
-                })
-                
+            summary = bulk_mark_sold(request.user, product_ids)
         except Exception as e:
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=500)
+        
+        return bulk_response(
+            summary,
+            f"Found and updated {summary['updated_count']} product(s)",
+            requested_ids=product_ids
+        )
 
 
 class BulkDeleteProductsView(APIView):
@@ -858,7 +658,7 @@ class BulkDeleteProductsView(APIView):
         serializer.is_valid(raise_exception=True)
         
         try:
-            product_ids = [int(str(pid).strip()) for pid in serializer.validated_data['product_ids']]
+            product_ids = parse_product_ids(serializer.validated_data)
         except ValueError:
             return Response({
                 'status': 'error',
@@ -866,29 +666,18 @@ class BulkDeleteProductsView(APIView):
             }, status=400)
         
         try:
-            with transaction.atomic():
-                products_to_delete = Product.objects.filter(id__in=product_ids)
-                deleted_count = products_to_delete.count()
-                
-                if deleted_count == 0:
-                    return Response({
-                        'status': 'no_match',
-                        'message': 'No products found with the provided IDs',
-                        'deleted_count': 0,
-                        'requested_ids': product_ids
-                    })
-                
-                products_to_delete.delete()
-                
-                return Response({
-                    'status': 'success',
-                    'message': f'Successfully deleted {deleted_count} product(s)',
-                    'deleted_count': deleted_count,
-                    'requested_ids': product_ids
-                })
-                
+            summary = bulk_delete(request.user, product_ids)
         except Exception as e:
             return Response({
                 'status': 'error',
                 'message': f'Error deleting products: {str(e)}'
-            }, status=500)
\ No newline at end of file
+            }, status=500)
+        
+        if summary['deleted_count'] == 0:
+            return bulk_response(summary, 'No products found with the provided IDs', requested_ids=product_ids)
+        
+        return bulk_response(
+            summary,
+            f"Successfully deleted {summary['deleted_count']} product(s)",
+            requested_ids=product_ids
+        )
\ No newline at end of file
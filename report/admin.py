@@ -1,3 +1,19 @@
 from django.contrib import admin
+from .models import DailyProfitRollup, ReportExportJob
 
-# Register your models here.
+
+@admin.register(DailyProfitRollup)
+class DailyProfitRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'sales_count', 'purchases_count', 'sales_items_amount', 'purchases_items_amount', 'profit')
+    list_filter = ('date',)
+    search_fields = ('user__email',)
+    date_hierarchy = 'date'
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(ReportExportJob)
+class ReportExportJobAdmin(admin.ModelAdmin):
+    list_display = ('user', 'report_type', 'file_format', 'status', 'progress', 'rows_written', 'created_at')
+    list_filter = ('status', 'report_type', 'file_format')
+    search_fields = ('user__email',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class ReportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'report'
\ No newline at end of file
+    name = 'report'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,119 @@
+import hashlib
+import uuid
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework.response import Response
+
+REPORT_CACHE_ALIAS = 'reports'
+
+STAT_KEYS = {
+    'hits': 'report-cache:stats:hits',
+    'misses': 'report-cache:stats:misses',
+    'invalidations': 'report-cache:stats:invalidations',
+}
+
+
+def get_report_cache():
+    return caches[REPORT_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'report-cache:version:{user_id}'
+
+
+def _increment(key, cache=None):
+    # Stats only: incr is a read-modify-write on the file backend, so
+    # concurrent workers may lose a count there
+    cache = cache or get_report_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key is missing (first use or evicted)
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def get_data_version(user_id):
+    """
+    Current data version of a user, embedded in every report cache key.
+    Versions are random tokens rather than a counter: every bump writes a
+    value never used before, so racing bumps cannot collapse into one the
+    way a non-atomic incr can, and a culled version key only costs misses.
+    """
+    cache = get_report_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(user_id):
+    """Invalidate every cached report of a user by moving to a new version"""
+    cache = get_report_cache()
+    cache.set(_version_key(user_id), _new_version(), timeout=None)
+    _increment(STAT_KEYS['invalidations'], cache)
+
+
+def build_cache_key(user_id, endpoint, query_params):
+    normalized = sorted(
+        (key, sorted(values))
+        for key, values in query_params.lists()
+    )
+    raw = repr((
+        endpoint,
+        normalized,
+        get_data_version(user_id),
+        timezone.now().date().isoformat(),
+    ))
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'report-cache:response:{user_id}:{digest}'
+
+
+def get_cache_stats():
+    cache = get_report_cache()
+    stats = {name: cache.get(key) or 0 for name, key in STAT_KEYS.items()}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0
+    stats['backend'] = settings.CACHES[REPORT_CACHE_ALIAS]['BACKEND']
+    return stats
+
+
+def cached_report_response(view_method):
+    """
+    Cache the data of a successful report response per user, endpoint and
+    query string. Keys carry the user's data version, so any write to that
+    user's products or transactions makes older entries unreachable.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+
+        cache = get_report_cache()
+        endpoint = f'{self.__class__.__name__}:{request.path}'
+        key = build_cache_key(user.pk, endpoint, request.query_params)
+
+        data = cache.get(key)
+        if data is not None:
+            _increment(STAT_KEYS['hits'], cache)
+            response = Response(data)
+            response['X-Report-Cache'] = 'HIT'
+            return response
+
+        _increment(STAT_KEYS['misses'], cache)
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data)
+        response['X-Report-Cache'] = 'MISS'
+        return response
+
+    return wrapper
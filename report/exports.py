@@ -0,0 +1,248 @@
+import csv
+import io
+import logging
+import tempfile
+from django.core.files import File
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+import openpyxl
+from inventory.models import Product
+from .models import DailyProfitRollup, ReportExportJob
+from .services import (
+    ROLLUP_SUM_FIELDS, best_selling_products_queryset, expense_report_queryset, stock_aging_queryset
+)
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _money(value):
+    return float(value) if value is not None else 0.0
+
+
+def _profit_loss_export(user):
+    headers = [
+        'Month', 'Sales', 'Purchases', 'Net Profit', 'Sales Count',
+        'Purchases Count', 'Items Sold', 'Items Purchased'
+    ]
+
+    queryset = DailyProfitRollup.objects.filter(
+        user=user
+    ).annotate(
+        bucket=TruncMonth('date')
+    ).values('bucket').annotate(
+        **{field: Sum(field) for field in ROLLUP_SUM_FIELDS}
+    ).order_by('bucket')
+
+    def format_rows(rows):
+        formatted = []
+        for row in rows:
+            # Same rule as the P&L chart: transaction-level prices win over item totals
+            sales = row['sales_amount'] if row['sales_amount'] > 0 else row['sales_items_amount']
+            purchases = row['purchases_amount'] if row['purchases_amount'] > 0 else row['purchases_items_amount']
+            formatted.append([
+                row['bucket'].strftime('%Y-%m'),
+                _money(sales),
+                _money(purchases),
+                _money(sales - purchases),
+                row['sales_count'],
+                row['purchases_count'],
+                row['items_sold'],
+                row['items_purchased'],
+            ])
+        return formatted
+
+    return headers, queryset, format_rows
+
+
+def _best_selling_export(user):
+    headers = [
+        'Product', 'Reference Number', 'Brand', 'Remaining Quantity',
+        'Quantity Sold', 'Turn Over', 'Buying Price', 'Sold Price'
+    ]
+
+    def format_rows(rows):
+        return [
+            [
+                row['product_name'] or 'Unknown Product',
+                row['reference_number'] or str(row['product']),
+                row['brand'] or 'Uncategorized',
+                row['remaining_quantity'],
+                row['total_quantity_sold'],
+                _money(row['turn_over']),
+                _money(row['buying_price']),
+                _money(row['sold_price']),
+            ]
+            for row in rows
+        ]
+
+    return headers, best_selling_products_queryset(user), format_rows
+
+
+def _expenses_export(user):
+    headers = [
+        'Model', 'Reference Number', 'Brand', 'Purchase Price', 'Repairs',
+        'Shipping', 'Total Cost', 'Impact %'
+    ]
+
+    def format_rows(rows):
+        # Reference number and brand come from the first product of each model
+        first_products = Product.objects.filter(
+            id__in=[row['first_product_id'] for row in rows]
+        ).select_related('category').in_bulk()
+
+        formatted = []
+        for row in rows:
+            first_product = first_products.get(row['first_product_id'])
+            formatted.append([
+                row['model_name'],
+                first_product.product_id if first_product else None,
+                getattr(getattr(first_product, 'category', None), 'name', None),
+                _money(row['purchase_cost']),
+                _money(row['repairs_cost']),
+                _money(row['shipping_cost']),
+                _money(row['total_cost']),
+                round(_money(row['impact']), 1),
+            ])
+        return formatted
+
+    return headers, expense_report_queryset(user), format_rows
+
+
+def _stock_aging_export(user):
+    headers = [
+        'Brand', 'Model', 'Less Than 30 Days', '30 To 60 Days', '60 To 90 Days',
+        '91+ Days', 'Total', 'Days In Stock'
+    ]
+    today = timezone.now().date()
+
+    def format_rows(rows):
+        return [
+            [
+                row['category__name'] or 'Other',
+                row['model_name'],
+                row['less_than_30'],
+                row['30_to_60'],
+                row['60_to_90'],
+                row['91_plus'],
+                row['total'],
+                max((today - row['oldest_purchase'].date()).days, 0) if row['oldest_purchase'] else 0,
+            ]
+            for row in rows
+        ]
+
+    return headers, stock_aging_queryset(user), format_rows
+
+
+EXPORTERS = {
+    'profit_loss': _profit_loss_export,
+    'best_selling': _best_selling_export,
+    'expenses': _expenses_export,
+    'stock_aging': _stock_aging_export,
+}
+
+
+class CSVExportWriter:
+    extension = 'csv'
+
+    def __init__(self, fileobj):
+        self.stream = io.TextIOWrapper(fileobj, encoding='utf-8', newline='')
+        self.writer = csv.writer(self.stream)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.stream.flush()
+        # Hand the underlying binary file back without closing it
+        self.stream.detach()
+
+
+class XLSXExportWriter:
+    extension = 'xlsx'
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        # Write-only workbooks flush rows to disk instead of keeping cells in memory
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet('Report')
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.fileobj)
+
+
+WRITERS = {
+    'csv': CSVExportWriter,
+    'xlsx': XLSXExportWriter,
+}
+
+
+def _iter_chunks(queryset, chunk_size):
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_report_export(job_id):
+    """
+    Build the file of a ReportExportJob. Rows are streamed from the database
+    in chunks into a temporary file, which is then stored with the job.
+    """
+    job = ReportExportJob.objects.select_related('user').get(pk=job_id)
+
+    ReportExportJob.objects.filter(pk=job.pk).update(
+        status='running',
+        started_at=timezone.now()
+    )
+
+    try:
+        headers, queryset, format_rows = EXPORTERS[job.report_type](job.user)
+        total_rows = queryset.count()
+        ReportExportJob.objects.filter(pk=job.pk).update(total_rows=total_rows)
+
+        with tempfile.TemporaryFile() as tmp:
+            writer = WRITERS[job.file_format](tmp)
+            writer.write_rows([headers])
+
+            rows_written = 0
+            for chunk in _iter_chunks(queryset, EXPORT_CHUNK_SIZE):
+                writer.write_rows(format_rows(chunk))
+                rows_written += len(chunk)
+
+                ReportExportJob.objects.filter(pk=job.pk).update(
+                    rows_written=rows_written,
+                    progress=min(int(rows_written * 100 / total_rows), 99) if total_rows else 0
+                )
+
+            writer.close()
+            tmp.seek(0)
+
+            file_name = f"{job.report_type}-{timezone.now():%Y%m%d-%H%M%S}.{writer.extension}"
+            job.file.save(file_name, File(tmp), save=False)
+
+        ReportExportJob.objects.filter(pk=job.pk).update(
+            file=job.file.name,
+            status='completed',
+            progress=100,
+            rows_written=rows_written,
+            finished_at=timezone.now()
+        )
+
+    except Exception as e:
+        logger.exception("Report export %s failed", job.pk)
+        ReportExportJob.objects.filter(pk=job.pk).update(
+            status='failed',
+            error=str(e),
+            finished_at=timezone.now()
+        )
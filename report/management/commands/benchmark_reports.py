@@ -0,0 +1,242 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework.test import APIClient
+from auth_.models import User
+from inventory.models import Category, Product, product_search_text
+from transactions.models import TransactionHistory, TransactionItem
+from report.cache import bump_data_version
+from report.services import rebuild_daily_rollups
+
+BENCHMARKED_URLCONFS = ('report.urls', 'dashboard.urls')
+BENCHMARK_BRANDS = ('Rolex', 'Omega', 'Tudor', 'Cartier', 'Patek Philippe', 'Audemars Piguet')
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds synthetic users of several sizes inside a rolled back transaction and records '
+        'query count, wall time and peak memory of every report and dashboard endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[1000, 10000, 100000],
+            help='Number of products (and transactions) to seed per run. Defaults to 1000 10000 100000.'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timed requests per endpoint; the median is reported. Defaults to 3.'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the JSON report to this file instead of stdout.'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed of the synthetic data, keep it fixed to compare commits.'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        urls = self.collect_urls()
+        if not urls:
+            raise CommandError('No report or dashboard URLs found')
+
+        report = {
+            'commit': self.current_commit(),
+            'database': connection.vendor,
+            'generated_at': timezone.now().isoformat(),
+            'repeat': options['repeat'],
+            'runs': {},
+        }
+
+        for size in options['sizes']:
+            self.stderr.write(f'Benchmarking {size} products/transactions...')
+            report['runs'][str(size)] = self.run_size(size, urls, options['repeat'], options['seed'])
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def current_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True,
+                text=True,
+                check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def collect_urls(self):
+        """GET endpoints without path parameters of the benchmarked url modules"""
+        urls = []
+
+        def walk(patterns, prefix, include):
+            for pattern in patterns:
+                route = prefix + str(pattern.pattern)
+                if isinstance(pattern, URLResolver):
+                    module = getattr(pattern.urlconf_module, '__name__', None)
+                    walk(pattern.url_patterns, route, include or module in BENCHMARKED_URLCONFS)
+                elif isinstance(pattern, URLPattern) and include and '<' not in route:
+                    urls.append('/' + route.lstrip('^').rstrip('$'))
+
+        walk(get_resolver().url_patterns, '', False)
+        return sorted(set(urls))
+
+    def run_size(self, size, urls, repeat, seed):
+        with transaction.atomic():
+            started = time.perf_counter()
+            user = self.seed_user(size, random.Random(seed))
+            seed_seconds = time.perf_counter() - started
+
+            client = APIClient()
+            client.force_authenticate(user)
+
+            endpoints = {}
+            for url in urls:
+                endpoints[url] = self.measure(client, user, url, repeat)
+                self.stderr.write(
+                    f"  {url}: {endpoints[url]['queries']} queries, {endpoints[url]['time_ms']} ms"
+                )
+
+            # Synthetic data never outlives the benchmark
+            transaction.set_rollback(True)
+
+        # Only the benchmark user's cached reports are dropped
+        bump_data_version(user.pk)
+
+        return {
+            'seed_seconds': round(seed_seconds, 3),
+            'endpoints': endpoints,
+        }
+
+    def measure(self, client, user, url, repeat):
+        # Query count and peak memory of a cold (uncached) request. The query log
+        # is bounded, so it is emptied first or a full log would hide new queries.
+        bump_data_version(user.pk)
+        reset_queries()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Wall time is measured separately, tracemalloc slows requests down
+        timings = []
+        for _ in range(repeat):
+            bump_data_version(user.pk)
+            started = time.perf_counter()
+            client.get(url)
+            timings.append(time.perf_counter() - started)
+
+        return {
+            'status': response.status_code,
+            'queries': len(queries.captured_queries),
+            'time_ms': round(statistics.median(timings) * 1000, 2),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def seed_user(self, size, rng):
+        now = timezone.now()
+        today = now.date()
+
+        # bulk_create skips the post_save signals (Stripe customer creation)
+        user = User.objects.bulk_create([
+            User(
+                email=f'benchmark-{size}-{int(time.time())}@example.com',
+                first_name='Benchmark',
+                last_name=str(size),
+                is_staff=True
+            )
+        ])[0]
+        if user.pk is None:
+            user = User.objects.get(email=user.email)
+
+        categories = [Category.objects.get_or_create(name=name)[0] for name in BENCHMARK_BRANDS]
+        model_names = [f'Model {i}' for i in range(max(size // 50, 10))]
+
+        products = []
+        for i in range(size):
+            buying_price = Decimal(rng.randint(500, 20000))
+            availability = rng.choice(['in_stock', 'in_stock', 'sold', 'reserved'])
+            date_purchased = now - timedelta(days=rng.randint(0, 730))
+            product_id = f'BM{size}-{i}'
+            model_name = rng.choice(model_names)
+            category = rng.choice(categories)
+            products.append(Product(
+                owner=user,
+                product_id=product_id,
+                model_name=model_name,
+                category=category,
+                # bulk_create skips save(), which fills the search text
+                search_text=product_search_text(category.name, model_name, product_id),
+                availability=availability,
+                buying_price=buying_price,
+                shipping_price=Decimal(rng.randint(0, 200)),
+                repair_cost=Decimal(rng.randint(0, 500)),
+                msrp=buying_price * Decimal('1.3'),
+                sold_price=buying_price * Decimal('1.2') if availability == 'sold' else None,
+                quantity=rng.randint(1, 3),
+                date_purchased=date_purchased,
+                date_sold=date_purchased + timedelta(days=rng.randint(1, 120)) if availability == 'sold' else None,
+            ))
+        Product.objects.bulk_create(products, batch_size=BATCH_SIZE)
+        product_ids = list(Product.objects.filter(owner=user).values_list('id', flat=True))
+
+        transactions = []
+        for i in range(size):
+            transaction_type = rng.choice(['sale', 'purchase'])
+            transactions.append(TransactionHistory(
+                user=user,
+                transaction_type=transaction_type,
+                name_of_trade=f'Benchmark trade {i}',
+                date=today - timedelta(days=rng.randint(0, 730)),
+                sale_price=Decimal(rng.randint(500, 25000)) if transaction_type == 'sale' and i % 3 == 0 else None,
+                purchase_price=Decimal(rng.randint(500, 20000)) if transaction_type == 'purchase' and i % 3 == 0 else None,
+            ))
+        TransactionHistory.objects.bulk_create(transactions, batch_size=BATCH_SIZE)
+
+        items = []
+        for transaction_id in TransactionHistory.objects.filter(user=user).values_list('id', flat=True):
+            for _ in range(rng.randint(1, 3)):
+                items.append(TransactionItem(
+                    transaction_id=transaction_id,
+                    product_id=rng.choice(product_ids),
+                    quantity=rng.randint(1, 2),
+                    purchase_price=Decimal(rng.randint(500, 20000)),
+                    sale_price=Decimal(rng.randint(500, 25000)),
+                ))
+            if len(items) >= BATCH_SIZE:
+                TransactionItem.objects.bulk_create(items)
+                items = []
+        TransactionItem.objects.bulk_create(items)
+        TransactionHistory.objects.filter(user=user).refresh_totals()
+
+        rebuild_daily_rollups(user.pk)
+        return user
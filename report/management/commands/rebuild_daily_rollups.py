@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from auth_.models import User
+from transactions.models import TransactionHistory
+from report.services import rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = 'Backfills or rebuilds the per-user DailyProfitRollup table from raw transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            dest='users',
+            action='append',
+            help='Email or id of a user to rebuild (repeatable). Defaults to every user with transactions.'
+        )
+
+    def handle(self, *args, **options):
+        if options['users']:
+            user_ids = []
+            for value in options['users']:
+                lookup = {'pk': value} if str(value).isdigit() else {'email__iexact': value}
+                user = User.objects.filter(**lookup).first()
+                if not user:
+                    raise CommandError(f"User '{value}' does not exist")
+                user_ids.append(user.pk)
+        else:
+            user_ids = TransactionHistory.objects.values_list('user_id', flat=True).distinct().order_by('user_id')
+
+        total_users = 0
+        total_days = 0
+        for user_id in user_ids:
+            days = rebuild_daily_rollups(user_id)
+            total_users += 1
+            total_days += days
+            self.stdout.write(f'User {user_id}: {days} day(s) rebuilt')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {total_days} daily rollup(s) for {total_users} user(s)'
+        ))
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProfitRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('purchases_count', models.PositiveIntegerField(default=0)),
+                ('sales_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('purchases_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sales_items_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('purchases_items_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sold_items_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('items_sold', models.IntegerField(default=0)),
+                ('items_purchased', models.IntegerField(default=0)),
+                ('profit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
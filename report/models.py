@@ -1,3 +1,79 @@
 from django.db import models
+from django.core.files.storage import default_storage
+from auth_.models import User
 
-# Create your models here.
+
+class DailyProfitRollup(models.Model):
+    """Pre-summed sale and purchase totals for one user on one day"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    
+    # Transaction counts
+    sales_count = models.PositiveIntegerField(default=0)
+    purchases_count = models.PositiveIntegerField(default=0)
+    
+    # Transaction-level prices (TransactionHistory.sale_price / purchase_price)
+    sales_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    purchases_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    # Item-level totals (quantity * price on TransactionItem)
+    sales_items_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    purchases_items_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sold_items_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    items_sold = models.IntegerField(default=0)
+    items_purchased = models.IntegerField(default=0)
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = (('user', 'date'),)
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.user} - {self.date}"
+
+
+class ReportExportJob(models.Model):
+    """Full-history export of a report, built in the background"""
+    REPORT_TYPE_CHOICES = (
+        ('profit_loss', 'Profit & Loss'),
+        ('best_selling', 'Best Selling Products'),
+        ('expenses', 'Expense Report'),
+        ('stock_aging', 'Stock Aging'),
+    )
+    
+    FORMAT_CHOICES = (
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+    )
+    
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_exports')
+    report_type = models.CharField(max_length=20, choices=REPORT_TYPE_CHOICES)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Progress
+    progress = models.PositiveSmallIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+    
+    file = models.FileField(upload_to='report_exports/', storage=default_storage, blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.get_report_type_display()} export for {self.user} ({self.status})"
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from inventory.models import Product, Category
+from .models import ReportExportJob
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -108,4 +109,24 @@ class PurchaseSalesReportSerializer(serializers.Serializer):
     start_date = serializers.DateField()
     end_date = serializers.DateField()
     purchases = serializers.ListField(child=serializers.DictField())
-    sales = serializers.ListField(child=serializers.DictField())
\ No newline at end of file
+    sales = serializers.ListField(child=serializers.DictField())
+
+class ReportExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ReportExportJob
+        fields = [
+            'id', 'report_type', 'file_format', 'status', 'progress',
+            'total_rows', 'rows_written', 'download_url', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = [
+            'status', 'progress', 'total_rows', 'rows_written', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+    
+    def get_download_url(self, obj):
+        if obj.status == 'completed' and obj.file:
+            return obj.file.url
+        return None
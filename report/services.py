@@ -0,0 +1,462 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+import logging
+import threading
+import weakref
+from django.db import DatabaseError, transaction
+from django.db.models import (
+    Sum, Count, Min, F, Q, OuterRef, Subquery, Case, When, Value, DecimalField, IntegerField
+)
+from django.db.models.functions import Coalesce, TruncWeek, TruncMonth, TruncQuarter, TruncYear
+from django.utils import timezone
+from inventory.models import Product
+from transactions.models import TransactionHistory, TransactionItem
+from .models import DailyProfitRollup
+from .cache import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_SUM_FIELDS = (
+    'sales_count', 'purchases_count',
+    'sales_amount', 'purchases_amount',
+    'sales_items_amount', 'purchases_items_amount', 'sold_items_cost',
+    'items_sold', 'items_purchased', 'profit',
+)
+
+
+# First key of the PostgreSQL advisory locks taken on a user's rollups
+ROLLUP_LOCK_KEY = 2001
+
+
+def lock_user_rollups(user_id):
+    """
+    Wait for and hold the rollup lock of a user until the current atomic
+    block ends. An advisory lock rather than a row lock, so writes to the
+    user row are never blocked. Other databases serialize writers anyway.
+    """
+    connection = transaction.get_connection()
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        # The second key is an int4, user ids past it share a lock with
+        # another user, which only serializes their rebuilds
+        cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [ROLLUP_LOCK_KEY, user_id % 2 ** 31])
+
+
+def rebuild_daily_rollups(user_id, dates=None):
+    """
+    Recompute the DailyProfitRollup rows of a user from the raw transactions.
+    When ``dates`` is None every day of the user's history is rebuilt.
+    """
+    transactions = TransactionHistory.objects.filter(user_id=user_id)
+    existing = DailyProfitRollup.objects.filter(user_id=user_id)
+
+    if dates is not None:
+        dates = set(dates)
+        if not dates:
+            return 0
+        transactions = transactions.filter(date__in=dates)
+        existing = existing.filter(date__in=dates)
+
+    with transaction.atomic():
+        # Rebuilds of one user run one at a time: concurrent commits would
+        # otherwise delete and insert the same (user, date) rows together.
+        # The lock is taken before aggregating, so the totals include every
+        # transaction committed by the rebuild that held it.
+        lock_user_rollups(user_id)
+
+        is_sale = Q(transaction_type='sale')
+        is_purchase = Q(transaction_type='purchase')
+        zero = Decimal('0')
+
+        # Item-level totals come from the columns TransactionHistory keeps in
+        # sync with its items, so no join on TransactionItem is needed
+        days = transactions.values('date').annotate(
+            sales_count=Count('id', filter=is_sale),
+            purchases_count=Count('id', filter=is_purchase),
+            sales_amount=Coalesce(Sum('sale_price', filter=is_sale), zero),
+            purchases_amount=Coalesce(Sum('purchase_price', filter=is_purchase), zero),
+            sales_items_amount=Coalesce(Sum('items_total_sale', filter=is_sale), zero),
+            purchases_items_amount=Coalesce(Sum('items_total_purchase', filter=is_purchase), zero),
+            sold_items_cost=Coalesce(Sum('items_total_purchase', filter=is_sale), zero),
+            items_sold=Coalesce(Sum('items_quantity', filter=is_sale), 0),
+            items_purchased=Coalesce(Sum('items_quantity', filter=is_purchase), 0),
+        ).order_by()
+        days = {row.pop('date'): row for row in days}
+
+        rollups = []
+        for day, totals in days.items():
+            rollup = DailyProfitRollup(user_id=user_id, date=day, **totals)
+            rollup.profit = rollup.sales_items_amount - rollup.sold_items_cost
+            rollups.append(rollup)
+
+        existing.delete()
+        DailyProfitRollup.objects.bulk_create(rollups, batch_size=500)
+
+    return len(rollups)
+
+
+def _flush_pending_changes(pending):
+    transaction_ids = {key[1] for key in pending if key[0] == 'transaction'}
+    changed_users = {key[1] for key in pending if key[0] == 'user'}
+    days_by_user = defaultdict(set)
+
+    for key in pending:
+        if key[0] == 'day':
+            days_by_user[key[1]].add(key[2])
+
+    if transaction_ids:
+        resolved = TransactionHistory.objects.filter(
+            id__in=transaction_ids
+        ).values_list('user_id', 'date')
+        for user_id, day in resolved:
+            days_by_user[user_id].add(day)
+
+    for user_id, dates in days_by_user.items():
+        try:
+            rebuild_daily_rollups(user_id, dates)
+        except DatabaseError:
+            # The change itself has committed, so the request must not fail
+            # now. The days are corrected by their next rebuild or by the
+            # rebuild_daily_rollups command.
+            logger.exception("Rebuilding the rollups of user %s failed", user_id)
+
+    # Cached reports are invalidated only once the rollups are current
+    for user_id in changed_users | set(days_by_user):
+        bump_data_version(user_id)
+
+
+class _PendingChanges(set):
+    """
+    Change keys of the running transaction. The set is its own on_commit
+    callback, so the transaction's callback list holds the only strong
+    reference to it.
+    """
+
+    flushed = False
+
+    def __call__(self):
+        self.flushed = True
+        _flush_pending_changes(self)
+
+
+_local = threading.local()
+
+
+def _pending_changes():
+    """
+    Return the set of change keys waiting for the current atomic block to
+    commit, registering the on_commit flush the first time it is needed.
+    """
+    # A set dropped with a rolled back (savepoint) block is garbage and its
+    # weak reference is dead, so a new one is registered
+    ref = getattr(_local, 'pending', None)
+    pending = ref() if ref is not None else None
+    if pending is None or pending.flushed:
+        pending = _PendingChanges()
+        transaction.on_commit(pending)
+        _local.pending = weakref.ref(pending)
+    return pending
+
+
+def _mark_dirty(key):
+    if not transaction.get_connection().in_atomic_block:
+        _flush_pending_changes({key})
+        return
+    _pending_changes().add(key)
+
+
+def mark_rollup_day_dirty(user_id, day):
+    """Schedule the rollup of ``user_id`` on ``day`` to be rebuilt on commit"""
+    _mark_dirty(('day', user_id, day))
+
+
+def mark_rollup_transaction_dirty(transaction_id):
+    """Schedule the rollup day of a transaction to be rebuilt on commit"""
+    _mark_dirty(('transaction', transaction_id))
+
+
+def mark_user_data_changed(user_id):
+    """Schedule the cached reports of ``user_id`` to be invalidated on commit"""
+    _mark_dirty(('user', user_id))
+
+
+def rollup_totals_by_period(user, start, end, trunc_class, fields=ROLLUP_SUM_FIELDS):
+    """
+    Sum the user's rollups between ``start`` and ``end`` (inclusive), grouped
+    into buckets by ``trunc_class`` (TruncWeek, TruncMonth, ...). Returns a
+    dict keyed by the first day of each bucket; empty buckets are absent.
+    """
+    rows = DailyProfitRollup.objects.filter(
+        user=user,
+        date__gte=start,
+        date__lte=end
+    ).annotate(
+        bucket=trunc_class('date')
+    ).values('bucket').annotate(
+        **{field: Sum(field) for field in fields}
+    ).order_by('bucket')
+
+    return {row.pop('bucket'): row for row in rows}
+
+
+def empty_rollup_totals(fields=ROLLUP_SUM_FIELDS):
+    return {
+        field: 0 if field in ('sales_count', 'purchases_count', 'items_sold', 'items_purchased') else Decimal('0')
+        for field in fields
+    }
+
+
+PERIOD_TRUNCS = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+    'year': TruncYear,
+}
+
+PERIOD_MONTHS = {
+    'month': 1,
+    'quarter': 3,
+    'year': 12,
+}
+
+
+def period_start(day, period):
+    """First day of the week (Monday), month, quarter or year containing ``day``"""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    if period == 'quarter':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    if period == 'year':
+        return day.replace(month=1, day=1)
+    raise ValueError(f"Unknown period '{period}'")
+
+
+def shift_period(start, period, count):
+    """Move a bucket start ``count`` periods forward (or backward if negative)"""
+    if period == 'week':
+        return start + timedelta(weeks=count)
+
+    month_index = start.year * 12 + start.month - 1 + PERIOD_MONTHS[period] * count
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def period_end(start, period):
+    return shift_period(start, period, 1) - timedelta(days=1)
+
+
+def period_label(start, period):
+    if period == 'week':
+        return f"Week {start.isocalendar()[1]}"
+    if period == 'quarter':
+        return f"Q{(start.month - 1) // 3 + 1} {start.year}"
+    if period == 'year':
+        return str(start.year)
+    return start.strftime('%b %Y')
+
+
+def last_periods(period, count, today=None):
+    """
+    Bucket start of the oldest of the last ``count`` periods (the current one
+    included) and the last day of the current period.
+    """
+    current = period_start(today or timezone.now().date(), period)
+    return shift_period(current, period, -(count - 1)), period_end(current, period)
+
+
+PROFIT_METRICS = ('sales_amount', 'sales_items_amount', 'purchases_amount', 'purchases_items_amount')
+
+
+def period_series(user, period, start, end, metrics=ROLLUP_SUM_FIELDS):
+    """
+    Rollup ``metrics`` of a user per week, month, quarter or year between
+    ``start`` and ``end`` (inclusive), from one grouped query. Returns a list
+    of ``(bucket_start, totals)`` in date order where buckets without any
+    rollup are zero-filled.
+    """
+    totals = rollup_totals_by_period(user, start, end, PERIOD_TRUNCS[period], fields=metrics)
+
+    series = []
+    bucket = period_start(start, period)
+    while bucket <= end:
+        series.append((bucket, totals.get(bucket) or empty_rollup_totals(metrics)))
+        bucket = shift_period(bucket, period, 1)
+
+    return series
+
+
+def best_selling_products_queryset(user):
+    """
+    Sale items of a user grouped per product and ranked by turn over. Also
+    carries the latest non-zero buying and sold price seen for each product.
+    """
+    sale_items = TransactionItem.objects.filter(
+        transaction__user=user,
+        transaction__transaction_type='sale'
+    )
+
+    def latest_price(field):
+        return Subquery(
+            sale_items.filter(
+                product=OuterRef('product'),
+                **{f'{field}__isnull': False}
+            ).exclude(
+                **{field: 0}
+            ).order_by('-transaction_id', '-id').values(field)[:1]
+        )
+
+    return sale_items.values('product').annotate(
+        product_name=F('product__model_name'),
+        reference_number=F('product__product_id'),
+        brand=F('product__category__name'),
+        remaining_quantity=F('product__quantity'),
+        total_quantity_sold=Sum('quantity'),
+        turn_over=Coalesce(Sum(F('quantity') * F('sale_price')), Decimal('0')),
+        buying_price=latest_price('purchase_price'),
+        sold_price=latest_price('sale_price'),
+    ).order_by('-turn_over', 'product')
+
+
+def expense_report_queryset(user):
+    """
+    Purchase, repair and shipping totals of a user's products grouped per
+    model name, ordered by the share of repairs and shipping in total cost.
+    """
+    money = DecimalField(max_digits=14, decimal_places=2)
+    zero = Value(Decimal('0'), output_field=money)
+
+    return Product.objects.filter(
+        owner=user
+    ).exclude(
+        model_name__isnull=True
+    ).exclude(
+        model_name=''
+    ).values('model_name').annotate(
+        purchase_cost=Coalesce(Sum('buying_price'), zero, output_field=money),
+        repairs_cost=Coalesce(Sum('repair_cost'), zero, output_field=money),
+        shipping_cost=Coalesce(Sum('shipping_price'), zero, output_field=money),
+        first_product_id=Min('id'),
+    ).annotate(
+        total_cost=F('purchase_cost') + F('repairs_cost') + F('shipping_cost'),
+    ).annotate(
+        impact=Case(
+            When(
+                total_cost__gt=0,
+                then=(F('repairs_cost') + F('shipping_cost')) * 100 / F('total_cost')
+            ),
+            default=zero,
+            output_field=money
+        ),
+    ).order_by('-impact', 'model_name')
+
+
+def _in_stock_products(user, brands=None, model=None):
+    products = Product.objects.filter(owner=user, availability='in_stock')
+
+    if brands:
+        brand_query = Q()
+        for brand in brands:
+            brand_query |= Q(category__name__icontains=brand.strip())
+        products = products.filter(brand_query)
+
+    if model:
+        products = products.filter(model_name__icontains=model)
+
+    return products
+
+
+def _stock_age_buckets():
+    """Conditional quantity sums for each stock age bucket"""
+    now = timezone.now()
+    days_30_ago = (now - timedelta(days=30)).date()
+    days_60_ago = (now - timedelta(days=60)).date()
+    days_90_ago = (now - timedelta(days=90)).date()
+
+    # Products without a quantity still count as one piece
+    quantity = Case(
+        When(quantity=0, then=Value(1)),
+        default=F('quantity'),
+        output_field=IntegerField()
+    )
+
+    def bucket(condition=None):
+        return Coalesce(Sum(quantity, filter=condition), 0)
+
+    return {
+        'less_than_30': bucket(Q(date_purchased__gte=days_30_ago)),
+        '30_to_60': bucket(Q(date_purchased__lt=days_30_ago, date_purchased__gte=days_60_ago)),
+        '60_to_90': bucket(Q(date_purchased__lt=days_60_ago, date_purchased__gte=days_90_ago)),
+        '91_plus': bucket(Q(date_purchased__lt=days_90_ago)),
+        'total': bucket(),
+    }
+
+
+def stock_aging_queryset(user, brands=None, model=None):
+    """
+    In-stock products grouped per brand and model with their stock age
+    bucket counts, ranked by the oldest purchase date first.
+    """
+    return _in_stock_products(user, brands, model).values(
+        'category__name', 'model_name'
+    ).annotate(
+        oldest_purchase=Min('date_purchased'),
+        **_stock_age_buckets()
+    ).order_by('oldest_purchase', 'category__name', 'model_name')
+
+
+def stock_aging_summary(user, brands=None, model=None):
+    return _in_stock_products(user, brands, model).aggregate(**_stock_age_buckets())
+
+
+def stock_aging_facets(user):
+    """Distinct brands and models of the user's in-stock products"""
+    pairs = Product.objects.filter(
+        owner=user,
+        availability='in_stock'
+    ).values_list('category__name', 'model_name').distinct().order_by()
+
+    brands = set()
+    models = set()
+    for brand, model_name in pairs:
+        if brand:
+            brands.add(brand)
+        if model_name:
+            models.add(model_name)
+
+    return sorted(brands), sorted(models)
+
+
+TURNOVER_WINDOWS = (30, 90, 365)
+
+
+def stock_turnover_queryset(user, windows=TURNOVER_WINDOWS):
+    """
+    Sold and in-stock value of a user's products grouped per category. Sold
+    value is also summed for each trailing window in ``windows`` (days),
+    as ``sold_value_<days>d``, in the same query.
+    """
+    money = DecimalField(max_digits=14, decimal_places=2)
+    zero = Value(Decimal('0'), output_field=money)
+    is_sold = Q(availability='sold')
+    now = timezone.now()
+
+    window_sums = {
+        f'sold_value_{days}d': Coalesce(
+            Sum('sold_price', filter=is_sold & Q(date_sold__gte=now - timedelta(days=days))),
+            zero,
+            output_field=money
+        )
+        for days in windows
+    }
+
+    return Product.objects.filter(
+        owner=user,
+        category__isnull=False
+    ).values('category', 'category__name').annotate(
+        sold_value=Coalesce(Sum('sold_price', filter=is_sold), zero, output_field=money),
+        inventory_value=Coalesce(Sum('buying_price', filter=Q(availability='in_stock')), zero, output_field=money),
+        **window_sums
+    ).order_by('category__name')
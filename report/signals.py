@@ -0,0 +1,40 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from inventory.models import Product
+from transactions.models import TransactionHistory, TransactionItem
+from .services import mark_rollup_day_dirty, mark_rollup_transaction_dirty, mark_user_data_changed
+
+
+@receiver(pre_save, sender=TransactionHistory)
+def remember_previous_rollup_day(sender, instance, **kwargs):
+    instance._previous_rollup_day = None
+    if instance.pk:
+        instance._previous_rollup_day = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('user_id', 'date').first()
+
+
+@receiver(post_save, sender=TransactionHistory)
+def refresh_rollup_on_transaction_save(sender, instance, **kwargs):
+    mark_rollup_day_dirty(instance.user_id, instance.date)
+
+    previous = getattr(instance, '_previous_rollup_day', None)
+    if previous and previous != (instance.user_id, instance.date):
+        mark_rollup_day_dirty(*previous)
+
+
+@receiver(post_delete, sender=TransactionHistory)
+def refresh_rollup_on_transaction_delete(sender, instance, **kwargs):
+    mark_rollup_day_dirty(instance.user_id, instance.date)
+
+
+@receiver(post_save, sender=TransactionItem)
+@receiver(post_delete, sender=TransactionItem)
+def refresh_rollup_on_item_change(sender, instance, **kwargs):
+    mark_rollup_transaction_dirty(instance.transaction_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_reports_on_product_change(sender, instance, **kwargs):
+    mark_user_data_changed(instance.owner_id)
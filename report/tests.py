@@ -1,3 +1,249 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from auth_.models import User
+from inventory.models import Category, Product
+from transactions.models import TransactionHistory, TransactionItem
+from .cache import bump_data_version, get_data_version, get_report_cache
+from .models import DailyProfitRollup
+from .services import ROLLUP_SUM_FIELDS
 
-# Create your tests here.
+
+# The configured report cache is shared with the running site (a file cache
+# by default), tests get a private in-memory one
+isolated_report_cache = override_settings(CACHES={
+    **settings.CACHES,
+    'reports': {**settings.CACHES['reports'], **settings.REPORT_CACHE_BACKENDS['locmem'], 'LOCATION': 'report-tests'},
+})
+
+
+def create_user(email):
+    # bulk_create skips the post_save signals (Stripe customer creation)
+    User.objects.bulk_create([User(email=email)])
+    return User.objects.get(email=email)
+
+
+@isolated_report_cache
+class DashboardAPIViewTests(TestCase):
+    url = '/api/v1/reports/stats/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('dashboard-report@example.com')
+        category = Category.objects.create(name='Rolex')
+
+        today = timezone.now().date()
+        previous_month = today.replace(day=1) - timedelta(days=1)
+        last_year = date(today.year - 1, 6, 15)
+
+        def trade(transaction_type, day, buying_price, quantity, purchase_price, sale_price):
+            product = Product.objects.create(
+                owner=cls.user,
+                product_id=f'DASH-{Product.objects.count()}',
+                model_name='Submariner',
+                category=category,
+                buying_price=buying_price,
+                quantity=quantity,
+                date_purchased=timezone.now()
+            )
+            transaction = TransactionHistory.objects.create(
+                user=cls.user,
+                transaction_type=transaction_type,
+                name_of_trade=f'{transaction_type} {day}',
+                date=day
+            )
+            TransactionItem.objects.create(
+                transaction=transaction,
+                product=product,
+                quantity=quantity,
+                purchase_price=purchase_price,
+                sale_price=sale_price
+            )
+
+        trade('sale', today, Decimal('100'), 1, Decimal('100'), Decimal('150'))
+        trade('sale', previous_month, Decimal('200'), 2, Decimal('200'), Decimal('260'))
+        trade('sale', last_year, Decimal('1000'), 1, Decimal('1000'), Decimal('900'))
+        # Purchases count towards the purchase value only
+        trade('purchase', today, Decimal('500'), 1, Decimal('500'), None)
+
+        # Another user's sale stays out of the totals
+        other = create_user('dashboard-report-other@example.com')
+        other_product = Product.objects.create(
+            owner=other, product_id='DASH-OTHER', category=category,
+            buying_price=Decimal('50'), date_purchased=timezone.now()
+        )
+        other_sale = TransactionHistory.objects.create(user=other, transaction_type='sale', date=today)
+        TransactionItem.objects.create(
+            transaction=other_sale, product=other_product, quantity=1,
+            purchase_price=Decimal('50'), sale_price=Decimal('5000')
+        )
+
+        cls.profits = {today: Decimal('50'), previous_month: Decimal('120'), last_year: Decimal('-100')}
+
+    def setUp(self):
+        get_report_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_totals_come_from_a_constant_number_of_queries(self):
+        # One conditional aggregate over the sales, one over the products
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Report-Cache'], 'MISS')
+
+        today = timezone.now().date()
+        previous_month = today.replace(day=1) - timedelta(days=1)
+        current_month_profit = sum(
+            profit for day, profit in self.profits.items()
+            if (day.year, day.month) == (today.year, today.month)
+        )
+        previous_month_profit = sum(
+            profit for day, profit in self.profits.items()
+            if (day.year, day.month) == (previous_month.year, previous_month.month)
+        )
+        current_year_profit = sum(profit for day, profit in self.profits.items() if day.year == today.year)
+        last_year_profit = sum(profit for day, profit in self.profits.items() if day.year == today.year - 1)
+
+        self.assertEqual(response.data, {
+            'total_profit': 70.0,
+            'revenue': 1570.0,
+            'sales': 3,
+            'net_purchase_value': 1800.0,
+            'net_sales_value': 1570.0,
+            'mom_profit': float(current_month_profit - previous_month_profit),
+            'yoy_profit': float(current_year_profit - last_year_profit),
+        })
+
+    def test_new_data_version_invalidates_the_cached_report(self):
+        self.client.get(self.url)
+
+        bump_data_version(self.user.pk)
+
+        self.assertEqual(self.client.get(self.url)['X-Report-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.url)['X-Report-Cache'], 'HIT')
+
+    def test_data_versions_are_never_reused(self):
+        seen = {get_data_version(self.user.pk)}
+        for _ in range(3):
+            bump_data_version(self.user.pk)
+            seen.add(get_data_version(self.user.pk))
+
+        # A culled version key comes back as a new version, never an old one
+        get_report_cache().delete(f'report-cache:version:{self.user.pk}')
+        seen.add(get_data_version(self.user.pk))
+        self.assertEqual(len(seen), 5)
+
+    def test_repeated_request_is_served_from_the_report_cache(self):
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second['X-Report-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+
+
+def live_rollups(user):
+    """Rollup figures per day recomputed in Python from the transactions and their items"""
+    days = {}
+    for trade in TransactionHistory.objects.filter(user=user).prefetch_related('transaction_items'):
+        day = days.setdefault(trade.date, dict.fromkeys(ROLLUP_SUM_FIELDS, 0))
+        items = list(trade.transaction_items.all())
+        sale_value = sum(item.total_sale_price for item in items)
+        purchase_value = sum(item.total_purchase_price for item in items)
+        quantity = sum(item.quantity for item in items)
+        if trade.transaction_type == 'sale':
+            day['sales_count'] += 1
+            day['sales_amount'] += trade.sale_price or 0
+            day['sales_items_amount'] += sale_value
+            day['sold_items_cost'] += purchase_value
+            day['items_sold'] += quantity
+        else:
+            day['purchases_count'] += 1
+            day['purchases_amount'] += trade.purchase_price or 0
+            day['purchases_items_amount'] += purchase_value
+            day['items_purchased'] += quantity
+    for day in days.values():
+        day['profit'] = day['sales_items_amount'] - day['sold_items_cost']
+    return days
+
+
+@isolated_report_cache
+class DailyRollupTests(TransactionTestCase):
+    """
+    Rollups are rebuilt when the writing transaction commits, so these
+    writes commit for real
+    """
+    url = '/api/v1/transactions/'
+
+    def setUp(self):
+        self.user = create_user('daily-rollups@example.com')
+        category = Category.objects.create(name='Rolex')
+        self.products = [
+            Product.objects.create(
+                owner=self.user, product_id=f'ROLL-{i}', category=category,
+                buying_price=Decimal('100'), quantity=10, date_purchased=timezone.now()
+            )
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertRollupsMatchTransactions(self):
+        stored = {
+            row.pop('date'): row
+            for row in DailyProfitRollup.objects.filter(user=self.user).values('date', *ROLLUP_SUM_FIELDS)
+        }
+        self.assertEqual(stored, live_rollups(self.user))
+
+    def write(self, method, url, data=None):
+        response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300)
+        return response
+
+    def trade(self, transaction_type, day, items):
+        return {
+            'name_of_trade': f'{transaction_type} {day}',
+            'transaction_type': transaction_type,
+            'date': day.isoformat(),
+            'sale_price': '500' if transaction_type == 'sale' else None,
+            'purchase_price': '400' if transaction_type == 'purchase' else None,
+            'transaction_items': [
+                {'product': product.pk, 'quantity': quantity, 'purchase_price': '100', 'sale_price': '175'}
+                for product, quantity in items
+            ],
+        }
+
+    def test_rollups_follow_creates_updates_and_deletes(self):
+        first, second, third = self.products
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+
+        self.write('post', self.url, self.trade('sale', today, [(first, 2), (second, 1)]))
+        self.write('post', self.url, self.trade('purchase', yesterday, [(third, 3)]))
+        sale, purchase = (
+            TransactionHistory.objects.get(user=self.user, transaction_type=transaction_type)
+            for transaction_type in ('sale', 'purchase')
+        )
+        self.assertRollupsMatchTransactions()
+        self.assertEqual(DailyProfitRollup.objects.get(user=self.user, date=today).profit, Decimal('225'))
+
+        # Moved to another day with changed items: both days are rebuilt
+        self.write('put', f'{self.url}{sale.pk}/', self.trade('sale', yesterday, [(first, 1), (third, 2)]))
+        self.assertRollupsMatchTransactions()
+        self.assertFalse(DailyProfitRollup.objects.filter(user=self.user, date=today).exists())
+
+        self.write('delete', f'{self.url}{purchase.pk}/')
+        self.assertRollupsMatchTransactions()
+
+        # Item writes outside the API go through the model signals
+        TransactionItem.objects.create(
+            transaction=sale, product=second, quantity=1, purchase_price=Decimal('100'), sale_price=Decimal('90')
+        )
+        self.assertRollupsMatchTransactions()
+        self.assertEqual(DailyProfitRollup.objects.get(user=self.user, date=yesterday).profit, Decimal('215'))
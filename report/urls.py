@@ -33,4 +33,11 @@ urlpatterns = [
     
     # Purchase and sales report
     path('purchase-sales/', views.PurchaseSalesReportAPIView.as_view(), name='purchase_sales_report'),
+    
+    # Report cache monitoring
+    path('cache-stats/', views.ReportCacheStatsAPIView.as_view(), name='report_cache_stats'),
+    
+    # Background report exports
+    path('exports/', views.ReportExportListCreateAPIView.as_view(), name='report_exports'),
+    path('exports/<int:pk>/', views.ReportExportDetailAPIView.as_view(), name='report_export_detail'),
 ]
\ No newline at end of file
@@ -1,23 +1,34 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
+from django.db import transaction
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.pagination import PageNumberPagination
 from django.db.models import Sum, Count, F, Q, Avg, Case, When, Value, IntegerField, DecimalField, FloatField
-from django.db.models import Q, Case, When, Value, CharField, ExpressionWrapper, F, IntegerField, Func
+from django.db.models import Q, Case, When, Value, CharField, ExpressionWrapper, F, IntegerField
 
 from django.db.models.functions import TruncMonth, TruncYear, TruncWeek, Coalesce
 from django.utils import timezone
 from datetime import datetime, timedelta, date
 from decimal import Decimal
 from inventory.models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer, DashboardStatsSerializer
+from .serializers import ProductSerializer, CategorySerializer, DashboardStatsSerializer, ReportExportJobSerializer
+from .models import ReportExportJob
+from .exports import run_report_export
+from config.tasks import enqueue
 import calendar
 from django.db.models.functions import Cast
 from django.db.models import CharField, Case, When, Value, Q
 from transactions.models import TransactionHistory, TransactionItem
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from .services import (
+    PERIOD_TRUNCS, PROFIT_METRICS, period_series, period_start, period_label, last_periods,
+    best_selling_products_queryset,
+    expense_report_queryset, stock_aging_queryset, stock_aging_summary, stock_aging_facets,
+    stock_turnover_queryset, TURNOVER_WINDOWS
+)
+from .cache import cached_report_response, get_cache_stats
 import logging
 logger = logging.getLogger(__name__)
 
@@ -31,84 +42,63 @@ class CustomPagination(PageNumberPagination):
 class DashboardAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @cached_report_response
     def get(self, request):
         user = request.user
         
-        # Get all sale transactions for the user
-        sale_transactions = TransactionHistory.objects.filter(
-            user=user,
-            transaction_type='sale'
-        ).prefetch_related('transaction_items')
+        now = timezone.now()
+        current_month = now.month
+        current_year = now.year
+        previous_month = (now.replace(day=1) - timedelta(days=1))
+        last_year = current_year - 1
         
-        # Calculate total profit, revenue and sales from transactions
-        total_profit = Decimal('0')
-        revenue = Decimal('0')
-        sales_count = 0
-        net_sales_value = Decimal('0')
+        def profit_sum(period_filter=None):
+            return Coalesce(
+                Sum('profit', filter=period_filter),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            )
         
-        for transaction in sale_transactions:
-            total_profit += transaction.profit or Decimal('0')
-            revenue += transaction.total_sale_price or Decimal('0')
-            net_sales_value += transaction.total_sale_price or Decimal('0')
-            sales_count += transaction.transaction_items.count()
+        # All periods are bucketed in a single conditional aggregation over the
+        # item totals stored on sale transactions
+        totals = TransactionHistory.objects.filter(
+            user=user,
+            transaction_type='sale'
+        ).aggregate(
+            total_profit=profit_sum(),
+            revenue=Coalesce(
+                Sum('items_total_sale'),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            ),
+            sales=Coalesce(Sum('items_count'), 0),
+            current_month_profit=profit_sum(Q(
+                date__month=current_month,
+                date__year=current_year
+            )),
+            previous_month_profit=profit_sum(Q(
+                date__month=previous_month.month,
+                date__year=previous_month.year
+            )),
+            current_year_profit=profit_sum(Q(date__year=current_year)),
+            previous_year_profit=profit_sum(Q(date__year=last_year)),
+        )
         
         # Calculate net purchase value from all products
         net_purchase_value = Product.objects.filter(owner=user).aggregate(
             total=Coalesce(Sum('buying_price'), Decimal('0'), output_field=DecimalField())
         )['total'] or Decimal('0')
         
-        # Month over month profit
-        current_month = timezone.now().month
-        current_year = timezone.now().year
-        
-        current_month_profit = Decimal('0')
-        current_month_sales = sale_transactions.filter(
-            date__month=current_month,
-            date__year=current_year
-        )
-        for transaction in current_month_sales:
-            current_month_profit += transaction.profit or Decimal('0')
-        
-        previous_month = (timezone.now().replace(day=1) - timedelta(days=1))
-        previous_month_number = previous_month.month
-        previous_month_year = previous_month.year
-        
-        previous_month_profit = Decimal('0')
-        previous_month_sales = sale_transactions.filter(
-            date__month=previous_month_number,
-            date__year=previous_month_year
-        )
-        for transaction in previous_month_sales:
-            previous_month_profit += transaction.profit or Decimal('0')
-        
-        mom_profit = current_month_profit - previous_month_profit
-        
-        # Year over year profit
-        last_year = current_year - 1
-        
-        current_year_profit = Decimal('0')
-        current_year_sales = sale_transactions.filter(
-            date__year=current_year
-        )
-        for transaction in current_year_sales:
-            current_year_profit += transaction.profit or Decimal('0')
-        
-        previous_year_profit = Decimal('0')
-        previous_year_sales = sale_transactions.filter(
-            date__year=last_year
-        )
-        for transaction in previous_year_sales:
-            previous_year_profit += transaction.profit or Decimal('0')
-        
-        yoy_profit = current_year_profit - previous_year_profit
+        mom_profit = totals['current_month_profit'] - totals['previous_month_profit']
+        yoy_profit = totals['current_year_profit'] - totals['previous_year_profit']
         
         # Return formatted data
         return Response({
-            'total_profit': float(total_profit),
-            'revenue': float(revenue),
-            'sales': sales_count,
+            'total_profit': float(totals['total_profit']),
+            'revenue': float(totals['revenue']),
+            'sales': totals['sales'],
             'net_purchase_value': float(net_purchase_value),
-            'net_sales_value': float(net_sales_value),
+            'net_sales_value': float(totals['revenue']),
             'mom_profit': float(mom_profit),
             'yoy_profit': float(yoy_profit)
         })
@@ -118,58 +108,19 @@ class BestSellingProductsAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination
     
+    @cached_report_response
     def get(self, request):
         user = request.user
         
-        # Get all sale transactions for the user
-        sale_transactions = TransactionHistory.objects.filter(
-            user=user,
-            transaction_type='sale'
-        ).prefetch_related('transaction_items__product')
-        
-        # Create a dictionary to aggregate product sales
-        product_sales = {}
-        
-        for transaction in sale_transactions:
-            for item in transaction.transaction_items.all():
-                product = item.product
-                
-                # Use product_id or id as the key
-                product_key = product.product_id or str(product.id)
-                
-                if product_key not in product_sales:
-                    product_sales[product_key] = {
-                        'product': product.model_name or 'Unknown Product',
-                        'reference_number': product_key,
-                        'brand': product.category.name if product.category else 'Uncategorized',
-                        'total_quantity_sold': 0,
-                        'total_turn_over': Decimal('0'),
-                        'buying_price': item.purchase_price or Decimal('0'),
-                        'sold_price': item.sale_price or Decimal('0'),
-                    }
-                
-                # Update aggregated values
-                product_sales[product_key]['total_quantity_sold'] += item.quantity
-                product_sales[product_key]['total_turn_over'] += (item.sale_price or Decimal('0')) * item.quantity
-                
-                # For products with multiple transactions, we'll take the latest buying/sold price
-                product_sales[product_key]['buying_price'] = item.purchase_price or product_sales[product_key]['buying_price']
-                product_sales[product_key]['sold_price'] = item.sale_price or product_sales[product_key]['sold_price']
-        
-        # Convert the dictionary to a list and calculate remaining quantity and profit margin
-        best_selling = []
-        for product_key, data in product_sales.items():
-            # Get the product to check remaining quantity
-            try:
-                product = Product.objects.get(
-                    owner=user,
-                    product_id=product_key if product_key != 'Unknown ID' else None
-                )
-                remaining_quantity = product.quantity
-            except Product.DoesNotExist:
-                remaining_quantity = 0
-            
-            # Calculate profit margin
+        # Ranking is grouped, ordered and paginated in the database
+        best_selling = best_selling_products_queryset(user)
+        
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(best_selling, request)
+        
+        rows = []
+        for data in (page if page is not None else best_selling[:20]):
+            # Calculate profit margin from the latest buying/sold price
             buying_price = data['buying_price']
             sold_price = data['sold_price']
             increase_by = 0
@@ -177,68 +128,56 @@ class BestSellingProductsAPIView(APIView):
                 increase_by = ((sold_price - buying_price) / buying_price) * 100
                 increase_by = round(increase_by, 1)
             
-            best_selling.append({
-                'product': data['product'],
-                'reference_number': data['reference_number'],
-                'brand': data['brand'],
-                'remaining_quantity': remaining_quantity,
-                'turn_over': float(data['total_turn_over']),
+            rows.append({
+                'product': data['product_name'] or 'Unknown Product',
+                'reference_number': data['reference_number'] or str(data['product']),
+                'brand': data['brand'] or 'Uncategorized',
+                'remaining_quantity': data['remaining_quantity'],
+                'turn_over': float(data['turn_over']),
                 'increase_by': increase_by,
             })
         
-        # Sort by turn_over in descending order (you can change to increase_by if preferred)
-        best_selling.sort(key=lambda x: x['turn_over'], reverse=True)
-        
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(best_selling, request)
-        
         if page is not None:
-            return paginator.get_paginated_response(page)
+            return paginator.get_paginated_response(rows)
         
-        return Response(best_selling[:20] if best_selling else [])
+        return Response(rows)
 
 
 class ExpenseReportAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination
     
+    @cached_report_response
     def get(self, request):
         user = request.user
 
-        all_products = Product.objects.filter(owner=user)
+        # Totals per model are grouped, sorted by impact and paginated in the database
+        expenses = expense_report_queryset(user)
+        
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(expenses, request)
+        rows = page if page is not None else list(expenses[:20])
+        
+        # Reference number and brand come from the first product of each model
+        first_products = Product.objects.filter(
+            id__in=[row['first_product_id'] for row in rows]
+        ).select_related('category').in_bulk()
+        
         product_expenses = []
-        unique_products = all_products.values('model_name').distinct()
-
-        for product_item in unique_products:
-            model_name = product_item['model_name']
-            if not model_name:
-                continue
-
-            product_data = all_products.filter(model_name=model_name)
-
-            first_product = product_data.first()
-            if not first_product:
-                continue
-
-            repairs_cost = product_data.aggregate(
-                total=Coalesce(Sum('repair_cost'), 0, output_field=DecimalField())
-            )['total'] or 0
-
-            shipping_cost = product_data.aggregate(
-                total=Coalesce(Sum('shipping_price'), 0, output_field=DecimalField())
-            )['total'] or 0
-
-            purchase_cost = product_data.aggregate(
-                total=Coalesce(Sum('buying_price'), 0, output_field=DecimalField())
-            )['total'] or 0
+        for row in rows:
+            first_product = first_products.get(row['first_product_id'])
+            
+            repairs_cost = row['repairs_cost']
+            shipping_cost = row['shipping_cost']
+            purchase_cost = row['purchase_cost']
             total_cost = purchase_cost + repairs_cost + shipping_cost
-
+            
             impact = ((repairs_cost + shipping_cost) / total_cost) * 100 if total_cost > 0 else 0
             brand = getattr(getattr(first_product, 'category', None), 'name', None)
-
+            
             product_expenses.append({
-                'model': model_name,
-                'reference_number': first_product.product_id,
+                'model': row['model_name'],
+                'reference_number': first_product.product_id if first_product else None,
                 'brand': brand,
                 'purchase_price': float(purchase_cost),
                 'repairs': float(repairs_cost),
@@ -246,21 +185,17 @@ class ExpenseReportAPIView(APIView):
                 'impact': round(impact, 1),
                 'total_cost': float(total_cost),
             })
-
-        product_expenses.sort(key=lambda x: x['impact'], reverse=True)
-        
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(product_expenses, request)
         
         if page is not None:
-            return paginator.get_paginated_response(page)
+            return paginator.get_paginated_response(product_expenses)
         
-        return Response(product_expenses[:20] if product_expenses else [])
+        return Response(product_expenses)
 
 
 class MarketComparisonAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @cached_report_response
     def get(self, request):
         """
         Compare prices with market prices (MSRP)
@@ -301,14 +236,12 @@ class MarketComparisonAPIView(APIView):
         
         return Response(formatted_data)
 
-class ExtractDay(Func):
-    function = 'EXTRACT'
-    template = '%(function)s(DAY FROM %(expressions)s)'
-    output_field = IntegerField()
-
 class StockAgingAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    default_limit = 9
+    max_limit = 100
     
+    @cached_report_response
     def get(self, request):
         user = request.user
         today = timezone.now().date()
@@ -317,289 +250,115 @@ class StockAgingAPIView(APIView):
         brands = request.query_params.getlist('brand')
         model = request.query_params.get('model')
         
-        # Base query
-        query = Product.objects.filter(
-            owner=user,
-            availability='in_stock'
-        ).select_related('category')
-        
-        # Apply filters
-        if brands:
-            brand_query = Q()
-            for brand in brands:
-                brand_query |= Q(category__name__icontains=brand.strip())
-            query = query.filter(brand_query)
-        
-        if model:
-            query = query.filter(model_name__icontains=model)
-        
-        # Calculate date thresholds
-        now = timezone.now()
-        days_30_ago = (now - timedelta(days=30)).date()
-        days_60_ago = (now - timedelta(days=60)).date()
-        days_90_ago = (now - timedelta(days=90)).date()
-        
-        # Annotate products with age categories and days in stock
-        products = query.annotate(
-            age_category=Case(
-                When(date_purchased__gte=days_30_ago, then=Value('less_than_30')),
-                When(date_purchased__gte=days_60_ago, then=Value('30_to_60')),
-                When(date_purchased__gte=days_90_ago, then=Value('60_to_90')),
-                default=Value('91_plus'),
-                output_field=CharField()
-            ),
-            days_in_stock=ExpressionWrapper(
-                ExtractDay(today - F('date_purchased')),
-                output_field=IntegerField()
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response(
+                {'error': 'limit and offset must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        )
         
-        # Group products by brand/model
-        stock_groups = {}
-        stock_count = 0
+        # Bucket counts, oldest purchase and ranking per brand/model come from one grouped query
+        groups = stock_aging_queryset(user, brands=brands, model=model)
+        
+        # Fetch one extra group to know whether another page exists
+        page = list(groups[offset:offset + limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
         
-        for product in products:
-            # Create a unique group key based on brand and model
-            brand_name = product.category.name if product.category else 'Other'
-            group_key = f"{brand_name}-{product.model_name}"
-            
-            if group_key not in stock_groups:
-                stock_count += 1
-                stock_groups[group_key] = {
-                    'stock_ref': f"STK{stock_count:03d}",
-                    'brand': brand_name,
-                    'model_name': product.model_name,
-                    'less_than_30': 0,
-                    '30_to_60': 0,
-                    '60_to_90': 0,
-                    '91_plus': 0,
-                    'total': 0,
-                    'days_in_stock': 0
-                }
-            
-            # Update counts based on age category
-            quantity = product.quantity if product.quantity else 1
-            stock_groups[group_key][product.age_category] += quantity
-            stock_groups[group_key]['total'] += quantity
-            
-            # Update days in stock
-            if product.days_in_stock and product.days_in_stock > stock_groups[group_key]['days_in_stock']:
-                stock_groups[group_key]['days_in_stock'] = product.days_in_stock
-        
-        # Convert to list and sort by days in stock (descending)
-        stock_aging_data = sorted(
-            stock_groups.values(),
-            key=lambda x: x['days_in_stock'],
-            reverse=True
-        )[:9]
-        
-        # Calculate totals
-        total_less_than_30 = sum(group['less_than_30'] for group in stock_aging_data)
-        total_30_to_60 = sum(group['30_to_60'] for group in stock_aging_data)
-        total_60_to_90 = sum(group['60_to_90'] for group in stock_aging_data)
-        total_91_plus = sum(group['91_plus'] for group in stock_aging_data)
-        
-        # Prepare chart data
         chart_data = []
-        for item in stock_aging_data:
+        for rank, group in enumerate(page, start=offset + 1):
+            days_in_stock = (today - group['oldest_purchase'].date()).days if group['oldest_purchase'] else 0
+            
             chart_data.append({
-                'id': item['stock_ref'],
-                'brand': item['brand'],
-                'model': item['model_name'],
-                'less_than_30': item['less_than_30'],
-                '30_to_60': item['30_to_60'],
-                '60_to_90': item['60_to_90'],
-                '91_plus': item['91_plus'],
-                'total': item['total'],
-                'days_in_stock': item['days_in_stock']
+                'id': f"STK{rank:03d}",
+                'brand': group['category__name'] or 'Other',
+                'model': group['model_name'],
+                'less_than_30': group['less_than_30'],
+                '30_to_60': group['30_to_60'],
+                '60_to_90': group['60_to_90'],
+                '91_plus': group['91_plus'],
+                'total': group['total'],
+                'days_in_stock': max(days_in_stock, 0)
             })
         
-        # Get available filters
-        available_brands = Product.objects.filter(
-            owner=user,
-            availability='in_stock'
-        ).exclude(category__isnull=True).values_list(
-            'category__name', flat=True
-        ).distinct()
+        # Summary covers every group matching the filters, not only the current page
+        summary = stock_aging_summary(user, brands=brands, model=model)
         
-        available_models = Product.objects.filter(
-            owner=user,
-            availability='in_stock'
-        ).exclude(model_name__isnull=True).values_list(
-            'model_name', flat=True
-        ).distinct()
+        # Brand and model facets come from a single DISTINCT scan
+        available_brands, available_models = stock_aging_facets(user)
         
         return Response({
             'chart_data': chart_data,
-            'available_brands': list(filter(None, available_brands)),
-            'available_models': list(filter(None, available_models)),
+            'available_brands': available_brands,
+            'available_models': available_models,
             'summary': {
-                'less_than_30_days': total_less_than_30,
-                '30_to_60_days': total_30_to_60,
-                '60_to_90_days': total_60_to_90,
-                '91_plus_days': total_91_plus,
-                'total': sum(group['total'] for group in stock_aging_data)
+                'less_than_30_days': summary['less_than_30'],
+                '30_to_60_days': summary['30_to_60'],
+                '60_to_90_days': summary['60_to_90'],
+                '91_plus_days': summary['91_plus'],
+                'total': summary['total']
+            },
+            'pagination': {
+                'limit': limit,
+                'offset': offset,
+                'has_more': has_more
             }
         })
 
 class MonthlyProfitAPIView(APIView):
     permission_classes = [IsAuthenticated]
     
+    # Buckets shown per period type; the month chart leaves out the running month
+    period_counts = {'week': 13, 'month': 7, 'quarter': 8, 'year': 5}
+    
+    @cached_report_response
     def get(self, request):
         user = request.user
-        period = request.query_params.get('period', 'month')  # month or week
+        period = request.query_params.get('period', 'month')  # week, month, quarter or year
+        if period not in PERIOD_TRUNCS:
+            period = 'month'
         
         today = timezone.now().date()
         
-        def get_sales_total(queryset):
-            # First try to get from transaction-level sale_price
-            transaction_total = queryset.aggregate(
-                total=Coalesce(Sum('sale_price'), Decimal('0'))
-            )['total']
-            
-            # Then get from item-level calculations
-            items_total = TransactionItem.objects.filter(
-                transaction__in=queryset
-            ).aggregate(
-                total=Coalesce(Sum(F('quantity') * F('sale_price')), Decimal('0'))
-            )['total']
-            
-            # Use transaction total if available, otherwise use items total
-            return transaction_total if transaction_total > 0 else items_total
-        
-        def get_purchases_total(queryset):
-            # First try to get from transaction-level purchase_price
-            transaction_total = queryset.aggregate(
-                total=Coalesce(Sum('purchase_price'), Decimal('0'))
-            )['total']
-            
-            # Then get from item-level calculations
-            items_total = TransactionItem.objects.filter(
-                transaction__in=queryset
-            ).aggregate(
-                total=Coalesce(Sum(F('quantity') * F('purchase_price')), Decimal('0'))
-            )['total']
-            
-            return transaction_total if transaction_total > 0 else items_total
-        
-        if period == 'week':
-            # Get data for the last 12 weeks
-            chart_data = []
-            for i in range(12, -1, -1):
-                week_start = today - timedelta(weeks=i, days=today.weekday())
-                week_end = week_start + timedelta(days=6)
-                
-                sales_transactions = TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='sale',
-                    date__gte=week_start,
-                    date__lte=week_end
-                )
-                sales = get_sales_total(sales_transactions)
-                
-                purchase_transactions = TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='purchase',
-                    date__gte=week_start,
-                    date__lte=week_end
-                )
-                purchases = get_purchases_total(purchase_transactions)
-                
-                profit = sales - purchases
-                
-                chart_data.append({
-                    'period': f"Week {week_start.isocalendar()[1]}",
-                    'profit': float(profit) if profit >= 0 else 0.0,
-                    'loss': float(abs(profit)) if profit < 0 else 0.0,
-                    'net_profit': float(profit)  # Add net profit for clarity
-                })
-            
-            current_week_start = today - timedelta(days=today.weekday())
-            current_week_end = current_week_start + timedelta(days=6)
-            
-            current_period_sales = get_sales_total(
-                TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='sale',
-                    date__gte=current_week_start,
-                    date__lte=current_week_end
-                )
-            )
-            
-            current_period_purchases = get_purchases_total(
-                TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='purchase',
-                    date__gte=current_week_start,
-                    date__lte=current_week_end
-                )
-            )
-            
-            current_period_profit = current_period_sales - current_period_purchases
-            
-        else:  # month period
-            chart_data = []
-            
-            for i in range(6, -1, -1):
-                target_date = today.replace(day=1) - timedelta(days=1)  # Last day of previous month
-                for _ in range(i):
-                    target_date = target_date.replace(day=1) - timedelta(days=1)
-                
-                month_start = target_date.replace(day=1)
-                # Get last day of month
-                if month_start.month == 12:
-                    month_end = month_start.replace(year=month_start.year + 1, month=1, day=1) - timedelta(days=1)
-                else:
-                    month_end = month_start.replace(month=month_start.month + 1, day=1) - timedelta(days=1)
-                
-                # Get sales for this month
-                sales_transactions = TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='sale',
-                    date__gte=month_start,
-                    date__lte=month_end
-                )
-                sales = get_sales_total(sales_transactions)
-                
-                purchase_transactions = TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='purchase',
-                    date__gte=month_start,
-                    date__lte=month_end
-                )
-                purchases = get_purchases_total(purchase_transactions)
-                
-                profit = sales - purchases
-                
-                chart_data.append({
-                    'period': month_start.strftime('%b %Y'),  # Include year for clarity
-                    'profit': float(profit) if profit >= 0 else 0.0,
-                    'loss': float(abs(profit)) if profit < 0 else 0.0,
-                    'net_profit': float(profit)  # Add net profit for clarity
-                })
-            
-            # Current month calculation
-            month_start = today.replace(day=1)
-            
-            current_period_sales = get_sales_total(
-                TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='sale',
-                    date__gte=month_start,
-                    date__lte=today
-                )
-            )
-            
-            current_period_purchases = get_purchases_total(
-                TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='purchase',
-                    date__gte=month_start,
-                    date__lte=today
-                )
-            )
+        def get_sales_total(totals):
+            # Use transaction-level sale_price if available, otherwise use items total
+            if totals['sales_amount'] > 0:
+                return totals['sales_amount']
+            return totals['sales_items_amount']
+        
+        def get_purchases_total(totals):
+            if totals['purchases_amount'] > 0:
+                return totals['purchases_amount']
+            return totals['purchases_items_amount']
+        
+        if period == 'month':
+            # The seven full months before the current one, the current month counted up to today
+            start, _ = last_periods(period, self.period_counts[period] + 1, today)
+            series = period_series(user, period, start, today, PROFIT_METRICS)
+            chart_series, (_, current_totals) = series[:-1], series[-1]
+        else:
+            series = period_series(user, period, *last_periods(period, self.period_counts[period], today), PROFIT_METRICS)
+            chart_series, current_totals = series, series[-1][1]
+        
+        chart_data = []
+        for bucket, totals in chart_series:
+            sales = get_sales_total(totals)
+            purchases = get_purchases_total(totals)
+            profit = sales - purchases
             
-            current_period_profit = current_period_sales - current_period_purchases
+            chart_data.append({
+                'period': period_label(bucket, period),
+                'profit': float(profit) if profit >= 0 else 0.0,
+                'loss': float(abs(profit)) if profit < 0 else 0.0,
+                'net_profit': float(profit)  # Add net profit for clarity
+            })
+        
+        current_period_sales = get_sales_total(current_totals)
+        current_period_purchases = get_purchases_total(current_totals)
+        current_period_profit = current_period_sales - current_period_purchases
+        current_period_label = period_label(period_start(today, period), period)
         
         total_net_profit = sum(period['net_profit'] for period in chart_data)
         total_profit = sum(period['profit'] for period in chart_data)
@@ -620,8 +379,8 @@ class MonthlyProfitAPIView(APIView):
             },
             'chart_data': chart_data,
             'current_period': {
-                'period': today.strftime('%b %Y') if period == 'month' else f"Week {today.isocalendar()[1]}",
-                'date': today.strftime('%b %Y') if period == 'month' else f"Week {today.isocalendar()[1]}",
+                'period': current_period_label,
+                'date': current_period_label,
                 'value': f"{current_period_profit:,.0f}",
                 'sales': f"{current_period_sales:,.0f}",
                 'purchases': f"{current_period_purchases:,.0f}"
@@ -631,6 +390,7 @@ class MonthlyProfitAPIView(APIView):
 class UserSpecificReportAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @cached_report_response
     def get(self, request):
         """
         Get user specific performance data
@@ -685,47 +445,46 @@ class UserSpecificReportAPIView(APIView):
 class StockTurnoverAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @cached_report_response
     def get(self, request):
         """
         Get stock turnover analysis
         """
         user = request.user
         
-        # Calculate inventory turnover by category
-        categories = Category.objects.all()
-        turnover_data = []
+        # Optional trailing window (days) for the headline sold value
+        window = request.query_params.get('window')
+        if window is not None:
+            if not window.isdigit() or int(window) not in TURNOVER_WINDOWS:
+                return Response(
+                    {'error': f"window must be one of {', '.join(str(days) for days in TURNOVER_WINDOWS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            window = int(window)
         
-        for category in categories:
-            sold_products = Product.objects.filter(
-                owner=user,
-                category=category,
-                availability='sold'
-            )
-            
-            current_inventory = Product.objects.filter(
-                owner=user,
-                category=category,
-                availability='in_stock'
-            )
-            
-            sold_value = sold_products.aggregate(
-                total=Coalesce(Sum('sold_price'), 0, output_field=DecimalField())
-            )['total'] or 0
-            
-            inventory_value = current_inventory.aggregate(
-                total=Coalesce(Sum('buying_price'), 0, output_field=DecimalField())
-            )['total'] or 0
-            
-            # Calculate turnover ratio
-            turnover_ratio = 0
+        def ratio(sold_value, inventory_value):
             if inventory_value > 0:
-                turnover_ratio = float(sold_value) / float(inventory_value)
+                return float(sold_value) / float(inventory_value)
+            return 0.0
+        
+        # Calculate inventory turnover by category of the user's products
+        turnover_data = []
+        for row in stock_turnover_queryset(user):
+            sold_value = row[f'sold_value_{window}d'] if window else row['sold_value']
+            inventory_value = row['inventory_value']
             
             turnover_data.append({
-                'category': category.name,
+                'category': row['category__name'],
                 'sold_value': float(sold_value),
                 'inventory_value': float(inventory_value),
-                'turnover_ratio': float(turnover_ratio)
+                'turnover_ratio': ratio(sold_value, inventory_value),
+                'trailing': {
+                    f'{days}d': {
+                        'sold_value': float(row[f'sold_value_{days}d']),
+                        'turnover_ratio': ratio(row[f'sold_value_{days}d'], inventory_value)
+                    }
+                    for days in TURNOVER_WINDOWS
+                }
             })
         
         # Sort by turnover ratio
@@ -737,6 +496,7 @@ class StockTurnoverAPIView(APIView):
 class LiveInventoryAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @cached_report_response
     def get(self, request):
         """
         Get live inventory data
@@ -776,214 +536,35 @@ class LiveInventoryAPIView(APIView):
 class PurchaseSalesReportAPIView(APIView):
     permission_classes = [IsAuthenticated]
     
-    def get(self, request):
-        """
-        Get purchase and sales report with period filtering (month/week)
-        """
-        user = request.user
-        period = request.query_params.get('period', 'month')  # month or week
-        
-        today = timezone.now().date()
-        
-        def get_sales_total(queryset):
-
-            transaction_total = queryset.aggregate(
-                total=Coalesce(Sum('sale_price'), Decimal('0'))
-            )['total']
-            
-            items_total = TransactionItem.objects.filter(
-                transaction__in=queryset
-            ).aggregate(
-                total=Coalesce(Sum(F('quantity') * F('sale_price')), Decimal('0'))
-            )['total']
-            
-            return max(transaction_total, items_total)
-        
-        def get_purchases_total(queryset):
-            transaction_total = queryset.aggregate(
-                total=Coalesce(Sum('purchase_price'), Decimal('0'))
-            )['total']
-            
-            items_total = TransactionItem.objects.filter(
-                transaction__in=queryset
-            ).aggregate(
-                total=Coalesce(Sum(F('quantity') * F('purchase_price')), Decimal('0'))
-            )['total']
-            
-            return max(transaction_total, items_total)
-        
-        if period == 'week':
-            # Get data for the last 12 weeks
-            start_date = today - timedelta(weeks=12)
-            
-            chart_data = []
-            for i in range(12, -1, -1):
-                week_start = today - timedelta(weeks=i)
-                week_end = week_start + timedelta(days=6)
-                
-                sales_transactions = TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='sale',
-                    date__gte=week_start,
-                    date__lte=week_end
-                )
-                sales = get_sales_total(sales_transactions)
-                
-                # Get purchases
-                purchase_transactions = TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='purchase',
-                    date__gte=week_start,
-                    date__lte=week_end
-                )
-                purchases = get_purchases_total(purchase_transactions)
-                
-                chart_data.append({
-                    'period': f"Week {week_start.isocalendar()[1]}",  # Week number
-                    'date': f"Week {week_start.isocalendar()[1]}",  # Week number
-                    'purchases': float(purchases),
-                    'sales': float(sales)
-                })
-            
-            current_period_sales = get_sales_total(
-                TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='sale',
-                    date__week=today.isocalendar()[1],
-                    date__year=today.year
-                )
-            )
-            
-        else: 
-            chart_data = []
-            for i in range(6, -1, -1):
-                month = today.month - i
-                year = today.year
-                while month < 1:
-                    month += 12
-                    year -= 1
-                
-                month_start = date(year, month, 1)
-                if month == 12:
-                    month_end = date(year+1, 1, 1)
-                else:
-                    month_end = date(year, month+1, 1)
-                
-                sales_transactions = TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='sale',
-                    date__gte=month_start,
-                    date__lt=month_end
-                )
-                sales = get_sales_total(sales_transactions)
-                
-                purchase_transactions = TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='purchase',
-                    date__gte=month_start,
-                    date__lt=month_end
-                )
-                purchases = get_purchases_total(purchase_transactions)
-                
-                chart_data.append({
-                    'period': month_start.strftime('%b'),  # Month abbreviation
-                    'purchases': float(purchases),
-                    'sales': float(sales)
-                })
-            
-            current_period_sales = get_sales_total(
-                TransactionHistory.objects.filter(
-                    user=user,
-                    transaction_type='sale',
-                    date__month=today.month,
-                    date__year=today.year
-                )
-            )
-        
-        total_purchases = sum(period['purchases'] for period in chart_data)
-        total_sales = sum(period['sales'] for period in chart_data)
-        
-        return Response({
-            'summary': {
-                'purchases': {
-                    'total': total_purchases,
-                    'periods': [period['period'] for period in chart_data]
-                },
-                'sales': {
-                    'total': total_sales,
-                    'view_type': period
-                }
-            },
-            'chart_data': chart_data,
-            'current_period': {
-                'period': today.strftime('%b') if period == 'month' else f"Week {today.isocalendar()[1]}",
-                'value': format(current_period_sales, ',.0f')
-            }
-        })
-    permission_classes = [permissions.IsAuthenticated]
+    period_counts = {'week': 13, 'month': 7, 'quarter': 8, 'year': 5}
     
+    @cached_report_response
     def get(self, request):
         user = request.user
-        view_type = request.query_params.get('view', 'month')  # month or week
+        view_type = request.query_params.get('view', 'month')  # week, month, quarter or year
+        period = view_type if view_type in PERIOD_TRUNCS else 'month'
         
         today = timezone.now().date()
-        current_month = today.month
-        current_year = today.year
-        
-        def get_sales_total(queryset):
-            return queryset.aggregate(
-                total=Coalesce(Sum('sale_price'), Decimal('0'))
-            )['total']
         
-        def get_purchases_total(queryset):
-            return queryset.aggregate(
-                total=Coalesce(Sum('purchase_price'), Decimal('0'))
-            )['total']
-        
-        # Calculate totals for the current month from transactions
-        current_month_transactions = TransactionHistory.objects.filter(
-            user=user,
-            transaction_type='sale',
-            date__month=current_month,
-            date__year=current_year
+        # Current period and the ones before it, zero-filled, from one grouped query
+        series = period_series(
+            user,
+            period,
+            *last_periods(period, self.period_counts[period], today),
+            metrics=('sales_amount', 'purchases_amount')
         )
-        current_month_sales = get_sales_total(current_month_transactions)
+        
+        current_period_sales = series[-1][1]['sales_amount']
         
         months_data = []
-        for i in range(6, -1, -1): 
-            month = today.month - i
-            year = today.year
-            while month < 1:
-                month += 12
-                year -= 1
-            
-            month_start = date(year, month, 1)
-            if month == 12:
-                month_end = date(year+1, 1, 1)
-            else:
-                month_end = date(year, month+1, 1)
-            
-            sales_transactions = TransactionHistory.objects.filter(
-                user=user,
-                transaction_type='sale',
-                date__gte=month_start,
-                date__lt=month_end
-            )
-            sales = get_sales_total(sales_transactions)
-            
-            purchase_transactions = TransactionHistory.objects.filter(
-                user=user,
-                transaction_type='purchase',
-                date__gte=month_start,
-                date__lt=month_end
-            )
-            purchases = get_purchases_total(purchase_transactions)
+        for bucket, totals in series:
+            label = bucket.strftime('%b') if period == 'month' else period_label(bucket, period)  # Short month name
             
             months_data.append({
-                'month': month_start.strftime('%b'),  # Short month name
-                'date': month_start.strftime('%b'),
-                'purchase': float(purchases),
-                'sale': float(sales)
+                'month': label,
+                'date': label,
+                'purchase': float(totals['purchases_amount']),
+                'sale': float(totals['sales_amount'])
             })
         
         total_purchases = sum(m['purchase'] for m in months_data)
@@ -993,18 +574,69 @@ class PurchaseSalesReportAPIView(APIView):
             'summary': {
                 'purchases': {
                     'total': total_purchases,
-                    'months': [m['month'] for m in months_data]  # All months
+                    'months': [m['month'] for m in months_data]  # All periods
                 },
                 'sales': {
                     'total': total_sales,
-                    'view_type': view_type  # "month" or "week"
+                    'view_type': view_type
                 }
             },
             'chart_data': months_data,
             'current_month': {
-                'month': today.strftime('%b'),
-                'value': format(current_month_sales, ',.0f')  # Formatted with commas
+                'month': today.strftime('%b') if period == 'month' else period_label(period_start(today, period), period),
+                'value': format(current_period_sales, ',.0f')  # Formatted with commas
             }
         }
         
-        return Response(response_data)
\ No newline at end of file
+        return Response(response_data)
+
+
+class ReportCacheStatsAPIView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        """
+        Hit, miss and invalidation counters of the report response cache
+        """
+        return Response(get_cache_stats())
+
+
+class ReportExportListCreateAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+    
+    def get(self, request):
+        """
+        List the user's report exports, newest first
+        """
+        jobs = ReportExportJob.objects.filter(user=request.user)
+        
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(jobs, request)
+        serializer = ReportExportJobSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    def post(self, request):
+        """
+        Queue a full-history export of a report as CSV or XLSX
+        """
+        serializer = ReportExportJobSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        with transaction.atomic():
+            job = serializer.save(user=request.user)
+            enqueue(run_report_export, job.pk)
+        
+        return Response(ReportExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ReportExportDetailAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        """
+        Status, progress and download URL of one export
+        """
+        job = get_object_or_404(ReportExportJob, pk=pk, user=request.user)
+        return Response(ReportExportJobSerializer(job).data)
+
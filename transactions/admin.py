@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import TransactionHistory, TransactionItem
+from django.db import transaction as db_transaction
+from report.services import mark_user_data_changed
+from .models import StockMovement, TransactionHistory, TransactionItem
+from .services import sync_transaction_stock
 
 
 class TransactionItemInline(admin.TabularInline):
@@ -45,6 +48,24 @@ class TransactionHistoryAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).prefetch_related('transaction_items', 'transaction_items__product')
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Inline items are saved without the serializers' stock bookkeeping
+        sync_transaction_stock(form.instance)
+        mark_user_data_changed(form.instance.user_id)
+
+    def delete_model(self, request, obj):
+        # Give the stock back through reversal rows, as the API's delete does
+        with db_transaction.atomic():
+            sync_transaction_stock(obj, [])
+            mark_user_data_changed(obj.user_id)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with db_transaction.atomic():
+            for obj in queryset:
+                self.delete_model(request, obj)
+
 
 @admin.register(TransactionItem)
 class TransactionItemAdmin(admin.ModelAdmin):
@@ -58,4 +79,45 @@ class TransactionItemAdmin(admin.ModelAdmin):
         url = f"/admin/yourapp/transactionhistory/{obj.transaction.id}/change/"
         return f'<a href="{url}">{obj.transaction}</a>'
     transaction_link.short_description = "Transaction"
-    transaction_link.allow_tags = True
\ No newline at end of file
+    transaction_link.allow_tags = True
+
+    def save_model(self, request, obj, form, change):
+        with db_transaction.atomic():
+            super().save_model(request, obj, form, change)
+            # The item may have been moved off another transaction
+            transaction_ids = {obj.transaction_id, form.initial.get('transaction')} - {None}
+            for transaction in TransactionHistory.objects.filter(pk__in=transaction_ids):
+                sync_transaction_stock(transaction)
+            mark_user_data_changed(obj.transaction.user_id)
+
+    def delete_model(self, request, obj):
+        with db_transaction.atomic():
+            transaction = obj.transaction
+            super().delete_model(request, obj)
+            sync_transaction_stock(transaction)
+            mark_user_data_changed(transaction.user_id)
+
+    def delete_queryset(self, request, queryset):
+        with db_transaction.atomic():
+            for obj in queryset:
+                self.delete_model(request, obj)
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product', 'quantity', 'reason', 'date', 'transaction', 'user', 'created_at')
+    list_filter = ('reason', 'date')
+    search_fields = ('product__model_name', 'product__product_id', 'user__email')
+    date_hierarchy = 'date'
+    raw_id_fields = ('user', 'product', 'transaction')
+
+    # The ledger is append-only and written together with Product.quantity:
+    # corrections go through the product's quantity or reconcile_stock
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
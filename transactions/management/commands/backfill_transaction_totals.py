@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from auth_.models import User
+from transactions.models import TransactionHistory
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the item totals stored on TransactionHistory from the transaction items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            dest='users',
+            action='append',
+            help='Email or id of a user to backfill (repeatable). Defaults to every transaction.'
+        )
+
+    def handle(self, *args, **options):
+        transactions = TransactionHistory.objects.all()
+        if options['users']:
+            user_ids = []
+            for value in options['users']:
+                lookup = {'pk': value} if str(value).isdigit() else {'email__iexact': value}
+                user = User.objects.filter(**lookup).first()
+                if not user:
+                    raise CommandError(f"User '{value}' does not exist")
+                user_ids.append(user.pk)
+            transactions = transactions.filter(user_id__in=user_ids)
+
+        # Batches by primary key keep every UPDATE statement short
+        ids = list(transactions.order_by('pk').values_list('pk', flat=True))
+        updated = 0
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            updated += transactions.filter(pk__gte=batch[0], pk__lte=batch[-1]).refresh_totals()
+
+        self.stdout.write(self.style.SUCCESS(f'Refreshed the item totals of {updated} transaction(s)'))
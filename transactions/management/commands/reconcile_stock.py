@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from auth_.models import User
+from inventory.models import Product
+from report.services import mark_user_data_changed
+from transactions.services import ledger_balance_expression
+
+BATCH_SIZE = 5000
+
+class Command(BaseCommand):
+    help = 'Resets Product.quantity to the balance of the stock movement ledger where the two have drifted apart'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            dest='users',
+            action='append',
+            help='Email or id of a user to reconcile (repeatable). Defaults to every product.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the drifted products, change nothing.'
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['users']:
+            user_ids = []
+            for value in options['users']:
+                lookup = {'pk': value} if str(value).isdigit() else {'email__iexact': value}
+                user = User.objects.filter(**lookup).first()
+                if not user:
+                    raise CommandError(f"User '{value}' does not exist")
+                user_ids.append(user.pk)
+            products = products.filter(owner_id__in=user_ids)
+
+        drifted = list(
+            products.annotate(ledger_quantity=ledger_balance_expression())
+            .exclude(quantity=F('ledger_quantity'))
+            .order_by('pk')
+            .values_list('pk', 'owner_id', 'quantity', 'ledger_quantity')
+        )
+        for pk, owner_id, quantity, ledger_quantity in drifted:
+            self.stdout.write(f'Product {pk}: quantity {quantity}, ledger {ledger_quantity}')
+
+        if options['dry_run'] or not drifted:
+            self.stdout.write(self.style.SUCCESS(f'{len(drifted)} product(s) differ from the ledger'))
+            return
+
+        # Queryset updates skip the product post_save, so no adjustment rows
+        # are written for the ledger's own balance
+        ids = [row[0] for row in drifted]
+        for start in range(0, len(ids), BATCH_SIZE):
+            Product.objects.filter(pk__in=ids[start:start + BATCH_SIZE]).update(
+                quantity=ledger_balance_expression()
+            )
+        for owner_id in {row[1] for row in drifted}:
+            mark_user_data_changed(owner_id)
+
+        self.stdout.write(self.style.SUCCESS(f'Reset the quantity of {len(drifted)} product(s) to the ledger balance'))
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:10
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def item_totals_expressions(item_model):
+    # Frozen copy of transactions.models.item_totals_expressions as of this migration
+    zero = Value(Decimal('0'))
+    money = models.DecimalField(max_digits=14, decimal_places=2)
+    sale_value = F('quantity') * Coalesce('sale_price', zero)
+    purchase_value = F('quantity') * Coalesce('purchase_price', zero)
+
+    def item_total(aggregate, default):
+        totals = item_model.objects.filter(
+            transaction=OuterRef('pk')
+        ).order_by().values('transaction').annotate(total=aggregate).values('total')
+        return Coalesce(Subquery(totals), default)
+
+    return {
+        'items_total_sale': item_total(Sum(sale_value, output_field=money), zero),
+        'items_total_purchase': item_total(Sum(purchase_value, output_field=money), zero),
+        'items_count': item_total(Count('id'), Value(0)),
+        'items_quantity': item_total(Sum('quantity'), Value(0)),
+        'profit': models.Case(
+            models.When(
+                transaction_type='sale',
+                then=item_total(Sum(sale_value - purchase_value, output_field=money), zero)
+            ),
+            default=zero,
+            output_field=money
+        ),
+    }
+
+
+def backfill_item_totals(apps, schema_editor):
+    TransactionHistory = apps.get_model('transactions', 'TransactionHistory')
+    TransactionItem = apps.get_model('transactions', 'TransactionItem')
+    TransactionHistory.objects.update(**item_totals_expressions(TransactionItem))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_rename_amount_transactionhistory_purchase_price_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionhistory',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='transactionhistory',
+            name='items_quantity',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='transactionhistory',
+            name='items_total_purchase',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='transactionhistory',
+            name='items_total_sale',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='transactionhistory',
+            name='profit',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=14),
+        ),
+        migrations.RunPython(backfill_item_totals, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transactionhistory',
+            index=models.Index(fields=['user', 'transaction_type', 'date'], name='transaction_user_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionhistory',
+            index=models.Index(fields=['user', 'profit'], name='transaction_user_profit_idx'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:14
+
+from datetime import datetime
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+import django.db.models.deletion
+
+BATCH_SIZE = 5000
+
+
+def backfill_stock_ledger(apps, schema_editor):
+    """
+    Seed the ledger with one row per existing transaction item, then an
+    opening row per product for the part of its quantity no transaction
+    explains, so every ledger balance starts equal to Product.quantity
+    """
+    Product = apps.get_model('inventory', 'Product')
+    TransactionItem = apps.get_model('transactions', 'TransactionItem')
+    StockMovement = apps.get_model('transactions', 'StockMovement')
+
+    batch = []
+    items = TransactionItem.objects.filter(
+        transaction__transaction_type__in=['purchase', 'sale']
+    ).values_list(
+        'product_id', 'transaction_id', 'transaction__user_id',
+        'transaction__transaction_type', 'transaction__date', 'quantity'
+    ).order_by('pk')
+    for product_id, transaction_id, user_id, transaction_type, day, quantity in items.iterator(chunk_size=BATCH_SIZE):
+        batch.append(StockMovement(
+            user_id=user_id,
+            product_id=product_id,
+            transaction_id=transaction_id,
+            quantity=quantity if transaction_type == 'purchase' else -quantity,
+            reason=transaction_type,
+            date=day
+        ))
+        if len(batch) >= BATCH_SIZE:
+            StockMovement.objects.bulk_create(batch)
+            batch = []
+    StockMovement.objects.bulk_create(batch)
+
+    balances = dict(
+        StockMovement.objects.values('product').annotate(total=Sum('quantity')).values_list('product', 'total')
+    )
+    batch = []
+    products = Product.objects.values_list('pk', 'owner_id', 'quantity', 'date_purchased').order_by('pk')
+    for pk, owner_id, quantity, date_purchased in products.iterator(chunk_size=BATCH_SIZE):
+        opening = quantity - balances.get(pk, 0)
+        if not opening:
+            continue
+        if isinstance(date_purchased, datetime):
+            date_purchased = timezone.localdate(date_purchased) if timezone.is_aware(date_purchased) else date_purchased.date()
+        batch.append(StockMovement(
+            user_id=owner_id,
+            product_id=pk,
+            quantity=opening,
+            reason='opening',
+            date=date_purchased or timezone.localdate()
+        ))
+        if len(batch) >= BATCH_SIZE:
+            StockMovement.objects.bulk_create(batch)
+            batch = []
+    StockMovement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0027_product_image_variants'),
+        ('transactions', '0007_transaction_item_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('reason', models.CharField(choices=[('opening', 'Opening balance'), ('purchase', 'Purchase'), ('sale', 'Sale'), ('reversal', 'Reversal'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='inventory.product')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='transactions.transactionhistory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date'], name='stock_movement_user_date_idx'), models.Index(fields=['product', 'date'], name='stock_movement_product_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_stock_ledger, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,55 @@
 from django.db import models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from auth_.models import User
 from inventory.models import Product
 from customers.models import Customer
 from decimal import Decimal
 
+def item_totals_expressions(item_model):
+    """
+    Column values of TransactionHistory's stored item totals, as correlated
+    subqueries over ``item_model`` (a parameter so migrations can pass their
+    historical model)
+    """
+    zero = Value(Decimal('0'))
+    money = DecimalField(max_digits=14, decimal_places=2)
+    # A missing price counts as zero, like TransactionItem's totals
+    sale_value = F('quantity') * Coalesce('sale_price', zero)
+    purchase_value = F('quantity') * Coalesce('purchase_price', zero)
+
+    def item_total(aggregate, default):
+        totals = item_model.objects.filter(
+            transaction=OuterRef('pk')
+        ).order_by().values('transaction').annotate(total=aggregate).values('total')
+        return Coalesce(Subquery(totals), default)
+
+    return {
+        'items_total_sale': item_total(Sum(sale_value, output_field=money), zero),
+        'items_total_purchase': item_total(Sum(purchase_value, output_field=money), zero),
+        'items_count': item_total(Count('id'), Value(0)),
+        'items_quantity': item_total(Sum('quantity'), Value(0)),
+        'profit': models.Case(
+            models.When(
+                transaction_type='sale',
+                then=item_total(Sum(sale_value - purchase_value, output_field=money), zero)
+            ),
+            default=zero,
+            output_field=money
+        ),
+    }
+
+
+class TransactionHistoryQuerySet(models.QuerySet):
+    def refresh_totals(self):
+        """
+        Recompute the stored item totals of every transaction in the queryset
+        with a single UPDATE. Call it after item writes that skip signals
+        (bulk_create, bulk_update, queryset updates).
+        """
+        return self.update(**item_totals_expressions(TransactionItem))
+
+
 class TransactionHistory(models.Model):
     """Base transaction model"""
     TRANSACTION_TYPE_CHOICES = (
@@ -30,26 +76,40 @@ class TransactionHistory(models.Model):
     
     expenses = models.JSONField(default=dict)
     
+    # Totals of the transaction items, kept in sync by refresh_totals()
+    items_total_sale = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'), editable=False)
+    items_total_purchase = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'), editable=False)
+    items_count = models.PositiveIntegerField(default=0, editable=False)
+    items_quantity = models.IntegerField(default=0, editable=False)
+    # Sale transactions only, zero for purchases
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'), editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TransactionHistoryQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Reports aggregate the stored totals per user, type and date
+            models.Index(fields=['user', 'transaction_type', 'date'], name='transaction_user_type_date_idx'),
+            models.Index(fields=['user', 'profit'], name='transaction_user_profit_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.name_of_trade or self.transaction_type} - {self.date}"
     
     @property
     def total_purchase_price(self):
-        return sum((item.total_purchase_price or Decimal('0')) for item in self.transaction_items.all())
+        return self.items_total_purchase
     
     @property
     def total_sale_price(self):
-        return sum((item.total_sale_price or Decimal('0')) for item in self.transaction_items.all())
+        return self.items_total_sale
     
-    @property
-    def profit(self):
-        if self.transaction_type != 'sale':
-            return Decimal('0')
-        
-        return self.total_sale_price - self.total_purchase_price
+    def refresh_totals(self):
+        TransactionHistory.objects.filter(pk=self.pk).refresh_totals()
+        self.refresh_from_db(fields=['items_total_sale', 'items_total_purchase', 'items_count', 'items_quantity', 'profit'])
 
 
 class TransactionItem(models.Model):
@@ -72,4 +132,39 @@ class TransactionItem(models.Model):
     def total_sale_price(self):
         if self.quantity is None or self.sale_price is None:
             return Decimal('0')
-        return Decimal(self.quantity) * Decimal(self.sale_price)
\ No newline at end of file
+        return Decimal(self.quantity) * Decimal(self.sale_price)
+
+class StockMovement(models.Model):
+    """
+    Append-only stock ledger. Every change of Product.quantity is recorded
+    as a signed row and corrections are new rows, so the stock held on any
+    day is the sum of the movements up to that day.
+    """
+    REASON_CHOICES = (
+        ('opening', 'Opening balance'),
+        ('purchase', 'Purchase'),
+        ('sale', 'Sale'),
+        ('reversal', 'Reversal'),
+        ('adjustment', 'Adjustment'),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_movements')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    # Rows outlive their transaction: deleting it writes reversal rows and then
+    # unlinks them together with the original rows
+    transaction = models.ForeignKey(
+        TransactionHistory, on_delete=models.SET_NULL, related_name='stock_movements', null=True, blank=True
+    )
+    quantity = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='stock_movement_user_date_idx'),
+            models.Index(fields=['product', 'date'], name='stock_movement_product_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} {self.quantity:+d} ({self.reason}) - {self.date}"
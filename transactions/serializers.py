@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.db import transaction as db_transaction
 from transactions.models import TransactionHistory, TransactionItem
 from inventory.models import Product
 from decimal import Decimal
@@ -6,6 +7,8 @@ from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 from customers.serializers import CustomerSerializer
 from inventory.serializers import ProductSerializer
+from report.services import mark_rollup_transaction_dirty, mark_user_data_changed
+from .services import ITEM_VALUE_FIELDS, diff_items, movement_deltas, record_stock_movements, transaction_movements
 
 class TransactionItemSerializer(serializers.ModelSerializer):
     product_details = ProductSerializer(source='product', read_only=True)
@@ -17,10 +20,47 @@ class TransactionItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['total_purchase_price', 'total_sale_price']
 
 
+class UserProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Product of the requesting user. TransactionItemListSerializer loads all
+    products of a trade in one query, ids outside that batch fall back to the
+    regular lookup and its error messages.
+    """
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        if request is None:
+            return Product.objects.none()
+        return Product.objects.filter(owner=request.user)
+
+    def prefetch(self, pks):
+        self._products = self.get_queryset().in_bulk(
+            {int(pk) for pk in pks if str(pk).isdigit()}
+        )
+
+    def to_internal_value(self, data):
+        products = getattr(self, '_products', {})
+        if str(data).isdigit() and int(data) in products:
+            return products[int(data)]
+        return super().to_internal_value(data)
+
+
+class TransactionItemListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child.fields['product'].prefetch(
+                item.get('product') for item in data if isinstance(item, dict)
+            )
+        return super().to_internal_value(data)
+
+
 class TransactionItemCreateSerializer(serializers.ModelSerializer):
+    product = UserProductField()
+
     class Meta:
         model = TransactionItem
         fields = ['product', 'quantity', 'purchase_price', 'sale_price']
+        list_serializer_class = TransactionItemListSerializer
 
 
 class TransactionHistorySerializer(serializers.ModelSerializer):
@@ -91,59 +131,59 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
         items_data = validated_data.pop('transaction_items')
         user = self.context['request'].user
         
-        transaction = TransactionHistory.objects.create(
-            user=user,
-            **validated_data
-        )
-        
-        for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            
-            item_data['purchase_price'] = Decimal(str(item_data['purchase_price']))
-            item_data['sale_price'] = Decimal(str(item_data['sale_price']))
-            
-            TransactionItem.objects.create(
-                transaction=transaction,
-                **item_data
+        with db_transaction.atomic():
+            transaction = TransactionHistory.objects.create(
+                user=user,
+                **validated_data
             )
             
-            if transaction.transaction_type == 'purchase':
-                product.quantity += quantity
-            elif transaction.transaction_type == 'sale':
-                product.quantity -= quantity
-                
-                if product.quantity == 0:
-                    product.is_sold = True
-                    product.availability = "sold"
-                    product.date_sold = timezone.now()
+            # bulk_create skips the item signals, the transaction's own
+            # post_save already marked its rollup day
+            items = TransactionItem.objects.bulk_create([
+                TransactionItem(transaction=transaction, **item_data)
+                for item_data in items_data
+            ])
+            transaction.refresh_totals()
             
-            product.save()
+            record_stock_movements(transaction_movements(
+                transaction,
+                [(item.product_id, item.quantity) for item in items],
+                recorded=False
+            ))
+            mark_user_data_changed(user.pk)
         
         return transaction
     
     def update(self, instance, validated_data):
         items_data = validated_data.pop('transaction_items', None)
+        previous = (instance.transaction_type, instance.date)
         
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        if items_data is not None:
-            old_items = {item.product.id: item for item in instance.transaction_items.all()}
+        with db_transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+            
+            if items_data is None and (instance.transaction_type, instance.date) == previous:
+                return instance
+            
+            old_items = list(instance.transaction_items.all())
+            if items_data is None:
+                # Same items, but their stock counts the other way or on another day
+                items, created, updated, removed = old_items, [], [], []
+            else:
+                items, created, updated, removed = diff_items(instance, old_items, items_data)
+            
+            # Rows that move the ledger from what it holds for this transaction
+            # to the new items, type and date
+            movements = transaction_movements(instance, [(item.product_id, item.quantity) for item in items])
+            deltas = movement_deltas(movements)
+            
             if instance.transaction_type == 'sale':
-                for item_data in items_data:
+                for item_data in items_data or []:
                     product = item_data['product']
-                    new_quantity = item_data['quantity']
-                    old_quantity = old_items.get(product.id, None)
-                    
-                    if old_quantity is not None:
-                        net_change = new_quantity - old_quantity.quantity
-                    else:
-                        net_change = new_quantity
-                    
+                    net_change = -deltas.get(product.pk, 0)
                     if net_change > 0:
-                        available_qty = product.quantity 
+                        available_qty = product.quantity
                         if net_change > available_qty:
                             product_name = getattr(product, 'model_name', str(product))
                             raise ValidationError(
@@ -151,42 +191,21 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
                                 f"Available: {available_qty}, Additional needed: {net_change}"
                             )
             
-            instance.transaction_items.all().delete()
+            if removed:
+                TransactionItem.objects.filter(pk__in=[item.pk for item in removed]).delete()
+            if created:
+                TransactionItem.objects.bulk_create(created)
+            if updated:
+                TransactionItem.objects.bulk_update(updated, ITEM_VALUE_FIELDS)
             
-            for item_data in items_data:
-                product = item_data['product']
-                new_quantity = item_data['quantity']
-                old_quantity = old_items.get(product.id, None)
-                
-                item_data['purchase_price'] = Decimal(str(item_data['purchase_price']))
-                item_data['sale_price'] = Decimal(str(item_data['sale_price']))
-                
-                TransactionItem.objects.create(
-                    transaction=instance,
-                    **item_data
-                )
-                
-                if old_quantity is not None:
-                    net_change = new_quantity - old_quantity.quantity
-                else:
-                    net_change = new_quantity
-                
-                if instance.transaction_type == 'purchase':
-                    product.quantity += net_change
-                elif instance.transaction_type == 'sale':
-                    product.quantity -= net_change
-                    
-                # Update product status based on new quantity
-                if product.quantity == 0:
-                    product.is_sold = True
-                    product.availability = "sold"
-                    product.date_sold = timezone.now()
-                elif product.quantity > 0 and product.is_sold:
-                    product.is_sold = False
-                    product.availability = "in_stock"
-                    product.date_sold = None
-                
-                product.save()
+            record_stock_movements(movements, restock=True)
+            
+            # bulk_create and bulk_update skip the item signals
+            if created or updated:
+                instance.refresh_totals()
+                mark_rollup_transaction_dirty(instance.pk)
+            if deltas:
+                mark_user_data_changed(instance.user_id)
         
         return instance
     
@@ -0,0 +1,227 @@
+"""
+Stock bookkeeping of transaction items.
+
+Every stock change is appended to the StockMovement ledger and applied to
+Product.quantity through a single UPDATE with F() expressions instead of
+read-modify-write on Product instances, so concurrent trades of the same
+product cannot lose each other's changes.
+"""
+from collections import defaultdict
+from datetime import datetime
+from django.db.models import BooleanField, Case, CharField, DateTimeField, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import Exact, GreaterThan
+from django.utils import timezone
+from inventory.models import Product
+from .models import StockMovement, TransactionItem
+
+ITEM_VALUE_FIELDS = ('quantity', 'purchase_price', 'sale_price')
+
+
+def stock_direction(transaction_type):
+    """Sign of an item's quantity on the product's stock"""
+    return 1 if transaction_type == 'purchase' else -1
+
+
+def date_of(value):
+    """Calendar day of a date or datetime value, today when it is empty"""
+    if not value:
+        return timezone.localdate()
+    if isinstance(value, datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value
+
+
+def movement_deltas(movements):
+    """Net stock change per product id of StockMovement rows"""
+    deltas = defaultdict(int)
+    for movement in movements:
+        deltas[movement.product_id] += movement.quantity
+    return {product_id: delta for product_id, delta in deltas.items() if delta}
+
+
+def transaction_movements(transaction, items, recorded=True):
+    """
+    Ledger rows that bring what the ledger holds for ``transaction`` in line
+    with ``items``, ``(product_id, quantity)`` pairs (empty when the
+    transaction goes away). Compared per product and date against the rows
+    already recorded, so new items, removed ones, changed quantities and a
+    changed date or type all come out as their difference. Pass
+    ``recorded=False`` for a transaction that has no rows yet.
+    """
+    current = defaultdict(int)
+    if recorded:
+        for product_id, day, quantity in StockMovement.objects.filter(
+            transaction=transaction
+        ).values('product', 'date').annotate(total=Sum('quantity')).values_list('product', 'date', 'total'):
+            current[(product_id, day)] = quantity
+
+    target = defaultdict(int)
+    direction = stock_direction(transaction.transaction_type)
+    for product_id, quantity in items:
+        target[(product_id, transaction.date)] += direction * quantity
+
+    movements = []
+    for key in dict.fromkeys([*current, *target]):
+        change = target[key] - current[key]
+        if change:
+            movements.append(StockMovement(
+                user_id=transaction.user_id,
+                product_id=key[0],
+                transaction=transaction,
+                quantity=change,
+                reason=transaction.transaction_type if target[key] else 'reversal',
+                date=key[1],
+            ))
+    return movements
+
+
+def record_stock_movements(movements, restock=False, sold_at=None):
+    """
+    Append ``movements`` to the ledger and apply them to the products'
+    quantity with apply_stock_deltas. Returns the applied deltas.
+    """
+    if not movements:
+        return {}
+    StockMovement.objects.bulk_create(movements)
+    deltas = movement_deltas(movements)
+    apply_stock_deltas(deltas, restock=restock, sold_at=sold_at)
+    return deltas
+
+
+def sync_transaction_stock(transaction, items=None):
+    """
+    Record and apply the ledger rows that bring ``transaction`` in line with
+    its saved items, or with ``items`` (``[]`` for a transaction about to be
+    deleted). For writers that change items outside the transaction
+    serializers, such as the admin. Returns the applied deltas.
+    """
+    if items is None:
+        items = transaction.transaction_items.values_list('product', 'quantity')
+    return record_stock_movements(transaction_movements(transaction, items), restock=True)
+
+
+def balance_adjustments(products, reason='adjustment', day=None):
+    """
+    Unsaved ledger rows that bring the ledger balance of ``products`` to
+    their current quantity, for writers that set Product.quantity directly
+    """
+    products = [product for product in products if product.pk]
+    balances = dict(
+        StockMovement.objects.filter(
+            product__in=products
+        ).values('product').annotate(total=Sum('quantity')).values_list('product', 'total')
+    )
+    day = day or timezone.localdate()
+    return [
+        StockMovement(
+            user_id=product.owner_id,
+            product=product,
+            quantity=int(product.quantity) - balances.get(product.pk, 0),
+            reason=reason,
+            date=day,
+        )
+        for product in products
+        if int(product.quantity) != balances.get(product.pk, 0)
+    ]
+
+
+def ledger_balance_expression():
+    """Ledger balance of the outer product, for annotations and updates"""
+    return Coalesce(
+        Subquery(
+            StockMovement.objects.filter(
+                product=OuterRef('pk')
+            ).order_by().values('product').annotate(total=Sum('quantity')).values('total')
+        ),
+        Value(0)
+    )
+
+
+def stock_on(user, day):
+    """
+    Quantity per product a user held at the end of ``day``, summed from the
+    ledger. Products with nothing on hand are left out.
+    """
+    return StockMovement.objects.filter(
+        user=user,
+        date__lte=day
+    ).values('product').annotate(
+        quantity=Sum('quantity'),
+        model_name=F('product__model_name'),
+        reference_number=F('product__product_id'),
+        brand=F('product__category__name'),
+    ).exclude(quantity=0).order_by('product')
+
+
+def diff_items(transaction, old_items, items_data):
+    """
+    Match validated ``items_data`` against the transaction's current items
+    by product, in order, so unchanged items keep their primary keys.
+
+    Returns ``(items, created, updated, removed)``: the resulting items and
+    the unsaved new ones, the changed existing ones and the ones to delete.
+    Changed items are modified in place.
+    Fields missing from an item take the model default, as on create.
+    """
+    unmatched = defaultdict(list)
+    for item in old_items:
+        unmatched[item.product_id].append(item)
+
+    items, created, updated = [], [], []
+    for item_data in items_data:
+        candidates = unmatched.get(item_data['product'].pk)
+        if not candidates:
+            item = TransactionItem(transaction=transaction, **item_data)
+            created.append(item)
+            items.append(item)
+            continue
+
+        item = candidates.pop(0)
+        changed = False
+        for field in ITEM_VALUE_FIELDS:
+            value = item_data.get(field, TransactionItem._meta.get_field(field).get_default())
+            if getattr(item, field) != value:
+                setattr(item, field, value)
+                changed = True
+        if changed:
+            updated.append(item)
+        items.append(item)
+
+    removed = [item for remaining in unmatched.values() for item in remaining]
+    return items, created, updated, removed
+
+
+def apply_stock_deltas(deltas, restock=False, sold_at=None):
+    """
+    Add ``deltas`` ({product_id: change}) to the products' quantity in one
+    UPDATE. Products that reach zero are marked sold, on ``sold_at`` (default
+    now). With ``restock``, sold products that get stock back are returned
+    to in_stock.
+
+    Queryset updates skip the Product signals, callers mark the owner's
+    report data changed.
+    """
+    if not deltas:
+        return 0
+
+    new_quantity = F('quantity') + Case(
+        *[When(pk=product_id, then=Value(change)) for product_id, change in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+    # Every right-hand side reads the row as it was before the update, so the
+    # status columns test new_quantity rather than the quantity column
+    def status(field, sold_value, in_stock_value, output_field=None):
+        whens = [When(Exact(new_quantity, 0), then=Value(sold_value))]
+        if restock:
+            whens.append(When(GreaterThan(new_quantity, 0), is_sold=True, then=Value(in_stock_value)))
+        return Case(*whens, default=F(field), output_field=output_field)
+
+    return Product.objects.filter(pk__in=deltas).update(
+        quantity=new_quantity,
+        is_sold=status('is_sold', True, False, BooleanField()),
+        availability=status('availability', 'sold', 'in_stock', CharField()),
+        date_sold=status('date_sold', sold_at or timezone.now(), None, DateTimeField()),
+    )
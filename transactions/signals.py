@@ -1,33 +1,74 @@
+import threading
+from contextlib import contextmanager
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import TransactionHistory
-from inventory.models import ProductInventory
+from django.utils import timezone
+from inventory.models import Product
+from .models import StockMovement, TransactionHistory, TransactionItem
+from .services import date_of
+
+
+_local = threading.local()
+
+
+@contextmanager
+def deferred_total_refresh():
+    """
+    Skip the per-item refresh of stored transaction totals inside the block,
+    for set-based writes that refresh the affected transactions themselves
+    with one TransactionHistory.objects.filter(...).refresh_totals()
+    """
+    previous = getattr(_local, 'deferred', False)
+    _local.deferred = True
+    try:
+        yield
+    finally:
+        _local.deferred = previous
+
+
+@receiver(post_save, sender=TransactionItem)
+@receiver(post_delete, sender=TransactionItem)
+def refresh_totals_on_item_change(sender, instance, **kwargs):
+    if getattr(_local, 'deferred', False):
+        return
+    TransactionHistory.objects.filter(pk=instance.transaction_id).refresh_totals()
+
 
 @receiver(post_save, sender=TransactionHistory)
-def update_inventory_on_transaction(sender, instance, created, **kwargs):
+def refresh_totals_on_transaction_save(sender, instance, created, **kwargs):
+    # Profit also depends on the transaction type. New transactions have no
+    # items yet, whoever adds them refreshes the totals.
+    if not created:
+        TransactionHistory.objects.filter(pk=instance.pk).refresh_totals()
+
+
+@receiver(post_save, sender=Product)
+def record_direct_stock_change(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Quantity set on the product itself rather than through a transaction:
+    the opening balance of a new product or a manual correction
+    """
+    if update_fields is not None and 'quantity' not in update_fields:
+        return
+
     if created:
-        inventory, _ = ProductInventory.objects.get_or_create(
-            product=instance.product, 
-            defaults={'quantity': 0}
+        change = instance.quantity
+        reason = 'opening'
+        day = date_of(instance.date_purchased)
+    else:
+        loaded = getattr(instance, '_loaded_quantity', None)
+        if loaded is None:
+            return
+        change = instance.quantity - loaded
+        reason = 'adjustment'
+        day = timezone.localdate()
+
+    instance._loaded_quantity = instance.quantity
+    if change:
+        StockMovement.objects.create(
+            user_id=instance.owner_id,
+            product=instance,
+            quantity=change,
+            reason=reason,
+            date=day
         )
-        
-        if instance.transaction_type == 'purchase':
-            inventory.quantity += 1
-        elif instance.transaction_type == 'sale':
-            inventory.quantity -= 1
-        
-        inventory.save()
-
-@receiver(post_delete, sender=TransactionHistory)
-def revert_inventory_on_delete(sender, instance, **kwargs):
-    try:
-        inventory = ProductInventory.objects.get(product=instance.product)
-        
-        if instance.transaction_type == 'purchase':
-            inventory.quantity -= 1
-        elif instance.transaction_type == 'sale':
-            inventory.quantity += 1
-            
-        inventory.save()
-    except ProductInventory.DoesNotExist:
-        pass
\ No newline at end of file
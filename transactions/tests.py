@@ -1,3 +1,485 @@
-from django.test import TestCase
+import importlib
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+from auth_.models import User
+from inventory.importers import ProductImporter
+from inventory.models import Category, Product
+from report.models import DailyProfitRollup
+from report.tests import isolated_report_cache
+from .models import StockMovement, TransactionHistory, TransactionItem
+from .services import stock_on
 
-# Create your tests here.
+TRANSACTIONS_URL = '/api/v1/transactions/'
+
+
+def create_user(email):
+    # bulk_create skips the post_save signals (Stripe customer creation)
+    User.objects.bulk_create([User(email=email)])
+    return User.objects.get(email=email)
+
+
+def create_product(owner, product_id, quantity):
+    return Product.objects.create(
+        owner=owner,
+        product_id=product_id,
+        model_name=f'Model {product_id}',
+        category=Category.objects.get_or_create(name='Rolex')[0],
+        buying_price=Decimal('100'),
+        quantity=quantity,
+        date_purchased=timezone.now()
+    )
+
+
+def trade_payload(transaction_type, products, quantity=1):
+    return {
+        'name_of_trade': f'{transaction_type} trade',
+        'transaction_type': transaction_type,
+        'date': timezone.localdate().isoformat(),
+        'transaction_items': [
+            {'product': product.pk, 'quantity': quantity, 'purchase_price': '100', 'sale_price': '150'}
+            for product in products
+        ],
+    }
+
+
+def item_totals(trade):
+    """
+    Stored item totals of a transaction next to the same totals summed from
+    its items, as ``(stored, expected)``
+    """
+    trade.refresh_from_db()
+    items = list(TransactionItem.objects.filter(transaction=trade))
+    total_sale = sum((item.total_sale_price for item in items), Decimal('0'))
+    total_purchase = sum((item.total_purchase_price for item in items), Decimal('0'))
+    expected = (
+        total_sale,
+        total_purchase,
+        len(items),
+        sum(item.quantity for item in items),
+        total_sale - total_purchase if trade.transaction_type == 'sale' else Decimal('0'),
+    )
+    stored = (
+        trade.items_total_sale, trade.items_total_purchase, trade.items_count, trade.items_quantity, trade.profit
+    )
+    return stored, expected
+
+
+class StoredTotalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('trade-totals@example.com')
+        cls.products = [create_product(cls.user, f'TT-{i}', quantity=10) for i in range(3)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertTotalsMatchItems(self, trade):
+        stored, expected = item_totals(trade)
+        self.assertEqual(stored, expected)
+
+    def test_api_writes_keep_the_totals_in_sync(self):
+        first, second, third = self.products
+        response = self.client.post(TRANSACTIONS_URL, trade_payload('sale', [first, second]), format='json')
+        self.assertEqual(response.status_code, 201)
+        trade = TransactionHistory.objects.get(user=self.user)
+        self.assertTotalsMatchItems(trade)
+        self.assertEqual(trade.profit, Decimal('100'))
+
+        url = f'{TRANSACTIONS_URL}{trade.pk}/'
+        items = [
+            {'product': first.pk, 'quantity': 3, 'purchase_price': '100', 'sale_price': '180'},
+            {'product': third.pk, 'quantity': 1, 'purchase_price': '100', 'sale_price': '90'},
+        ]
+        # Changed, removed and added items at once
+        response = self.client.patch(url, {'transaction_items': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTotalsMatchItems(trade)
+        self.assertEqual(trade.profit, Decimal('230'))
+
+        # Only a removed item, refreshed by the item signals
+        response = self.client.patch(url, {'transaction_items': items[:1]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTotalsMatchItems(trade)
+
+        # Profit follows the transaction type
+        response = self.client.patch(
+            url, {'transaction_type': 'purchase', 'transaction_items': items[:1]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTotalsMatchItems(trade)
+        self.assertEqual(trade.profit, Decimal('0'))
+
+    def test_orm_writes_keep_the_totals_in_sync(self):
+        first, second, _ = self.products
+        trade = TransactionHistory.objects.create(user=self.user, transaction_type='sale', date=timezone.localdate())
+
+        item = TransactionItem.objects.create(
+            transaction=trade, product=first, quantity=2, purchase_price=Decimal('100'), sale_price=Decimal('150')
+        )
+        TransactionItem.objects.create(transaction=trade, product=second, quantity=1, purchase_price=Decimal('80'))
+        self.assertTotalsMatchItems(trade)
+
+        item.quantity = 4
+        item.save()
+        self.assertTotalsMatchItems(trade)
+        self.assertEqual(trade.items_total_sale, Decimal('600'))
+
+        item.delete()
+        self.assertTotalsMatchItems(trade)
+        self.assertEqual(trade.profit, Decimal('-80'))
+
+        trade.transaction_type = 'purchase'
+        trade.save()
+        self.assertTotalsMatchItems(trade)
+
+    def test_backfill_matches_the_items(self):
+        trades = [
+            TransactionHistory.objects.create(user=self.user, transaction_type=transaction_type, date=timezone.localdate())
+            for transaction_type in ('sale', 'purchase', 'sale')
+        ]
+        # bulk_create skips the signals and leaves the stored totals at zero
+        TransactionItem.objects.bulk_create([
+            TransactionItem(transaction=trades[0], product=self.products[0], quantity=2,
+                            purchase_price=Decimal('100'), sale_price=Decimal('175')),
+            TransactionItem(transaction=trades[0], product=self.products[1], quantity=1, purchase_price=Decimal('50')),
+            TransactionItem(transaction=trades[1], product=self.products[2], quantity=3, purchase_price=Decimal('40')),
+        ])
+
+        migration = importlib.import_module('transactions.migrations.0007_transaction_item_totals')
+        migration.backfill_item_totals(apps, None)
+
+        for trade in trades:
+            self.assertTotalsMatchItems(trade)
+        self.assertEqual(trades[0].profit, Decimal('100'))
+        self.assertEqual(trades[2].items_count, 0)
+
+
+def ledger_balance(product):
+    return sum(StockMovement.objects.filter(product=product).values_list('quantity', flat=True))
+
+
+class StockLedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('trade-ledger@example.com')
+        cls.products = [create_product(cls.user, f'TL-{i}', quantity=5) for i in range(3)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertStock(self, quantities):
+        """Quantities of the test products, each equal to its ledger balance"""
+        for product in self.products:
+            product.refresh_from_db()
+        self.assertEqual([product.quantity for product in self.products], quantities)
+        self.assertEqual([ledger_balance(product) for product in self.products], quantities)
+
+    def test_trades_keep_the_ledger_equal_to_the_stock(self):
+        first, second, third = self.products
+        self.assertStock([5, 5, 5])
+
+        response = self.client.post(TRANSACTIONS_URL, trade_payload('purchase', [first], quantity=2), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertStock([7, 5, 5])
+
+        response = self.client.post(TRANSACTIONS_URL, trade_payload('sale', [first, second]), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertStock([6, 4, 5])
+
+        # Changed, removed and added items come out as their difference
+        sale = TransactionHistory.objects.get(user=self.user, transaction_type='sale')
+        url = f'{TRANSACTIONS_URL}{sale.pk}/'
+        response = self.client.patch(url, {'transaction_items': [
+            {'product': first.pk, 'quantity': 3, 'purchase_price': '100', 'sale_price': '150'},
+            {'product': third.pk, 'quantity': 2, 'purchase_price': '100', 'sale_price': '150'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertStock([4, 5, 3])
+
+        # Deleting the sale gives the stock back through reversal rows, like
+        # the item removed above
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+        self.assertStock([7, 5, 5])
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(reason='reversal').values_list('product', 'quantity')),
+            [(first.pk, 3), (second.pk, 1), (third.pk, 2)]
+        )
+
+    def test_direct_quantity_edits_are_recorded_as_adjustments(self):
+        first = Product.objects.get(pk=self.products[0].pk)
+        first.quantity = 8
+        first.save()
+        self.assertStock([8, 5, 5])
+        self.assertEqual(
+            list(StockMovement.objects.filter(product=first, reason='adjustment').values_list('quantity', flat=True)),
+            [3]
+        )
+
+        first.model_name = 'Renamed'
+        first.save(update_fields=['model_name'])
+        self.assertEqual(StockMovement.objects.filter(product=first).count(), 2)
+
+    def test_import_balances_the_ledger_of_imported_products(self):
+        purchased = (timezone.localdate() - timedelta(days=10)).isoformat()
+        sold = (timezone.localdate() - timedelta(days=2)).isoformat()
+        rows = [
+            {'Reference': 'IMP-1', 'Model Name': 'Daytona', 'Brand': 'Rolex', 'Buy Price': '100',
+             'Purchase Date': purchased, 'Quantity': 3},
+            {'Reference': 'IMP-2', 'Model Name': 'Speedmaster', 'Brand': 'Omega', 'Buy Price': '100',
+             'Purchase Date': purchased, 'Sell Price': '150', 'Sold Date': sold},
+            # Existing product, its quantity comes from the sheet
+            {'Reference': 'TL-0', 'Model Name': 'Model TL-0', 'Brand': 'Rolex', 'Buy Price': '100',
+             'Purchase Date': purchased, 'Quantity': 9},
+        ]
+        result = ProductImporter(self.user).run(rows)
+        self.assertEqual((result['created'], result['updated'], result['errors']), (2, 1, []))
+
+        imported = Product.objects.filter(owner=self.user, product_id__in=['IMP-1', 'IMP-2', 'TL-0']).order_by('product_id')
+        self.assertEqual(
+            [(product.product_id, product.quantity, ledger_balance(product)) for product in imported],
+            [('IMP-1', 3, 3), ('IMP-2', 1, 1), ('TL-0', 9, 9)]
+        )
+
+    def test_reconcile_stock_resets_drifted_quantities_to_the_ledger(self):
+        # Queryset updates bypass the ledger
+        Product.objects.filter(pk=self.products[1].pk).update(quantity=11)
+
+        call_command('reconcile_stock', stdout=StringIO())
+
+        self.assertStock([5, 5, 5])
+
+    def test_stock_on_returns_the_balance_at_the_end_of_a_day(self):
+        first, second, _ = self.products
+        today = timezone.localdate()
+        StockMovement.objects.filter(product__in=self.products).update(date=today - timedelta(days=10))
+
+        for days_ago, transaction_type, products in ((5, 'sale', [first, second]), (2, 'purchase', [first])):
+            payload = trade_payload(transaction_type, products, quantity=2)
+            payload['date'] = (today - timedelta(days=days_ago)).isoformat()
+            response = self.client.post(TRANSACTIONS_URL, payload, format='json')
+            self.assertEqual(response.status_code, 201)
+
+        def held(days_ago):
+            return {
+                row['reference_number']: row['quantity']
+                for row in stock_on(self.user, today - timedelta(days=days_ago))
+            }
+
+        self.assertEqual(held(11), {})
+        self.assertEqual(held(6), {'TL-0': 5, 'TL-1': 5, 'TL-2': 5})
+        self.assertEqual(held(5), {'TL-0': 3, 'TL-1': 3, 'TL-2': 5})
+        self.assertEqual(held(0), {'TL-0': 5, 'TL-1': 3, 'TL-2': 5})
+
+        response = self.client.get('/api/v1/stock/', {'date': (today - timedelta(days=5)).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['reference_number'], row['quantity']) for row in response.data['results']],
+            [('TL-0', 3), ('TL-1', 3), ('TL-2', 5)]
+        )
+
+
+class TransactionAdminStockTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([User(email='trade-admin@example.com', is_staff=True, is_superuser=True)])
+        cls.admin = User.objects.get(email='trade-admin@example.com')
+        cls.user = create_user('trade-admin-owner@example.com')
+        cls.product = create_product(cls.user, 'TA-1', quantity=5)
+
+    def setUp(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        api.post(TRANSACTIONS_URL, trade_payload('sale', [self.product], quantity=2), format='json')
+        self.sale = TransactionHistory.objects.get(user=self.user)
+        self.client.force_login(self.admin)
+
+    def assertStock(self, quantity):
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.quantity, ledger_balance(self.product)), (quantity, quantity))
+
+    def test_deleting_a_transaction_gives_the_stock_back(self):
+        self.assertStock(3)
+
+        response = self.client.post(f'/admin/transactions/transactionhistory/{self.sale.pk}/delete/', {'post': 'yes'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(TransactionHistory.objects.filter(pk=self.sale.pk).exists())
+        self.assertStock(5)
+
+    def test_deleting_selected_transactions_gives_the_stock_back(self):
+        response = self.client.post('/admin/transactions/transactionhistory/', {
+            'action': 'delete_selected', '_selected_action': [self.sale.pk], 'post': 'yes',
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertStock(5)
+
+    def test_deleting_an_item_gives_its_stock_back(self):
+        item = self.sale.transaction_items.get()
+
+        response = self.client.post(f'/admin/transactions/transactionitem/{item.pk}/delete/', {'post': 'yes'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertStock(5)
+        stored, expected = item_totals(self.sale)
+        self.assertEqual(stored, expected)
+
+    def test_stock_movements_cannot_be_added(self):
+        response = self.client.get('/admin/transactions/stockmovement/add/')
+        self.assertEqual(response.status_code, 403)
+
+
+class TransactionCreateQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('trade-queries@example.com')
+        cls.products = [create_product(cls.user, f'TQ-{i}', quantity=5) for i in range(10)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_trade_costs_the_same_queries_for_any_number_of_items(self):
+        for products in (self.products[:2], self.products):
+            # Products in one lookup, the transaction, its items, the totals
+            # refresh, the ledger rows and one stock UPDATE inside a savepoint,
+            # then the items of the response
+            with self.assertNumQueries(10):
+                response = self.client.post(TRANSACTIONS_URL, trade_payload('sale', products), format='json')
+            self.assertEqual(response.status_code, 201)
+
+        for product in self.products:
+            product.refresh_from_db()
+        self.assertEqual([product.quantity for product in self.products], [3, 3] + [4] * 8)
+
+        trade = TransactionHistory.objects.filter(user=self.user).latest('pk')
+        self.assertEqual(
+            (trade.items_count, trade.items_total_sale, trade.items_total_purchase, trade.profit),
+            (10, Decimal('1500'), Decimal('1000'), Decimal('500'))
+        )
+
+
+@skipUnlessDBFeature('has_select_for_update')
+@isolated_report_cache
+class ConcurrentSaleTests(TransactionTestCase):
+    """
+    Sales of one product from parallel requests, each on its own database
+    connection. Needs a database with row-level locking (PostgreSQL); on
+    SQLite every writer locks the whole file.
+    """
+    sellers = 8
+    sales_per_seller = 5
+
+    def test_concurrent_sales_lose_no_stock_updates(self):
+        user = create_user('trade-race@example.com')
+        initial = self.sellers * self.sales_per_seller + 10
+        product = create_product(user, 'RACE-1', quantity=initial)
+
+        start = threading.Barrier(self.sellers)
+        failures = []
+
+        def sell():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                start.wait()
+                for _ in range(self.sales_per_seller):
+                    response = client.post(TRANSACTIONS_URL, trade_payload('sale', [product]), format='json')
+                    if response.status_code != 201:
+                        failures.append(response.data)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=sell) for _ in range(self.sellers)]
+        # Failed rollup rebuilds are only logged, the sales have committed
+        with self.assertNoLogs('report.services', level='ERROR'):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(failures, [])
+        product.refresh_from_db()
+        sold = self.sellers * self.sales_per_seller
+        self.assertEqual(product.quantity, initial - sold)
+        self.assertEqual(TransactionHistory.objects.filter(user=user).count(), sold)
+        self.assertEqual(
+            sum(StockMovement.objects.filter(product=product).values_list('quantity', flat=True)),
+            product.quantity
+        )
+        # Every commit rebuilt the day's rollup, none of them lost a sale
+        rollup = DailyProfitRollup.objects.get(user=user, date=timezone.localdate())
+        self.assertEqual((rollup.sales_count, rollup.items_sold), (sold, sold))
+
+
+class TransactionSummaryTests(TestCase):
+    url = f'{TRANSACTIONS_URL}summary/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('trade-summary@example.com')
+        cls.first, cls.second = (create_product(cls.user, f'TS-{i}', quantity=10) for i in range(2))
+        today = timezone.localdate()
+
+        def trade(transaction_type, items):
+            transaction = TransactionHistory.objects.create(user=cls.user, transaction_type=transaction_type, date=today)
+            for product, quantity, purchase_price, sale_price in items:
+                TransactionItem.objects.create(
+                    transaction=transaction, product=product, quantity=quantity,
+                    purchase_price=purchase_price, sale_price=sale_price
+                )
+
+        trade('purchase', [(cls.first, 3, Decimal('100'), None), (cls.second, 1, Decimal('400'), None)])
+        trade('sale', [(cls.first, 2, Decimal('100'), Decimal('150.50'))])
+        trade('sale', [(cls.second, 1, Decimal('400'), Decimal('380'))])
+
+        # Another user's trade stays out of the summary
+        other = create_user('trade-summary-other@example.com')
+        TransactionHistory.objects.create(user=other, transaction_type='sale', date=today)
+
+    def test_summary_contract(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        # One conditional aggregate for the totals, then the count and the
+        # page of the grouped product stats
+        with self.assertNumQueries(3):
+            response = client.get(self.url, {'page_size': 1})
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body, {
+            'total_sales': 2,
+            'total_purchases': 1,
+            'sales_amount': 681.0,
+            'purchases_amount': 700.0,
+            'total_profit': 81.0,
+            'product_stats': {
+                'count': 2,
+                'next': 'http://testserver/api/v1/transactions/summary/?page=2&page_size=1',
+                'previous': None,
+                'results': [{
+                    'product': self.second.pk,
+                    'name': 'Model TS-1',
+                    'total_sold': 1,
+                    'total_purchased': 1,
+                    'revenue': 380.0,
+                    'cost': 400.0,
+                }],
+            },
+        })
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TransactionHistoryViewSet
+from .views import TransactionHistoryViewSet, StockOnDateAPIView
 
 router = DefaultRouter()
 router.register(r'transactions', TransactionHistoryViewSet, basename='transaction')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('stock/', StockOnDateAPIView.as_view(), name='stock-on-date'),
 ]
@@ -1,12 +1,19 @@
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.views import APIView
+from django.db import transaction as db_transaction
+from django.utils.dateparse import parse_date
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import TransactionHistory, TransactionItem
 from .serializers import TransactionHistorySerializer, TransactionCreateSerializer, TransactionItemSerializer
+from .services import stock_on, sync_transaction_stock
 from inventory.models import Product
+from inventory.pagination import CustomPagination
+from report.services import mark_user_data_changed
 from customers.models import Customer
-from django.db.models import Sum, F, Case, When, DecimalField, Value
+from django.db.models import Sum, Count, F, Q, Case, When, DecimalField, Value
 from django.db.models.functions import Coalesce
 from decimal import Decimal
 from rest_framework.exceptions import ValidationError
@@ -89,59 +96,53 @@ class TransactionHistoryViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    def perform_destroy(self, instance):
+        with db_transaction.atomic():
+            # Give the stock back, recorded as reversal rows in the ledger
+            sync_transaction_stock(instance, [])
+            mark_user_data_changed(instance.user_id)
+            instance.delete()
+
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """
-        Get transaction summary statistics
+        Get transaction summary statistics: sale and purchase counts, amounts
+        and profit, and product_stats, a page (?page, ?page_size) of the
+        quantities, revenue and cost per product, highest revenue first
         """
         try:
-            queryset = self.get_queryset()
-            
-            # Calculate total sales and purchases
-            total_sales = queryset.filter(transaction_type='sale').count()
-            total_purchases = queryset.filter(transaction_type='purchase').count()
-            
-            # Calculate total sales amount and purchases amount
-            sales_transactions = queryset.filter(transaction_type='sale')
-            purchases_transactions = queryset.filter(transaction_type='purchase')
+            is_sale = Q(transaction_type='sale')
+            is_purchase = Q(transaction_type='purchase')
+            zero = Decimal('0')
             
-            # Safely sum values, handling None values
-            sales_amount = sum((transaction.total_sale_price or Decimal('0')) for transaction in sales_transactions)
-            purchases_amount = sum((transaction.total_purchase_price or Decimal('0')) for transaction in purchases_transactions)
+            # Counts and amounts in one conditional aggregate over the item
+            # totals stored on each transaction
+            totals = TransactionHistory.objects.filter(user=request.user).aggregate(
+                total_sales=Count('id', filter=is_sale),
+                total_purchases=Count('id', filter=is_purchase),
+                sales_amount=Coalesce(Sum('items_total_sale', filter=is_sale), zero),
+                purchases_amount=Coalesce(Sum('items_total_purchase', filter=is_purchase), zero),
+                total_profit=Coalesce(Sum('profit', filter=is_sale), zero),
+            )
             
-            # Calculate total profit, handling None values
-            total_profit = sum((transaction.profit or Decimal('0')) for transaction in sales_transactions)
-            
-            product_stats = {}
-            items = TransactionItem.objects.filter(
+            item_is_sale = Q(transaction__transaction_type='sale')
+            item_is_purchase = Q(transaction__transaction_type='purchase')
+            product_stats = TransactionItem.objects.filter(
                 transaction__user=request.user
-            ).select_related('product', 'transaction')
+            ).values('product').annotate(
+                name=F('product__model_name'),
+                total_sold=Coalesce(Sum('quantity', filter=item_is_sale), 0),
+                total_purchased=Coalesce(Sum('quantity', filter=item_is_purchase), 0),
+                revenue=Coalesce(Sum(F('quantity') * F('sale_price'), filter=item_is_sale), zero),
+                cost=Coalesce(Sum(F('quantity') * F('purchase_price'), filter=item_is_purchase), zero),
+            ).order_by('-revenue', 'product')
             
-            for item in items:
-                product_id = item.product_id
-                if product_id not in product_stats:
-                    product_stats[product_id] = {
-                        'name': item.product.name,
-                        'total_sold': 0,
-                        'total_purchased': 0,
-                        'revenue': Decimal('0'),
-                        'cost': Decimal('0')
-                    }
-                
-                if item.transaction.transaction_type == 'sale':
-                    product_stats[product_id]['total_sold'] += item.quantity
-                    product_stats[product_id]['revenue'] += (item.total_sale_price or Decimal('0'))
-                else:
-                    product_stats[product_id]['total_purchased'] += item.quantity
-                    product_stats[product_id]['cost'] += (item.total_purchase_price or Decimal('0'))
+            paginator = CustomPagination()
+            page = paginator.paginate_queryset(product_stats, request)
             
             return Response({
-                'total_sales': total_sales,
-                'total_purchases': total_purchases,
-                'sales_amount': sales_amount,
-                'purchases_amount': purchases_amount,
-                'total_profit': total_profit,
-                'product_stats': product_stats
+                **totals,
+                'product_stats': paginator.get_paginated_response(page).data
             })
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -152,4 +153,34 @@ class TransactionItemViewSet(viewsets.ModelViewSet):
     serializer_class = TransactionItemSerializer
     
     def get_queryset(self):
-        return TransactionItem.objects.filter(transaction__user=self.request.user)
\ No newline at end of file
+        return TransactionItem.objects.filter(transaction__user=self.request.user)
+
+
+class StockOnDateAPIView(APIView):
+    """
+    Stock held per product at the end of ?date=YYYY-MM-DD (default today),
+    summed from the stock movement ledger instead of replaying transactions
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CustomPagination
+
+    def get(self, request):
+        day = timezone.localdate()
+        if request.query_params.get('date'):
+            try:
+                day = parse_date(request.query_params['date'])
+            except ValueError:
+                day = None
+            if day is None:
+                return Response(
+                    {"error": "Invalid date, use YYYY-MM-DD"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        holdings = stock_on(request.user, day)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(holdings, request)
+        response = paginator.get_paginated_response(page)
+        response.data['date'] = day
+        return response